@@ -0,0 +1 @@
+"""Benchmarks of the client against the in-process stand-in of the API. Run with python -m benchmarks."""
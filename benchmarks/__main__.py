@@ -0,0 +1,113 @@
+"""Runs the benchmarks and compares them with a baseline.
+
+    $ python -m benchmarks                                   # run and print the results
+    $ python -m benchmarks --output benchmarks/baseline.json # store the results as the new baseline
+    $ python -m benchmarks --baseline benchmarks/baseline.json --tolerance 0.25
+
+With a baseline, the exit status is 1 if some benchmark is slower than the baseline by more than the tolerance.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+
+import procountor
+
+from .suite import BENCHMARKS
+
+
+def measure(name, repeat):
+    """Runs a benchmark repeat times and returns its result
+
+    :param name: name of the benchmark, string
+    :param repeat: number of runs, integer
+    :return: Dictionary with keys: operations, seconds (median per operation), best (fastest per operation), and
+             mb_per_second for benchmarks which transfer data, dict
+    """
+
+    operations, run, size = BENCHMARKS[name]()
+    run()  # warm up
+
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+
+    times.sort()
+    median = times[len(times) // 2]
+    result = {
+        "operations": operations,
+        "seconds": median / operations,
+        "best": times[0] / operations,
+    }
+    if size:
+        result["mb_per_second"] = size / median / 1e6
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Returns the benchmarks which are slower than in the baseline by more than the tolerance
+
+    :param results: results by benchmark name, dict
+    :param baseline: baseline results by benchmark name, dict
+    :param tolerance: allowed slowdown, e.g. 0.25 for 25 %, float
+    :return: (name, baseline seconds, seconds) tuples, list
+    """
+
+    return [
+        (name, baseline[name]["seconds"], result["seconds"])
+        for name, result in sorted(results.items())
+        if name in baseline and result["seconds"] > baseline[name]["seconds"] * (1 + tolerance)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks of the Procountor client")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, or prefixes of their names, e.g. pagination")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark (default 5)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare the results with this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (default 0.25)")
+    args = parser.parse_args(argv)
+
+    names = sorted(
+        name for name in BENCHMARKS if not args.names or any(name.startswith(prefix) for prefix in args.names)
+    )
+
+    results = {}
+    for name in names:
+        results[name] = result = measure(name, args.repeat)
+        throughput = " {:8.1f} MB/s".format(result["mb_per_second"]) if "mb_per_second" in result else ""
+        print("{:45} {:12.2f} us/op{}".format(name, result["seconds"] * 1e6, throughput))
+
+    if args.output:
+        document = {
+            "created": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "procountor": procountor.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print("REGRESSION {}: {:.2f} us/op -> {:.2f} us/op".format(name, before * 1e6, after * 1e6))
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
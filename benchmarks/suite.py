@@ -0,0 +1,179 @@
+import io
+import json
+
+import requests
+
+from procountor.client import Client
+from procountor.testing import CREDENTIALS, StandInApi, generate_fixtures, standin_session
+
+ATTACHMENT_SIZE = 4 * 1024 * 1024
+
+# Benchmarks by name. A benchmark is a function which prepares its data and returns (operations, run, bytes):
+# run() performs the operations once, and bytes is the number of bytes transferred by a run, or None.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def standin_client(api=None, **options):
+    """Returns a client which sends its requests to a stand-in in-process
+
+    :param api: stand-in, defaults to StandInApi() with the bundled fixtures, StandInApi
+    :param options: other arguments of Client, dict
+    :return: client, Client
+    """
+
+    client = Client(session=standin_session(api), **dict(CREDENTIALS, **options))
+    client.get_company()
+    return client
+
+
+# Per-call overhead of Client.request
+
+@benchmark("request.api_url")
+def api_url():
+    client = Client(**CREDENTIALS)
+
+    def run():
+        for _ in range(10000):
+            client.api_url
+
+    return 10000, run, None
+
+
+@benchmark("request.headers")
+def headers():
+    client = Client(**CREDENTIALS)
+
+    def run():
+        for _ in range(10000):
+            client._headers("GET", "invoices/1001", "token")
+
+    return 10000, run, None
+
+
+@benchmark("request.handle_response")
+def handle_response():
+    client = Client(**CREDENTIALS)
+    invoice = generate_fixtures(invoices=1, seed=1)["invoices"][-1]
+
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/json"
+    response._content = json.dumps(invoice).encode("utf-8")
+
+    def run():
+        for _ in range(5000):
+            client._handleResponse(response)
+
+    return 5000, run, len(response.content) * 5000
+
+
+@benchmark("request.get_invoice")
+def get_invoice():
+    client = standin_client()
+
+    def run():
+        for _ in range(1000):
+            client.get_invoice(1001)
+
+    return 1000, run, None
+
+
+# Pagination
+
+def _invoice_api(invoices=5000):
+    return StandInApi(generate_fixtures(invoices=invoices, seed=1), page_size=200)
+
+
+@benchmark("pagination.iter_invoices")
+def iter_invoices():
+    client = standin_client(_invoice_api())
+
+    def run():
+        count = sum(1 for _ in client.iter_invoices())
+        assert count == 5005, count
+
+    return 5005, run, None
+
+
+@benchmark("pagination.iter_invoices_prefetch")
+def iter_invoices_prefetch():
+    client = standin_client(_invoice_api())
+
+    def run():
+        count = sum(1 for _ in client.iter_invoices(prefetch=True))
+        assert count == 5005, count
+
+    return 5005, run, None
+
+
+@benchmark("pagination.scan_invoices")
+def scan_invoices():
+    client = standin_client(_invoice_api())
+
+    def run():
+        count = sum(1 for _ in client.scan_invoices("2019-01-01", "2019-12-31", shards=4))
+        assert count == 5005, count
+
+    return 5005, run, None
+
+
+# Attachments
+
+@benchmark("attachments.upload")
+def upload():
+    api = StandInApi()
+    client = standin_client(api)
+    data = b"x" * ATTACHMENT_SIZE
+    meta = {"name": "benchmark.bin", "referenceType": "INVOICE", "referenceId": 1001}
+
+    def run():
+        for _ in range(5):
+            response = client.post_attachment(meta, data)
+            assert response["status"] == 200, response
+            client.delete_attachment(response["content"]["id"])
+
+    return 5, run, ATTACHMENT_SIZE * 5
+
+
+@benchmark("attachments.download")
+def download():
+    api = StandInApi()
+    client = standin_client(api)
+    attachmentId = client.post_attachment({"name": "benchmark.bin"}, b"x" * ATTACHMENT_SIZE)["content"]["id"]
+
+    def run():
+        for _ in range(5):
+            target = io.BytesIO()
+            client.download_attachment(attachmentId, target)
+            assert len(target.getvalue()) == ATTACHMENT_SIZE
+
+    return 5, run, ATTACHMENT_SIZE * 5
+
+
+# Concurrent bulk fetches, with 5 ms latency per request
+
+def _bulk_fetch(max_workers):
+    client = standin_client(
+        StandInApi(generate_fixtures(invoices=200, seed=1), latency=0.005), pool_maxsize=max(max_workers, 10)
+    )
+    invoiceIds = list(range(1001, 1201))
+
+    def run():
+        failed = [key for key, response in client.get_invoices_by_ids(invoiceIds, max_workers=max_workers)
+                  if response["status"] != 200]
+        assert not failed, failed
+
+    return len(invoiceIds), run, None
+
+
+for _workers in (1, 2, 4, 8, 16):
+    benchmark("bulk.get_invoices_by_ids.workers_{}".format(_workers))(
+        lambda workers=_workers: _bulk_fetch(workers)
+    )
@@ -0,0 +1,274 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError("Aggregation requires numpy. Install it with: pip install Procountor[aggregate]")
+
+
+def fiscal_periods(fiscal_years):
+    """Returns the periods of fiscal years in chronological order. A fiscal year without tracking periods is one
+    period.
+
+    :param fiscal_years: response or content of get_fiscal_years(), or a list of fiscal years, dict or list
+    :return: (startDate, endDate) tuples (yyyy-MM-dd), list
+    """
+
+    if isinstance(fiscal_years, dict):
+        fiscal_years = fiscal_years.get("content", fiscal_years).get("fiscalYears", [])
+
+    periods = []
+    for year in fiscal_years:
+        for period in year.get("periods") or [year]:
+            periods.append((period["startDate"], period["endDate"]))
+
+    return sorted(periods)
+
+
+class _Factor(object):
+    """Maps values to consecutive integer codes"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class TransactionTable(object):
+    """Transaction lines of ledger receipts in columnar NumPy arrays, for computing trial balances, period totals and
+    dimension breakdowns with vectorized group-bys. Accounts are stored as integer codes, dates as datetime64[D]
+    and amounts as float64. The dimension items of the transactions are kept in a separate set of columns, one
+    line per item, with the value of the item as the amount.
+
+    Amounts are floats for fast vectorized sums, and Decimals are converted to floats, so the totals are rounded to
+    about 15 significant digits; round them to cents for reports. Use LedgerMirror.totals() for exact sums.
+
+    Build a table with from_receipts() or from_mirror(). Requires numpy.
+
+    :param accounts: account numbers by code, list of strings
+    :param account: account codes of the lines, array of integers
+    :param date: dates of the lines, array of datetime64[D]
+    :param amount: amounts of the lines, array of floats
+    :param dimension: (account codes, dates, amounts, dimension IDs, dimension item IDs) of the dimension item lines,
+                      tuple of arrays
+    """
+
+    def __init__(self, accounts, account, date, amount, dimension):
+        _require_numpy()
+        self.accounts = list(accounts)
+        self.account = numpy.asarray(account, dtype=numpy.int64)
+        self.date = numpy.asarray(date, dtype="datetime64[D]")
+        self.amount = numpy.asarray(amount, dtype=numpy.float64)
+        self.dimension = tuple(numpy.asarray(column) for column in dimension)
+
+    def __len__(self):
+        return len(self.amount)
+
+    @classmethod
+    def from_rows(cls, rows, dimension_rows=()):
+        """Builds a table from (account, date, amount) rows and (account, date, amount, dimensionId,
+        dimensionItemId) dimension item rows
+
+        :param rows: transaction lines, iterable of tuples
+        :param dimension_rows: dimension item lines, iterable of tuples
+        :return: TransactionTable
+        """
+
+        _require_numpy()
+        accounts = _Factor()
+
+        def columns(rows, width):
+            columns = tuple([] for _ in range(width))
+            for row in rows:
+                columns[0].append(accounts.code(row[0]))
+                for column, value in zip(columns[1:], row[1:]):
+                    column.append(value)
+            return columns
+
+        account, date, amount = columns(rows, 3)
+        dimension = columns(dimension_rows, 5)
+
+        return cls(
+            accounts.values,
+            account,
+            numpy.array(date, dtype="datetime64[D]"),
+            numpy.array(amount, dtype=numpy.float64),
+            (
+                numpy.array(dimension[0], dtype=numpy.int64),
+                numpy.array(dimension[1], dtype="datetime64[D]"),
+                numpy.array(dimension[2], dtype=numpy.float64),
+                numpy.array(dimension[3], dtype=numpy.int64),
+                numpy.array(dimension[4], dtype=numpy.int64),
+            ),
+        )
+
+    @classmethod
+    def from_receipts(cls, receipts):
+        """Builds a table from ledger receipts. Invalidated receipts are skipped.
+
+        :param receipts: ledger receipts like in the content of get_ledger_receipt(), iterable of dicts
+        :return: TransactionTable
+        """
+
+        rows = []
+        dimension_rows = []
+
+        for receipt in receipts:
+            if receipt.get("status") == "INVALIDATED":
+                continue
+
+            date = receipt["receiptDate"]
+            for transaction in receipt.get("transactions") or []:
+                account = transaction["account"]
+                rows.append((account, date, transaction.get("accountingValue") or 0.0))
+                for dimension in transaction.get("dimensions") or []:
+                    for item in dimension.get("items") or []:
+                        dimension_rows.append(
+                            (account, date, item.get("value") or 0.0, dimension["dimensionId"], item["dimensionItemId"])
+                        )
+
+        return cls.from_rows(rows, dimension_rows)
+
+    @classmethod
+    def from_mirror(cls, mirror, startDate=None, endDate=None):
+        """Builds a table from the entries of a LedgerMirror
+
+        :param mirror: ledger mirror, LedgerMirror
+        :param startDate: first receipt date (yyyy-MM-dd), string
+        :param endDate: last receipt date (yyyy-MM-dd), string
+        :return: TransactionTable
+        """
+
+        return cls.from_rows(
+            mirror.lines(startDate, endDate),
+            mirror.lines(startDate, endDate, dimensions=True),
+        )
+
+    def _mask(self, date, startDate, endDate):
+        mask = numpy.ones(len(date), dtype=bool)
+        if startDate:
+            mask &= date >= numpy.datetime64(startDate, "D")
+        if endDate:
+            mask &= date <= numpy.datetime64(endDate, "D")
+        return mask
+
+    def _sum_by_account(self, mask):
+        return numpy.bincount(self.account[mask], weights=self.amount[mask], minlength=len(self.accounts))
+
+    def account_totals(self, startDate=None, endDate=None):
+        """Returns the sums of the lines by account
+
+        :param startDate: first date (yyyy-MM-dd), string
+        :param endDate: last date (yyyy-MM-dd), string
+        :return: sums by account number, dict
+        """
+
+        mask = self._mask(self.date, startDate, endDate)
+        totals = self._sum_by_account(mask)
+        present = numpy.bincount(self.account[mask], minlength=len(self.accounts))
+
+        return {self.accounts[code]: float(totals[code]) for code in numpy.flatnonzero(present)}
+
+    def trial_balance(self, startDate, endDate):
+        """Returns the trial balance of a period. The opening balance is the sum of the lines in the table before
+        the period, so load the lines from the start of the fiscal year for the balances of profit and loss
+        accounts, or from the beginning for balance sheet accounts.
+
+        :param startDate: first date of the period (yyyy-MM-dd), string
+        :param endDate: last date of the period (yyyy-MM-dd), string
+        :return: Dictionaries with keys: account, opening, debit, credit and closing, ordered by account, list
+        """
+
+        size = len(self.accounts)
+        start = numpy.datetime64(startDate, "D")
+        before = self.date < start
+        during = self._mask(self.date, startDate, endDate)
+        debit_lines = during & (self.amount > 0)
+        credit_lines = during & (self.amount < 0)
+
+        opening = numpy.bincount(self.account[before], weights=self.amount[before], minlength=size)
+        debit = numpy.bincount(self.account[debit_lines], weights=self.amount[debit_lines], minlength=size)
+        credit = -numpy.bincount(self.account[credit_lines], weights=self.amount[credit_lines], minlength=size)
+        present = numpy.bincount(self.account[before | during], minlength=size) > 0
+
+        return [
+            {
+                "account": self.accounts[code],
+                "opening": float(opening[code]),
+                "debit": float(debit[code]),
+                "credit": float(credit[code]),
+                "closing": float(opening[code] + debit[code] - credit[code]),
+            }
+            for code in sorted(numpy.flatnonzero(present), key=lambda code: self.accounts[code])
+        ]
+
+    def _period_index(self, date, periods):
+        """Returns the index of the period of each date, or -1 for dates outside the periods"""
+
+        starts = numpy.array([period[0] for period in periods], dtype="datetime64[D]")
+        ends = numpy.array([period[1] for period in periods], dtype="datetime64[D]")
+
+        index = numpy.searchsorted(starts, date, side="right") - 1
+        inside = index >= 0
+        inside[inside] = date[inside] <= ends[index[inside]]
+        return numpy.where(inside, index, -1)
+
+    def period_totals(self, periods):
+        """Returns the sums of the lines by account and period
+
+        :param periods: (startDate, endDate) tuples in chronological order, e.g. from fiscal_periods(), list
+        :return: (account numbers, periods, sums as an accounts x periods array), tuple
+        """
+
+        periods = list(periods)
+        index = self._period_index(self.date, periods)
+        inside = index >= 0
+
+        cells = self.account[inside] * len(periods) + index[inside]
+        totals = numpy.bincount(cells, weights=self.amount[inside], minlength=len(self.accounts) * len(periods))
+
+        return self.accounts, periods, totals.reshape(len(self.accounts), len(periods))
+
+    def dimension_totals(self, dimensionId, startDate=None, endDate=None, periods=None):
+        """Returns the sums of the dimension item lines of a dimension by account and dimension item, and optionally
+        by period
+
+        :param dimensionId: dimension identifier, integer
+        :param startDate: first date (yyyy-MM-dd), string
+        :param endDate: last date (yyyy-MM-dd), string
+        :param periods: (startDate, endDate) tuples in chronological order, list
+        :return: sums by (account number, dimensionItemId), or by (account number, dimensionItemId, period index)
+                 with periods, dict
+        """
+
+        account, date, amount, dimension, item = self.dimension
+        mask = self._mask(date, startDate, endDate) & (dimension == dimensionId)
+
+        keys = [account[mask], item[mask]]
+        if periods:
+            index = self._period_index(date[mask], list(periods))
+            inside = index >= 0
+            keys = [key[inside] for key in keys] + [index[inside]]
+            amount = amount[mask][inside]
+        else:
+            amount = amount[mask]
+
+        if not len(amount):
+            return {}
+
+        groups, inverse = numpy.unique(numpy.stack(keys, axis=1), axis=0, return_inverse=True)
+        totals = numpy.bincount(inverse.ravel(), weights=amount, minlength=len(groups))
+
+        return {
+            (self.accounts[group[0]],) + tuple(int(value) for value in group[1:]): float(total)
+            for group, total in zip(groups, totals)
+        }
@@ -1,4 +1,4 @@
-import json
+from .multipart import AttachmentUpload
 
 
 class ApiMethods(object):
@@ -17,6 +17,21 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def download_attachment(self, attachmentId, target, chunk_size=65536):
+        """Downloads an attachment based on given attachment ID and writes the file to the target in chunks, without
+        holding the whole file in memory. Use this instead of get_attachment() for large files.
+
+        :param attachmentId: ID of the requested attachment, integer
+        :param target: path or binary file object where the file is written
+        :param chunk_size: size of the chunks read from the response in bytes, integer
+        :return: Dictionary with keys: 'status' for HTTP-status code, 'metadata' for the attachment metadata and 'size'
+                 for the file size. In error case there is 'message', dict
+        """
+
+        endpoint = "attachments/{}".format(attachmentId)
+
+        return self._download(endpoint, target, chunk_size)
+
     def delete_attachment(self, attachmentId):
         """Deletes requested attachment
 
@@ -32,23 +47,33 @@ class ApiMethods(object):
     def post_attachment(self, meta, filename):
         """Method sends new attachment to Procountor. The attachment can be of any type but limited to max 10000000
         bytes (10MB). Content-type for the request is multipart/form-data. Type for the meta data is application/json.
+        The file is streamed in chunks, it is not read into memory.
 
         :param meta: meta data for attachment, contains name of the file, referenceType and referenceId of the
                      attachment, dict
-        :param filename: path to the file
+        :param filename: path to the file, seekable binary file object, bytes or memoryview
         :return: Dictionary with request status code ['status'] and ['content']  content of the request
         """
 
         method = "POST"
         endpoint = "attachments"
 
-        with open(filename, "rb") as f:
-            files = {
-                'meta': (None, json.dumps(meta), "application/json"),
-                'file': f.read(),
-            }
+        return self.request(method, endpoint, upload=AttachmentUpload(meta, filename, codec=self.codec))
 
-            return self.request(method, endpoint, files=files, headers=self._headers(method, endpoint))
+    def post_attachments(self, attachments, max_workers=8, ordered=False):
+        """Method sends many new attachments to Procountor concurrently. Results are returned as they complete. A
+        failed upload doesn't stop the others, its status and message are in its own response.
+
+        :param attachments: (meta, filename) tuples like the arguments of post_attachment(), iterable
+        :param max_workers: maximum number of concurrent uploads, integer
+        :param ordered: return the results in the order of attachments instead of completion order, bool
+        :return: generator of ((meta, filename), response) tuples, response like in post_attachment()
+        """
+
+        def post(attachment):
+            return self.post_attachment(*attachment)
+
+        return self._fetch_many(post, attachments, max_workers=max_workers, ordered=ordered)
 
     # Bank accounts
     def get_bank_accounts(self, **kwargs):
@@ -65,6 +90,16 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def iter_bank_accounts(self, prefetch=False, **kwargs):
+        """Iterates over all bank accounts matching the search criteria. Follows previousId pagination
+        lazily and yields one row at a time. Takes the same parameters as get_bank_accounts().
+
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: generator of bank accounts, dicts
+        """
+
+        return self._paginate(self.get_bank_accounts, kwargs, prefetch=prefetch)
+
     # BANK STATEMENTS
     def get_bank_statements(self, startDate, endDate):
         """Gets and returns all bank statements that match the request criteria. Each BankStatementEvent can have a
@@ -134,6 +169,16 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def iter_business_partners(self, prefetch=False, **kwargs):
+        """Iterates over all business partners matching the search criteria. Follows previousId pagination
+        lazily and yields one row at a time. Takes the same parameters as get_business_partners().
+
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: generator of business partners, dicts
+        """
+
+        return self._paginate(self.get_business_partners, kwargs, prefetch=prefetch)
+
     def get_business_partner(self, partnerId):
         """Method gets and returns requested business partner with its address
 
@@ -157,7 +202,7 @@ class ApiMethods(object):
         method = "PUT"
         endpoint = "businesspartners/{}".format(partnerId)
 
-        return self.request(method, endpoint, kwargs)
+        return self.request(method, endpoint, **kwargs)
 
     def get_business_partner_details(self):
         """Method gets and returns basic information on person register entry for currently logged in user.
@@ -205,7 +250,7 @@ class ApiMethods(object):
         method = "PUT"
         endpoint = "company"
 
-        return self.request(method, endpoint, data)
+        return self.request(method, endpoint, **data)
 
     # CURRENCIES
     def get_currencies(self):
@@ -282,7 +327,7 @@ class ApiMethods(object):
 
         method = "PUT"
         endpoint = "dimensions"
-        return self.request(method, endpoint, kwargs)
+        return self.request(method, endpoint, **kwargs)
 
     def get_dimension(self, dimensionId):
         """Gets and returns a specified dimension with its dimension items
@@ -305,7 +350,7 @@ class ApiMethods(object):
         method = "POST"
         endpoint ="/dimensions/{}/items".format(dimensionId)
 
-        return self.request(method, endpoint, data)
+        return self.request(method, endpoint, **data)
 
     def update_dimension_item(self, dimensionId, **data):
         """Update item in dimension
@@ -317,7 +362,7 @@ class ApiMethods(object):
         method = "PUT"
         endpoint ="/dimensions/{}/items".format(dimensionId)
 
-        return self.request(method, endpoint, data)
+        return self.request(method, endpoint, **data)
 
     # FISCAL YEARS
     def get_fiscal_years(self):
@@ -363,6 +408,29 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def iter_invoices(self, prefetch=False, **kwargs):
+        """Iterates over all invoices matching the search criteria. Follows previousId pagination
+        lazily and yields one row at a time. Takes the same parameters as get_invoices().
+
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: generator of invoices, dicts
+        """
+
+        return self._paginate(self.get_invoices, kwargs, prefetch=prefetch)
+
+    def scan_invoices(self, startDate, endDate, shards=4, **kwargs):
+        """Fetches all invoices with billing date between startDate and endDate. The date range is split into disjoint
+        windows which are paged concurrently, and the results are merged in invoice ID order without duplicates. Takes
+        the same search parameters as get_invoices(), ordering parameters are ignored.
+
+        :param startDate: start date of the search (billing date), string (yyyy-MM-dd)
+        :param endDate: end date of the search (billing date), string (yyyy-MM-dd)
+        :param shards: number of date windows paged concurrently, integer
+        :return: generator of invoices ordered by ID, dicts
+        """
+
+        return self._scan(self.get_invoices, kwargs, startDate, endDate, shards)
+
     def get_invoice(self, invoiceId):
         """Method gets and returns the requested invoice. Supports expense (bill of charges), purchase,
         sales,self-assessed tax and travel invoices.
@@ -376,6 +444,18 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def get_invoices_by_ids(self, invoiceIds, max_workers=8, ordered=False):
+        """Method gets the requested invoices concurrently. Results are returned as they complete. A failed request
+        doesn't stop the others, its status and message are in its own response.
+
+        :param invoiceIds: IDs of the invoices, iterable of integers
+        :param max_workers: maximum number of concurrent requests, integer
+        :param ordered: return the invoices in the order of invoiceIds instead of completion order, bool
+        :return: generator of (invoiceId, response) tuples, response like in get_invoice()
+        """
+
+        return self._fetch_many(self.get_invoice, invoiceIds, max_workers=max_workers, ordered=ordered)
+
     def post_invoice(self, **data):
         """Method posts new invoice to Procountor.
 
@@ -555,6 +635,29 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def iter_ledger_receipts(self, prefetch=False, **kwargs):
+        """Iterates over all ledger receipts matching the search criteria. Follows previousId pagination
+        lazily and yields one row at a time. Takes the same parameters as get_ledger_receipts().
+
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: generator of ledger receipts, dicts
+        """
+
+        return self._paginate(self.get_ledger_receipts, kwargs, id_key="receiptId", prefetch=prefetch)
+
+    def scan_ledger_receipts(self, startDate, endDate, shards=4, **kwargs):
+        """Fetches all ledger receipts between startDate and endDate. The date range is split into disjoint windows
+        which are paged concurrently, and the results are merged in receipt ID order without duplicates. Takes the same
+        search parameters as get_ledger_receipts(), ordering parameters are ignored.
+
+        :param startDate: start date of the search (yyyy-MM-dd), string
+        :param endDate: end date of the search (yyyy-MM-dd), string
+        :param shards: number of date windows paged concurrently, integer
+        :return: generator of ledger receipts ordered by ID, dicts
+        """
+
+        return self._scan(self.get_ledger_receipts, kwargs, startDate, endDate, shards, id_key="receiptId")
+
     def get_ledger_receipt(self, receiptId):
         """Method gets and returns the requested ledger receipt. Supported ledger receipt types are journals, sales
         invoice ledger receipts and purchase invoice ledger receipts
@@ -568,6 +671,18 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def get_ledger_receipts_by_ids(self, receiptIds, max_workers=8, ordered=False):
+        """Method gets the requested ledger receipts concurrently. Results are returned as they complete. A failed
+        request doesn't stop the others, its status and message are in its own response.
+
+        :param receiptIds: ledger receipt identifiers, iterable of integers
+        :param max_workers: maximum number of concurrent requests, integer
+        :param ordered: return the receipts in the order of receiptIds instead of completion order, bool
+        :return: generator of (receiptId, response) tuples, response like in get_ledger_receipt()
+        """
+
+        return self._fetch_many(self.get_ledger_receipt, receiptIds, max_workers=max_workers, ordered=ordered)
+
     def post_ledger_receipt(self, **data):
         """Method sends new ledger receipt to Procountor, Supports journal type ledger receipts
 
@@ -619,7 +734,7 @@ class ApiMethods(object):
         """
         method = "POST"
         endpoint = "payments"
-        return self.request(method, endpoint, data)
+        return self.request(method, endpoint, **data)
 
     def delete_payment(self, paymentId):
         """Remove a payment which is not queued or paid
@@ -671,7 +786,7 @@ class ApiMethods(object):
 
         method = "POST"
         endpoint = "payments/directbanktransfers"
-        return self.request(method, endpoint, data)
+        return self.request(method, endpoint, **data)
 
     def payments_error_messages(self, **kwargs):
         """Returns all payment error messages that match the request criteria.
@@ -688,6 +803,16 @@ class ApiMethods(object):
         endpoint = self._create_endpoint("payments/errormessages", kwargs)
         return self.request(method, endpoint)
 
+    def iter_payments_error_messages(self, prefetch=False, **kwargs):
+        """Iterates over all payment error messages matching the search criteria. Follows previousId pagination
+        lazily and yields one row at a time. Takes the same parameters as payments_error_messages().
+
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: generator of payment error messages, dicts
+        """
+
+        return self._paginate(self.payments_error_messages, kwargs, prefetch=prefetch)
+
     # PRODUCTS
     def get_products(self, **kwargs):
         """Method gets and Returns a paginated list of products in the current environment, starting from "previousId"
@@ -705,6 +830,16 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def iter_products(self, prefetch=False, **kwargs):
+        """Iterates over all products matching the search criteria. Follows previousId pagination
+        lazily and yields one row at a time. Takes the same parameters as get_products().
+
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: generator of products, dicts
+        """
+
+        return self._paginate(self.get_products, kwargs, results_key="products", prefetch=prefetch)
+
     def get_product(self, productId):
         """Method gets and returns the requested product based on the productId
 
@@ -746,6 +881,16 @@ class ApiMethods(object):
 
         return self.request(method, endpoint)
 
+    def iter_reference_payments(self, prefetch=False, **kwargs):
+        """Iterates over all reference payments matching the search criteria. Follows previousId pagination
+        lazily and yields one row at a time. Takes the same parameters as get_reference_payments().
+
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: generator of reference payments, dicts
+        """
+
+        return self._paginate(self.get_reference_payments, kwargs, prefetch=prefetch)
+
     # Session Information
     def get_session_info(self):
         """Returns basic information about the current session.
@@ -779,7 +924,7 @@ class ApiMethods(object):
         method = "PUT"
         endpoint = "users"
 
-        return self.request(method, endpoint, data)
+        return self.request(method, endpoint, **data)
 
     def user_transaction_confirm(self, transactionId):
         """Confirm to make an action related to the given identifier
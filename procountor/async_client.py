@@ -0,0 +1,573 @@
+import asyncio
+import copy
+import heapq
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .auth import TokenManager
+from .bulk import error_response
+from .client import Client
+from .multipart import AttachmentDownload, iter_encoder
+from .pagination import page_rows, next_page_params, row_id, sharded_params
+
+
+async def _stream(chunks):
+    """Wraps an iterator of request body chunks for httpx.AsyncClient"""
+    for chunk in chunks:
+        yield chunk
+
+
+class AsyncTokenManager(TokenManager):
+    """TokenManager for AsyncClient. The fetch function is a coroutine function, and get() and refresh() are
+    coroutines. Concurrent refreshes from several tasks are collapsed into a single token request. A token stored
+    by another client or process is used, but the store lock is not held while awaiting the token request, because
+    a blocking lock would stop the event loop.
+
+    :param fetch: coroutine function which requests a new token and stores it with set(), e.g. client._get_token
+    :param refresh_margin: seconds before expiry when the token is refreshed, integer
+    :param store: token store, e.g. FileTokenStore or SQLiteTokenStore
+    :param key: key of the credentials in the token store, string
+    """
+
+    def __init__(self, fetch, refresh_margin=60, store=None, key=None):
+        super(AsyncTokenManager, self).__init__(fetch, refresh_margin, store, key)
+        # asyncio.Lock is created on first use, so that it belongs to the running event loop
+        self._lock = None
+
+    def _async_lock(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def get(self):
+        """Returns a valid access token, requesting or refreshing it first if needed
+
+        :return: access token, string
+        """
+
+        if self.valid:
+            return self.token
+
+        async with self._async_lock():
+            if not self.valid:
+                self._load()
+            if not self.valid:
+                await self._fetch()
+            return self.token
+
+    async def refresh(self, stale=None):
+        """Refreshes the access token. If the stale token is given and another task or process has already
+        replaced it, the token is not requested again.
+
+        :param stale: the token which was rejected, string
+        :return: access token, string
+        """
+
+        async with self._async_lock():
+            if stale is None or self.token == stale:
+                self._load()
+                if stale is None or self.token == stale or not self.valid:
+                    await self._fetch()
+            return self.token
+
+
+class AsyncSingleFlight(object):
+    """SingleFlight for AsyncClient. The first task calling do() with a key runs the coroutine function, and tasks
+    calling do() with the same key while it runs await the same result. A cancelled waiter doesn't cancel the call
+    the other tasks are waiting for.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, function):
+        """Awaits the coroutine function, or the call in flight with the same key
+
+        :param key: key of identical calls, hashable
+        :param function: coroutine function without arguments
+        :return: (result of the function, whether it was shared with another call) tuple
+        """
+
+        call = self._calls.get(key)
+        if call is not None:
+            call[1] += 1
+            return await asyncio.shield(call[0]), True
+
+        call = self._calls[key] = [asyncio.ensure_future(function()), 0]
+        call[0].add_done_callback(lambda _: self._calls.pop(key, None))
+        result = await asyncio.shield(call[0])
+        return result, call[1] > 0
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class AsyncClient(Client):
+    """Asyncio client for Procountor accounting API. Has the same API methods as Client, but each of them returns an
+    awaitable, e.g. ``response = await client.get_invoices(startDate="2019-01-01", endDate="2019-01-31")``. The
+    iter_* methods return async generators, e.g. ``async for invoice in client.iter_invoices(): ...``.
+
+    The access token is fetched on the first request. Close the client with ``await client.close()`` or use it with
+    ``async with``.
+
+    Following packages need to be installed:
+     - httpx
+
+    :param api_key: Procountor API Key, string
+    :param client_id: Procountor REST API client id, string
+    :param client_secret: Procountor REST API client secret, string
+    :param redirect_uri: URI where redirected after authentication, string
+    :param test_mode: Wether to use test api or real api, bool
+    :param api_version: Cen be latest, supported or >= 20.01, string
+    :param session: HTTP session to use. Give the same session to several clients to share the connection pool.
+                    If not given, the client creates its own, httpx.AsyncClient
+    :param max_connections: maximum number of connections in the client's own session, integer
+    :param max_keepalive_connections: maximum number of idle connections kept open in the client's own session,
+                                      integer
+    :param keepalive_expiry: seconds an idle connection is kept open in the client's own session, float
+    :param token_refresh_margin: seconds before expiry when the access token is refreshed, integer
+    :param token_store: store for sharing the access token with other clients and processes using the same
+                        credentials, e.g. procountor.auth.FileTokenStore or procountor.auth.SQLiteTokenStore
+    :param cache: cache for responses of rarely changing endpoints, e.g. procountor.cache.MemoryCache or
+                  procountor.cache.DiskCache. Responses are not cached if not given
+    :param cache_ttls: time to live in seconds by endpoint template, e.g. {"coa": 600}. Overrides and extends
+                       procountor.cache.DEFAULT_TTLS, dict
+    :param retry_policy: policy for retrying throttled requests, server errors and connection errors. Defaults to
+                         procountor.retry.RetryPolicy(), use procountor.retry.NO_RETRY to disable retries
+    :param rate_limiter: client-side rate limiter, e.g. procountor.ratelimit.RateLimiter. Give the same limiter to
+                         several clients to share the request budget
+    :param codec: JSON codec for request and response bodies, e.g. procountor.codec.OrjsonCodec(use_decimal=True),
+                  or its name: 'json', 'orjson', 'ujson' or 'auto'. Defaults to the json module of the standard library
+    :param hooks: request hooks called before and after each request, e.g. procountor.metrics.MetricsRegistry(),
+                  list of procountor.metrics.Hook
+    :param coalesce: collapse identical concurrent GET requests into one request. Each caller gets its own copy of
+                     the response, bool
+    :param models: return invoices, ledger receipts, business partners and bank statement events as compact models
+                   of procountor.models instead of dicts, bool
+    :param host: API host, e.g. the url of a procountor.testing.StandInServer. Defaults to the test or production
+                 host by test_mode, string
+    :param http_transport: httpx transport of the client's own session, e.g. httpx.AsyncHTTPTransport(retries=1)
+                           or httpx.MockTransport(handler). Unlike the transport of Client, it sends the HTTP
+                           requests of the session and isn't a procountor.transport transport
+    """
+
+    _token_manager_class = AsyncTokenManager
+    _single_flight_class = AsyncSingleFlight
+
+    def __init__(
+        self,
+        api_key,
+        client_id,
+        client_secret,
+        redirect_uri,
+        test_mode=True,
+        api_version="supported",
+        session=None,
+        max_connections=10,
+        max_keepalive_connections=10,
+        keepalive_expiry=5.0,
+        token_refresh_margin=60,
+        token_store=None,
+        cache=None,
+        cache_ttls=None,
+        retry_policy=None,
+        rate_limiter=None,
+        codec=None,
+        hooks=None,
+        coalesce=True,
+        models=False,
+        host=None,
+        http_transport=None,
+    ):
+        if httpx is None:
+            raise ImportError("AsyncClient requires httpx. Install it with: pip install Procountor[async]")
+
+        self._configure(
+            api_key, client_id, client_secret, redirect_uri, test_mode, api_version, token_refresh_margin, token_store,
+            cache, cache_ttls, retry_policy, rate_limiter, codec, hooks, coalesce, models, host,
+        )
+        self._owns_session = session is None
+        self.session = session or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=http_transport,
+        )
+
+    @property
+    def access_token(self):
+        """Current access token. Requests refresh the token before it expires."""
+        return self._token_manager.token
+
+    @access_token.setter
+    def access_token(self, token):
+        self._token_manager.set(token)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes the connections of the client. A session given to the client is left open, because other clients
+        may still use it."""
+
+        if self._owns_session:
+            await self.session.aclose()
+
+    async def invalidate_token(self):
+        """Method invalidates the access token. After a successful logout the token is forgotten, also from the
+        token store. Nothing is requested if the client has no token yet.
+
+        :return: Dictionary with keys: 'status', 'headers' and 'content', or None if there was no token, dict
+        """
+
+        if self._token_manager.current() is None:
+            return None
+
+        method = "POST"
+        endpoint = "logout"
+        headers = {"authorization": "Bearer " + await self._token_manager.get()}
+        url = "{}/{}".format(self.api_host, endpoint)
+
+        response = await self.request(method, endpoint, headers, url)
+        if response.get("status") == 200:
+            self._token_manager.invalidate()
+        return response
+
+    async def _get_token(self):
+        """Makes a request and returns an access token. Access token is valid for
+        3600 seconds.
+
+        :return: granted tokens, str
+        """
+
+        url, params, headers = self._token_request()
+
+        event = self._request_started("POST", "oauth/token", url)
+        try:
+            response = await self.session.post(url, data=params, headers=headers)
+        except Exception as e:
+            self._request_finished(event, error=e)
+            raise
+        self._request_finished(event, response)
+
+        return self._read_token(response)
+
+    async def request(
+        self, method, endpoint, headers=None, url=None, files=None, upload=None, *args, **kwargs
+    ):
+        """Method to make HTTP requests over Procountor REST API
+
+        :param method: wanted request method, uppercase string
+        :param endpoint: wanted REST API endpoint, string
+        :param headers: Overwrite HTTP-headers, dict
+        :param upload: streaming multipart body, AttachmentUpload
+        :param kwargs: query parameters to pass to Procountor, dict
+        :return: response from rest server, dict
+        """
+        url = url or self.api_url + endpoint
+
+        cache_key, cached = self._cached_response(method, endpoint, url)
+        if cached is not None:
+            return self._models(endpoint, cached)
+
+        # Test environment (Microsoft-Azure-Application-Gateway)
+        # doesn't like if there is a json body in (for ex.) GET method.
+        content = None if len(kwargs) == 0 else self.codec.dumps(kwargs)
+
+        async def fetch():
+            event = self._request_started(method, endpoint, url, content)
+            try:
+                response = await self._send(method, url, endpoint, headers, files=files, content=content, upload=upload)
+            except Exception as e:
+                self._request_finished(event, error=e, upload=upload)
+                raise
+            self._request_finished(event, response, upload=upload)
+
+            answer = self._handleResponse(response)
+            if response.retries:
+                answer["retries"] = response.retries
+
+            self._update_cache(method, endpoint, cache_key, answer)
+            return answer
+
+        has_body = content is not None or files is not None or upload is not None
+        flight_key = self._flight_key(method, url, headers, has_body)
+        if flight_key is None:
+            answer = await fetch()
+        else:
+            answer, shared = await self._flights.do(flight_key, fetch)
+            if shared:
+                answer = copy.deepcopy(answer)
+
+        return self._models(endpoint, answer)
+
+    async def _send(self, method, url, endpoint, headers=None, **options):
+        """Sends a request with a valid access token. Retries the request according to the retry policy of the
+        client. The number of retries is set to the retries attribute of the response.
+
+        :param method: request method, uppercase string
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        :param headers: Overwrite HTTP-headers, dict
+        :param options: other arguments for the session request, e.g. files or content
+        :return: HTTP response, httpx.Response
+        """
+        retries = 0
+
+        while True:
+            try:
+                response = await self._send_authorized(method, url, endpoint, headers, **options)
+            except httpx.TransportError:
+                if not self.retry_policy.should_retry(method, retries):
+                    raise
+                wait = self.retry_policy.backoff(retries)
+            else:
+                retry_after = response.headers.get("Retry-After")
+                if not self.retry_policy.should_retry(method, retries, response.status_code, retry_after):
+                    response.retries = retries
+                    return response
+                wait = self.retry_policy.backoff(retries, retry_after)
+                await response.aclose()
+
+            retries += 1
+            await asyncio.sleep(wait)
+
+    async def _send_authorized(self, method, url, endpoint, headers=None, **options):
+        """Sends a request with a valid access token. If the token has expired anyway, refreshes it and sends the
+        request again with the new token.
+
+        :param method: request method, uppercase string
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        :param headers: Overwrite HTTP-headers, dict
+        :param options: other arguments for the session request, e.g. files or content
+        :return: HTTP response, httpx.Response
+        """
+        token = await self._token_manager.get()
+        response = await self._transmit(
+            method, url, endpoint, headers=self._request_headers(method, endpoint, headers, token), **options
+        )
+
+        # refresh token if out of date
+        if response.status_code == 401:
+            await response.aclose()
+            token = await self._token_manager.refresh(stale=token)
+            response = await self._transmit(
+                method, url, endpoint, headers=self._request_headers(method, endpoint, headers, token), **options
+            )
+
+        return response
+
+    async def _transmit(self, method, url, endpoint, **options):
+        """Sends one HTTP request when the rate limiter allows it
+
+        :param method: request method, uppercase string
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        :param options: other arguments for the session request, e.g. headers or content. A streaming body is given as
+                        upload
+        :return: HTTP response, httpx.Response
+        """
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.reserve(url, endpoint)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        upload = options.pop("upload", None)
+        if upload is not None:
+            encoder = upload.encoder()
+            options["headers"] = dict(options.get("headers") or {}, **{
+                "content-type": encoder.content_type,
+                "content-length": str(encoder.len),
+            })
+            options["content"] = _stream(iter_encoder(encoder))
+            try:
+                return await self.session.request(method, url, **options)
+            finally:
+                upload.close()
+
+        if options.pop("stream", False):
+            return await self.session.send(self.session.build_request(method, url, **options), stream=True)
+
+        return await self.session.request(method, url, **options)
+
+    async def _download(self, endpoint, target, chunk_size=65536):
+        """Streams a multipart attachment response and writes its file part to the target
+
+        :param endpoint: attachment endpoint, string
+        :param target: path or binary file object where the file is written
+        :param chunk_size: size of the chunks read from the response in bytes, integer
+        :return: Dictionary with keys: status, metadata and size. In error case there is message, dict
+        """
+        method = "GET"
+        url = self.api_url + endpoint
+
+        event = self._request_started(method, endpoint, url)
+        try:
+            response = await self._send(method, url, endpoint, stream=True)
+        except Exception as e:
+            self._request_finished(event, error=e)
+            raise
+
+        received = 0
+        try:
+            if response.status_code != 200 or not response.headers.get("Content-Type", "").startswith("multipart/"):
+                await response.aread()
+                answer = self._handleResponse(response)
+                self._request_finished(event, response)
+                return answer
+
+            download = AttachmentDownload(response.headers["Content-Type"], target, codec=self.codec)
+            try:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    received += len(chunk)
+                    download.feed(chunk)
+                answer = download.close()
+            except Exception as e:
+                download.abort()
+                self._request_finished(event, response, error=e, response_bytes=received)
+                raise
+        finally:
+            await response.aclose()
+
+        self._request_finished(event, response, response_bytes=received)
+        answer["status"] = response.status_code
+        return answer
+
+    async def _paginate(self, fetch, params, results_key="results", id_key="id", prefetch=False):
+        """Follows previousId pagination of a list endpoint
+
+        :param fetch: API method which fetches one page, e.g. self.get_invoices
+        :param params: query parameters of the first page, dict
+        :param results_key: key of the result list in the response content, string
+        :param id_key: key of the row identifier used as previousId, string
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: result rows, async generator of dicts
+        """
+        response = await fetch(**params)
+
+        while True:
+            rows = page_rows(response, results_key)
+            params = next_page_params(response, rows, params, id_key)
+
+            pending = asyncio.ensure_future(fetch(**params)) if prefetch and params is not None else None
+
+            try:
+                for row in rows:
+                    yield row
+            except GeneratorExit:
+                if pending:
+                    pending.cancel()
+                raise
+
+            if params is None:
+                return
+
+            response = await pending if pending else await fetch(**params)
+
+    async def _scan(self, fetch, params, startDate, endDate, shards=4, id_key="id", buffer_size=100):
+        """Pages disjoint date windows of a list endpoint concurrently and merges them in id order
+
+        :param fetch: API method which fetches one page, e.g. self.get_invoices
+        :param params: query parameters of the search, dict
+        :param startDate: start date of the scan (yyyy-MM-dd), string
+        :param endDate: end date of the scan (yyyy-MM-dd), string
+        :param shards: number of date windows paged concurrently, integer
+        :param id_key: key of the row identifier, string
+        :param buffer_size: maximum number of rows buffered per window, integer
+        :return: result rows ordered by id, async generator of dicts
+        """
+        done = object()
+        queues = []
+        tasks = []
+
+        async def produce(window, queue):
+            try:
+                async for row in self._paginate(fetch, window, id_key=id_key):
+                    await queue.put(row)
+            except Exception as error:
+                await queue.put(error)
+            else:
+                await queue.put(done)
+
+        for window in sharded_params(params, startDate, endDate, shards):
+            queue = asyncio.Queue(buffer_size)
+            queues.append(queue)
+            tasks.append(asyncio.ensure_future(produce(window, queue)))
+
+        async def pull(i):
+            item = await queues[i].get()
+            if isinstance(item, Exception):
+                raise item
+            if item is not done:
+                heapq.heappush(heads, (row_id(item, id_key), i, item))
+
+        heads = []
+        previous = None
+
+        try:
+            for i in range(len(queues)):
+                await pull(i)
+
+            while heads:
+                item_id, i, row = heapq.heappop(heads)
+                if item_id != previous:
+                    yield row
+                previous = item_id
+                await pull(i)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch_many(self, fetch, keys, max_workers=8, ordered=False):
+        """Calls an API method for each key concurrently, at most max_workers requests at a time
+
+        :param fetch: API method which fetches one key, e.g. self.get_invoice
+        :param keys: keys to fetch, iterable
+        :param max_workers: maximum number of concurrent requests, integer
+        :param ordered: yield the results in the order of the keys instead of completion order, bool
+        :return: async generator of (key, response) tuples
+        """
+        async def call(key):
+            try:
+                return key, await fetch(key)
+            except Exception as error:
+                return key, error_response(error)
+
+        keys = iter(keys)
+        pending = []
+
+        def fill():
+            while len(pending) < max_workers:
+                try:
+                    pending.append(asyncio.ensure_future(call(next(keys))))
+                except StopIteration:
+                    return
+
+        try:
+            fill()
+
+            while pending:
+                if ordered:
+                    finished = [pending.pop(0)]
+                    await finished[0]
+                else:
+                    finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in finished:
+                        pending.remove(task)
+
+                for task in finished:
+                    yield task.result()
+
+                fill()
+        finally:
+            for task in pending:
+                task.cancel()
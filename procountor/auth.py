@@ -0,0 +1,302 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TOKEN_LIFETIME = 3600
+
+
+def token_store_key(*parts):
+    """Returns a key for storing the token of the given credentials without exposing the credentials themselves
+
+    :param parts: values identifying the credentials, e.g. api url, client id and api key
+    :return: key, string
+    """
+
+    return hashlib.sha256("\n".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class MemoryTokenStore(object):
+    """Token store which shares tokens between clients of the same process"""
+
+    def __init__(self):
+        self._tokens = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def load(self, key):
+        """Returns the stored token
+
+        :param key: key of the credentials, string
+        :return: (token, expires_at) tuple or None
+        """
+        return self._tokens.get(key)
+
+    def save(self, key, token, expires_at):
+        """Stores a token
+
+        :param key: key of the credentials, string
+        :param token: access token, string
+        :param expires_at: unix time when the token expires, float
+        """
+        self._tokens[key] = (token, expires_at)
+
+    def delete(self, key):
+        """Removes a stored token
+
+        :param key: key of the credentials, string
+        """
+        self._tokens.pop(key, None)
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        """Exclusive lock for refreshing the token of the given credentials
+
+        :param key: key of the credentials, string
+        """
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            yield
+
+
+class FileTokenStore(MemoryTokenStore):
+    """Token store which shares tokens between processes through a JSON file. Token refreshes are serialized with
+    a lock file next to it, so processes using the same credentials request one token instead of one each. The file
+    contains valid access tokens and is readable only by its owner.
+
+    :param path: path to the token file, string
+    """
+
+    def __init__(self, path):
+        super(FileTokenStore, self).__init__()
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write(self, tokens):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".procountor-token-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+
+    def load(self, key):
+        entry = self._read().get(key)
+        return (entry["token"], entry["expires_at"]) if entry else None
+
+    def save(self, key, token, expires_at):
+        with self._file_lock():
+            tokens = self._read()
+            tokens[key] = {"token": token, "expires_at": expires_at}
+            self._write(tokens)
+
+    def delete(self, key):
+        with self._file_lock():
+            tokens = self._read()
+            if tokens.pop(key, None) is not None:
+                self._write(tokens)
+
+    @contextlib.contextmanager
+    def _file_lock(self, suffix=".lock"):
+        with open(self.path + suffix, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        with super(FileTokenStore, self).lock(key):
+            with self._file_lock(".{}.lock".format(key[:16])):
+                yield
+
+
+class SQLiteTokenStore(object):
+    """Token store which shares tokens between processes through an SQLite database. Token refreshes are serialized
+    with a write transaction, so processes using the same credentials request one token instead of one each.
+
+    :param path: path to the database file, string
+    :param timeout: seconds to wait for another process to finish its token refresh, float
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        with contextlib.closing(self._connect()) as connection:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS tokens (key TEXT PRIMARY KEY, token TEXT, expires_at REAL)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    @contextlib.contextmanager
+    def _connection(self):
+        # Inside lock() the locked connection must be used, another one would wait for the lock
+        locked = getattr(self._local, "connection", None)
+        if locked is not None:
+            yield locked
+            return
+
+        with contextlib.closing(self._connect()) as connection:
+            yield connection
+
+    def load(self, key):
+        with self._connection() as connection:
+            row = connection.execute("SELECT token, expires_at FROM tokens WHERE key = ?", (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def save(self, key, token, expires_at):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO tokens (key, token, expires_at) VALUES (?, ?, ?)", (key, token, expires_at)
+            )
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM tokens WHERE key = ?", (key,))
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        with contextlib.closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            self._local.connection = connection
+            try:
+                yield
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            finally:
+                self._local.connection = None
+
+
+class TokenManager(object):
+    """Keeps the access token of a client valid. The token is requested on first use and refreshed before it
+    expires. Concurrent refreshes from several threads are collapsed into a single token request. With a token
+    store the token is also shared with other clients and processes using the same credentials.
+
+    :param fetch: function which requests a new token and stores it with set(), e.g. client._get_token
+    :param refresh_margin: seconds before expiry when the token is refreshed, integer
+    :param store: token store, e.g. FileTokenStore or SQLiteTokenStore
+    :param key: key of the credentials in the token store, string
+    """
+
+    def __init__(self, fetch, refresh_margin=60, store=None, key=None):
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self.refresh_margin = refresh_margin
+        self.store = store
+        self.key = key
+        self.token = None
+        self.expires_at = 0
+
+    @property
+    def valid(self):
+        """Whether the token exists and doesn't need refreshing yet"""
+
+        return self.token is not None and time.time() < self.expires_at - self.refresh_margin
+
+    def _load(self):
+        """Takes the token from the store, if another client has stored one"""
+
+        entry = self.store.load(self.key) if self.store else None
+        if entry:
+            self.token, self.expires_at = entry
+
+    def _store_lock(self):
+        return self.store.lock(self.key) if self.store else _no_lock()
+
+    def get(self):
+        """Returns a valid access token, requesting or refreshing it first if needed
+
+        :return: access token, string
+        """
+
+        if self.valid:
+            return self.token
+
+        with self._lock:
+            if not self.valid:
+                self._load()
+            if not self.valid:
+                with self._store_lock():
+                    self._load()
+                    if not self.valid:
+                        self._fetch()
+            return self.token
+
+    def current(self):
+        """Returns the access token without requesting one, from the store if another client has stored it
+
+        :return: access token, string or None
+        """
+
+        if self.token is None:
+            self._load()
+        return self.token
+
+    def refresh(self, stale=None):
+        """Refreshes the access token. If the stale token is given and another thread or process has already
+        replaced it, the token is not requested again.
+
+        :param stale: the token which was rejected, string
+        :return: access token, string
+        """
+
+        with self._lock:
+            if stale is None or self.token == stale:
+                with self._store_lock():
+                    self._load()
+                    if stale is None or self.token == stale or not self.valid:
+                        self._fetch()
+            return self.token
+
+    def set(self, token, expires_in=None):
+        """Stores a new access token
+
+        :param token: access token, string
+        :param expires_in: seconds until the token expires, defaults to 3600, integer
+        """
+
+        self.expires_at = time.time() + int(expires_in or TOKEN_LIFETIME)
+        self.token = token
+
+        if self.store:
+            self.store.save(self.key, token, self.expires_at)
+
+    def invalidate(self):
+        """Forgets the access token, so that the next request gets a new one"""
+
+        self.token = None
+        self.expires_at = 0
+
+        if self.store:
+            self.store.delete(self.key)
+
+
+@contextlib.contextmanager
+def _no_lock():
+    yield
@@ -0,0 +1,57 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def error_response(error):
+    """Returns a response dict for a request which failed with an exception
+
+    :param error: raised exception
+    :return: Dictionary with keys: status (None), message and error, dict
+    """
+
+    return {"status": None, "message": str(error), "error": error}
+
+
+def fetch_many(fetch, keys, max_workers=8, ordered=False):
+    """Calls fetch for each key with bounded concurrency and yields the results as they complete. Keys are read
+    lazily, so at most 2 * max_workers requests are queued at a time. An exception raised for one key doesn't stop
+    the others; it is returned as the response of that key.
+
+    :param fetch: function which fetches one key, e.g. client.get_invoice
+    :param keys: keys to fetch, iterable
+    :param max_workers: maximum number of concurrent requests, integer
+    :param ordered: yield the results in the order of the keys instead of completion order, bool
+    :return: generator of (key, response) tuples
+    """
+
+    def call(key):
+        try:
+            return key, fetch(key)
+        except Exception as error:
+            return key, error_response(error)
+
+    keys = iter(keys)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def fill():
+            while len(pending) < 2 * max_workers:
+                try:
+                    pending.append(executor.submit(call, next(keys)))
+                except StopIteration:
+                    return
+
+        fill()
+
+        while pending:
+            if ordered:
+                finished = [pending.popleft()]
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pending.remove(future)
+
+            for future in finished:
+                yield future.result()
+
+            fill()
@@ -0,0 +1,169 @@
+import collections
+import contextlib
+import copy
+import decimal
+import json
+import sqlite3
+import threading
+import time
+
+# Time to live in seconds for responses of endpoints which change rarely. Keys are endpoint templates.
+DEFAULT_TTLS = {
+    "coa": 3600,
+    "company": 3600,
+    "currencies": 86400,
+    "currencies/company": 3600,
+    "dimensions": 600,
+    "dimensions/{id}": 600,
+    "fiscalyears": 3600,
+    "products/groups": 3600,
+    "sessioninfo": 300,
+    "vats/country": 86400,
+    "vats/default": 3600,
+}
+
+
+# Key of the objects which stand for Decimals in DiskCache, so that responses decoded with use_decimal are returned
+# from the cache with Decimals as well
+DECIMAL_KEY = "__decimal__"
+
+
+def _encode(value):
+    if isinstance(value, decimal.Decimal):
+        return {DECIMAL_KEY: str(value)}
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+def _decode(value):
+    if len(value) == 1 and DECIMAL_KEY in value:
+        return decimal.Decimal(value[DECIMAL_KEY])
+    return value
+
+
+class MemoryCache(object):
+    """In-memory response cache with time to live and least recently used eviction
+
+    :param max_size: maximum number of cached responses, integer
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns a cached value
+
+        :param key: cache key, string
+        :return: cached value or None if it is missing or expired
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, tag, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value, ttl, tag=None):
+        """Stores a value
+
+        :param key: cache key, string
+        :param value: value to cache, JSON serializable
+        :param ttl: time to live in seconds, integer
+        :param tag: tag for invalidating a group of values together, string
+        """
+
+        with self._lock:
+            self._entries[key] = (copy.deepcopy(value), tag, time.time() + ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tag):
+        """Removes all values with the given tag
+
+        :param tag: tag given when the values were stored, string
+        """
+
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] == tag]:
+                del self._entries[key]
+
+    def clear(self):
+        """Removes all values"""
+
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache(object):
+    """Response cache stored in an SQLite database, with time to live and least recently used eviction. The cache
+    survives restarts and can be shared between processes. Decimals are stored exactly and returned as Decimals.
+
+    :param path: path to the database file, string
+    :param max_size: maximum number of cached responses, integer
+    """
+
+    def __init__(self, path, max_size=10000):
+        self.path = path
+        self.max_size = max_size
+
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, tag TEXT, value TEXT, expires_at REAL, used_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_tag ON responses (tag)")
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+
+    @contextlib.contextmanager
+    def _connection(self):
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30.0)) as connection:
+            with connection:
+                yield connection
+
+    def get(self, key):
+        now = time.time()
+
+        with self._connection() as connection:
+            row = connection.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            if row[1] <= now:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+
+            connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+
+        return json.loads(row[0], object_hook=_decode)
+
+    def set(self, key, value, ttl, tag=None):
+        now = time.time()
+
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, tag, value, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, tag, json.dumps(value, default=_encode), now + ttl, now),
+            )
+            connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+
+    def invalidate(self, tag):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses WHERE tag = ?", (tag,))
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses")
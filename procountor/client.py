@@ -1,20 +1,29 @@
+import copy
 import os
-import json
 import re
+import time
 import requests
 from requests_toolbelt.multipart import decoder
 
-try:
-    from urllib.parse import urlparse, parse_qs, urlencode
-except ImportError:
-    from urlparse import urlparse, parse_qs
-    from urllib import urlencode
+from urllib.parse import urlencode
 
 from .api_methods import ApiMethods
+from .auth import TokenManager, token_store_key
+from .bulk import fetch_many
+from .cache import DEFAULT_TTLS
+from .codec import get_codec
+from .endpoints import endpoint_group, endpoint_template
+from .models import parse_response
+from .multipart import AttachmentDownload
+from .pagination import paginate, scan
+from .retry import RetryPolicy
+from .session import create_session
+from .singleflight import SingleFlight
+from .transport import HttpTransport
 
 
 class Client(ApiMethods):
-    """Class for Procountor accounting API
+    """Class for Procountor accounting API. The access token is requested on the first request.
 
     Following packages need to be installed:
      - requests
@@ -25,6 +34,39 @@ class Client(ApiMethods):
     :param redirect_uri: URI where redirected after authentication, string
     :param test_mode: Wether to use test api or real api, bool
     :param api_version: Cen be latest, supported or >= 20.01, string
+    :param session: HTTP session to use. Give the same session to several clients to share the connection pool.
+                    If neither a session nor a transport is given, the client creates its own, requests.Session
+    :param pool_connections: number of host pools in the client's own session, integer
+    :param pool_maxsize: maximum number of connections per host in the client's own session, integer
+    :param pool_block: wait for a free connection instead of opening an extra one when the pool of the client's own
+                       session is full, bool
+    :param keep_alive: keep connections of the client's own session open between requests, bool
+    :param host_limits: maximum number of connections for specific hosts in the client's own session, e.g.
+                        {"https://api.procountor.com": 20}, dict
+    :param token_refresh_margin: seconds before expiry when the access token is refreshed, integer
+    :param token_store: store for sharing the access token with other clients and processes using the same
+                        credentials, e.g. procountor.auth.FileTokenStore or procountor.auth.SQLiteTokenStore
+    :param cache: cache for responses of rarely changing endpoints, e.g. procountor.cache.MemoryCache or
+                  procountor.cache.DiskCache. Responses are not cached if not given
+    :param cache_ttls: time to live in seconds by endpoint template, e.g. {"coa": 600}. Overrides and extends
+                       procountor.cache.DEFAULT_TTLS, dict
+    :param retry_policy: policy for retrying throttled requests, server errors and connection errors. Defaults to
+                         procountor.retry.RetryPolicy(), use procountor.retry.NO_RETRY to disable retries
+    :param rate_limiter: client-side rate limiter, e.g. procountor.ratelimit.RateLimiter. Give the same limiter to
+                         several clients to share the request budget
+    :param codec: JSON codec for request and response bodies, e.g. procountor.codec.OrjsonCodec(use_decimal=True),
+                  or its name: 'json', 'orjson', 'ujson' or 'auto'. Defaults to the json module of the standard library
+    :param hooks: request hooks called before and after each request, e.g. procountor.metrics.MetricsRegistry(),
+                  list of procountor.metrics.Hook
+    :param coalesce: collapse identical concurrent GET requests into one request. Each caller gets its own copy of
+                     the response, bool
+    :param models: return invoices, ledger receipts, business partners and bank statement events as compact models
+                   of procountor.models instead of dicts, bool
+    :param host: API host, e.g. the url of a procountor.testing.StandInServer. Defaults to the test or production
+                 host by test_mode, string
+    :param transport: transport which sends the requests, e.g. procountor.transport.RecordingTransport or
+                      procountor.transport.ReplayTransport. Defaults to procountor.transport.HttpTransport over the
+                      session of the client. The session and pool options are not used with a transport
     """
 
     _endpoints = {
@@ -39,6 +81,10 @@ class Client(ApiMethods):
         },
     }
 
+    # Keeps the access token valid, and collapses identical concurrent requests. AsyncClient uses asyncio versions.
+    _token_manager_class = TokenManager
+    _single_flight_class = SingleFlight
+
     def __init__(
         self,
         api_key,
@@ -47,14 +93,91 @@ class Client(ApiMethods):
         redirect_uri,
         test_mode=True,
         api_version="supported",
+        session=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        keep_alive=True,
+        host_limits=None,
+        token_refresh_margin=60,
+        token_store=None,
+        cache=None,
+        cache_ttls=None,
+        retry_policy=None,
+        rate_limiter=None,
+        codec=None,
+        hooks=None,
+        coalesce=True,
+        models=False,
+        host=None,
+        transport=None,
+    ):
+        # With a transport, the client doesn't need a session of its own
+        self._owns_session = session is None and transport is None
+        if self._owns_session:
+            session = create_session(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+                keep_alive=keep_alive,
+                host_limits=host_limits,
+            )
+        self.session = session
+        self.transport = transport or HttpTransport(self.session)
+        self._configure(
+            api_key, client_id, client_secret, redirect_uri, test_mode, api_version, token_refresh_margin, token_store,
+            cache, cache_ttls, retry_policy, rate_limiter, codec, hooks, coalesce, models, host,
+        )
+
+    def _configure(
+        self, api_key, client_id, client_secret, redirect_uri, test_mode, api_version, token_refresh_margin,
+        token_store, cache, cache_ttls, retry_policy, rate_limiter, codec, hooks, coalesce, models, host,
     ):
+        """Sets the options which Client and AsyncClient share. The parameters are the same as in the class."""
+
         self.api_key = (api_key,)
         self.client_id = client_id
         self.client_secret = client_secret
         self.redirect_uri = redirect_uri
         self.test_mode = test_mode
+        self.host = host
         self.api_version = api_version
-        self._get_token()
+        self._token_manager = self._token_manager_class(
+            self._get_token,
+            refresh_margin=token_refresh_margin,
+            store=token_store,
+            key=self._token_store_key(),
+        )
+        self.cache = cache
+        self.cache_ttls = dict(DEFAULT_TTLS, **(cache_ttls or {}))
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.codec = get_codec(codec)
+        self.models = models
+        self.hooks = list(hooks or ())
+        self._flights = self._single_flight_class() if coalesce else None
+
+    @property
+    def access_token(self):
+        """Valid access token. The token is refreshed before it expires."""
+        return self._token_manager.get()
+
+    @access_token.setter
+    def access_token(self, token):
+        self._token_manager.set(token)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the connections of the client. A session or transport given to the client is left open, because
+        other clients may still use it."""
+
+        if self._owns_session:
+            self.session.close()
 
     @property
     def api_url(self):
@@ -72,9 +195,16 @@ class Client(ApiMethods):
 
         return "{}/{}/".format(self.api_host, version)
 
+    def _token_store_key(self):
+        """Returns the key of the client's credentials in a token store
+
+        :return: key, string
+        """
+        return token_store_key(self.api_url, self.client_id, self.api_key[0])
+
     @property
     def api_host(self):
-        host = Client._endpoints["hosts"]["test" if self.test_mode else "production"]
+        host = self.host or Client._endpoints["hosts"]["test" if self.test_mode else "production"]
         return host
 
     def _create_endpoint(self, endpoint, queries={}):
@@ -99,15 +229,61 @@ class Client(ApiMethods):
                 "Given params are not dict. The type was {}".format(type(url_dict))
             )
 
+    def _paginate(self, fetch, params, results_key="results", id_key="id", prefetch=False):
+        """Follows previousId pagination of a list endpoint
+
+        :param fetch: API method which fetches one page, e.g. self.get_invoices
+        :param params: query parameters of the first page, dict
+        :param results_key: key of the result list in the response content, string
+        :param id_key: key of the row identifier used as previousId, string
+        :param prefetch: fetch the next page in background while the current page is consumed, bool
+        :return: result rows, generator of dicts
+        """
+        return paginate(fetch, params, results_key=results_key, id_key=id_key, prefetch=prefetch)
+
+    def _scan(self, fetch, params, startDate, endDate, shards=4, id_key="id"):
+        """Pages disjoint date windows of a list endpoint concurrently and merges them in id order
+
+        :param fetch: API method which fetches one page, e.g. self.get_invoices
+        :param params: query parameters of the search, dict
+        :param startDate: start date of the scan (yyyy-MM-dd), string
+        :param endDate: end date of the scan (yyyy-MM-dd), string
+        :param shards: number of date windows paged concurrently, integer
+        :param id_key: key of the row identifier, string
+        :return: result rows ordered by id, generator of dicts
+        """
+        return scan(fetch, params, startDate, endDate, shards=shards, id_key=id_key)
+
+    def _fetch_many(self, fetch, keys, max_workers=8, ordered=False):
+        """Calls an API method for each key concurrently in a thread pool
+
+        :param fetch: API method which fetches one key, e.g. self.get_invoice
+        :param keys: keys to fetch, iterable
+        :param max_workers: maximum number of concurrent requests, integer
+        :param ordered: yield the results in the order of the keys instead of completion order, bool
+        :return: generator of (key, response) tuples
+        """
+        return fetch_many(fetch, keys, max_workers=max_workers, ordered=ordered)
+
     def invalidate_token(self):
-        """Method invalidates the access token"""
+        """Method invalidates the access token. After a successful logout the token is forgotten, also from the
+        token store. Nothing is requested if the client has no token yet.
+
+        :return: Dictionary with keys: 'status', 'headers' and 'content', or None if there was no token, dict
+        """
+
+        if self._token_manager.current() is None:
+            return None
 
         method = "POST"
         endpoint = "logout"
         headers = {"authorization": "Bearer " + self.access_token}
         url = "{}/{}".format(self.api_host, endpoint)
 
-        return self.request(method, endpoint, headers, url)
+        response = self.request(method, endpoint, headers, url)
+        if response.get("status") == 200:
+            self._token_manager.invalidate()
+        return response
 
     def _get_token(self):
         """Makes a request and returns an access token. Access token is valid for
@@ -116,6 +292,24 @@ class Client(ApiMethods):
         :return: granted tokens, str
         """
 
+        url, params, headers = self._token_request()
+
+        event = self._request_started("POST", "oauth/token", url)
+        try:
+            response = self.transport.post(url, data=params, headers=headers)
+        except Exception as e:
+            self._request_finished(event, error=e)
+            raise
+        self._request_finished(event, response)
+
+        return self._read_token(response)
+
+    def _token_request(self):
+        """Builds the request for getting an access token
+
+        :return: url, form parameters and headers for the token request, tuple
+        """
+
         params = {
             "grant_type": "client_credentials",
             "client_id": self.client_id,
@@ -126,8 +320,15 @@ class Client(ApiMethods):
 
         headers = {"content-type": "application/x-www-form-urlencoded"}
 
-        url = self.api_url + "oauth/token/"
-        response = requests.post(url, data=params, headers=headers)
+        return self.api_url + "oauth/token/", params, headers
+
+    def _read_token(self, response):
+        """Reads the access token from the token response and stores it to the client
+
+        :param response: response of the token request
+        :return: granted tokens, str
+        """
+
         status_code = response.status_code
 
         if status_code != 200:
@@ -157,7 +358,7 @@ class Client(ApiMethods):
                 + json_content
             )
 
-        self.access_token = access_token
+        self._token_manager.set(access_token, json_content.get("expires_in"))
         return access_token
 
     def _handleResponse(self, response):
@@ -176,9 +377,9 @@ class Client(ApiMethods):
                         response
                     ).parts
                     answer["content"] = filebytes.content
-                    answer["metadata"] = json.loads(meta.content.decode("utf-8"))
+                    answer["metadata"] = self.codec.loads(meta.content)
                 else:
-                    answer["content"] = response.json()
+                    answer["content"] = self.codec.loads(response.content)
             except:
                 answer["message"] = response.text
         else:
@@ -187,65 +388,356 @@ class Client(ApiMethods):
         return answer
 
     def request(
-        self, method, endpoint, headers=None, url=None, files=None, *args, **kwargs
+        self, method, endpoint, headers=None, url=None, files=None, upload=None, *args, **kwargs
     ):
         """Method to make HTTP requests over Procountor REST API
 
         :param method: wanted request method, uppercase string
         :param endpoint: wanted REST API endpoint, string
         :param headers: Overwrite HTTP-headers, dict
+        :param upload: streaming multipart body, AttachmentUpload
         :param kwargs: query parameters to pass to Procountor, dict
         :return: response from rest server, dict
         """
-        headers = headers or self._headers(method, endpoint)
         url = url or self.api_url + endpoint
 
+        cache_key, cached = self._cached_response(method, endpoint, url)
+        if cached is not None:
+            return self._models(endpoint, cached)
+
         # Test environment (Microsoft-Azure-Application-Gateway)
         # doesn't like if there is a json body in (for ex.) GET method.
-        json = None if len(kwargs) == 0 else kwargs
+        data = None if len(kwargs) == 0 else self.codec.dumps(kwargs)
+
+        def fetch():
+            event = self._request_started(method, endpoint, url, data)
+            try:
+                response = self._send(method, url, endpoint, headers, files=files, data=data, upload=upload)
+            except Exception as e:
+                self._request_finished(event, error=e, upload=upload)
+                raise
+            self._request_finished(event, response, upload=upload)
+
+            answer = self._handleResponse(response)
+            if response.retries:
+                answer["retries"] = response.retries
+
+            self._update_cache(method, endpoint, cache_key, answer)
+            return answer
+
+        has_body = data is not None or files is not None or upload is not None
+        flight_key = self._flight_key(method, url, headers, has_body)
+        if flight_key is None:
+            answer = fetch()
+        else:
+            answer, shared = self._flights.do(flight_key, fetch)
+            if shared:
+                answer = copy.deepcopy(answer)
+
+        return self._models(endpoint, answer)
+
+    def _download(self, endpoint, target, chunk_size=65536):
+        """Streams a multipart attachment response and writes its file part to the target
+
+        :param endpoint: attachment endpoint, string
+        :param target: path or binary file object where the file is written
+        :param chunk_size: size of the chunks read from the response in bytes, integer
+        :return: Dictionary with keys: status, metadata and size. In error case there is message, dict
+        """
+        method = "GET"
+        url = self.api_url + endpoint
+
+        event = self._request_started(method, endpoint, url)
+        try:
+            response = self._send(method, url, endpoint, stream=True)
+        except Exception as e:
+            self._request_finished(event, error=e)
+            raise
+
+        received = 0
+        try:
+            if response.status_code != 200 or not response.headers.get("Content-Type", "").startswith("multipart/"):
+                answer = self._handleResponse(response)
+                self._request_finished(event, response)
+                return answer
+
+            download = AttachmentDownload(response.headers["Content-Type"], target, codec=self.codec)
+            try:
+                for chunk in response.iter_content(chunk_size):
+                    received += len(chunk)
+                    download.feed(chunk)
+                answer = download.close()
+            except Exception as e:
+                download.abort()
+                self._request_finished(event, response, error=e, response_bytes=received)
+                raise
+        finally:
+            response.close()
+
+        self._request_finished(event, response, response_bytes=received)
+        answer["status"] = response.status_code
+        return answer
+
+    def _request_started(self, method, endpoint, url, body=None):
+        """Calls the before_request hooks of the client
+
+        :param method: request method, string
+        :param endpoint: request endpoint, string
+        :param url: request url, string
+        :param body: JSON body of the request, bytes
+        :return: request event, or None if the client has no hooks, dict
+        """
+
+        if not self.hooks:
+            return None
+
+        event = {
+            "method": method,
+            "endpoint": endpoint_template(endpoint),
+            "url": url,
+            "started": time.time(),
+            "request_bytes": len(body) if body else 0,
+        }
+        for hook in self.hooks:
+            hook.before_request(event)
+        return event
+
+    def _request_finished(self, event, response=None, error=None, upload=None, response_bytes=None):
+        """Completes the request event and calls the after_request hooks of the client
+
+        :param event: request event from _request_started(), dict
+        :param response: HTTP response, if the request didn't fail
+        :param error: exception which failed the request
+        :param upload: streaming multipart body of the request, AttachmentUpload
+        :param response_bytes: size of a streamed response body. Defaults to the size of the response content, integer
+        """
+
+        if event is None:
+            return
+
+        if response_bytes is None:
+            response_bytes = 0 if response is None else len(response.content)
+
+        event["seconds"] = time.time() - event["started"]
+        event["status"] = None if response is None else response.status_code
+        event["error"] = error
+        event["response_bytes"] = response_bytes
+        event["retries"] = getattr(response, "retries", 0)
+        if upload is not None and upload.size:
+            event["request_bytes"] = upload.size
+
+        for hook in self.hooks:
+            hook.after_request(event)
 
-        response = requests.request(
-            method, url, headers=headers, files=files, json=json
+    def _flight_key(self, method, url, headers, has_body):
+        """Returns the key which identical concurrent requests share, if the request can be coalesced. Only GET
+        requests without a body are coalesced, and only with the same credentials, url and headers.
+
+        :param method: request method, string
+        :param url: request url, string
+        :param headers: Overwrite HTTP-headers, dict
+        :param has_body: whether the request has a body, bool
+        :return: key, or None if the request is not coalesced, tuple
+        """
+
+        if self._flights is None or method != "GET" or has_body:
+            return None
+
+        return self._token_store_key(), url, tuple(sorted((headers or {}).items()))
+
+    def _models(self, endpoint, answer):
+        """Returns the response with models of procountor.models instead of dicts, if the client uses models
+
+        :param endpoint: request endpoint, string
+        :param answer: handled response, dict
+        :return: response, dict
+        """
+
+        return parse_response(endpoint, answer) if self.models else answer
+
+    def _cache_tag(self, endpoint):
+        return "{} {}".format(self._token_store_key(), endpoint_group(endpoint))
+
+    def _cached_response(self, method, endpoint, url):
+        """Returns the cached response of a request, if the endpoint is cacheable
+
+        :param method: request method, string
+        :param endpoint: request endpoint, string
+        :param url: request url, string
+        :return: cache key (None if the request is not cacheable) and cached response (None if not cached), tuple
+        """
+
+        if self.cache is None or method != "GET" or endpoint_template(endpoint) not in self.cache_ttls:
+            return None, None
+
+        key = "{} {}".format(self._token_store_key(), url)
+        return key, self.cache.get(key)
+
+    def _update_cache(self, method, endpoint, key, answer):
+        """Stores a successful response of a cacheable request. Any other than GET request invalidates cached
+        responses of the same resource group, e.g. update_dimension invalidates get_dimensions.
+
+        :param method: request method, string
+        :param endpoint: request endpoint, string
+        :param key: cache key from _cached_response(), string
+        :param answer: handled response, dict
+        """
+
+        if self.cache is None:
+            return
+
+        if method != "GET":
+            self.cache.invalidate(self._cache_tag(endpoint))
+        elif key is not None and answer["status"] == 200 and "content" in answer and "metadata" not in answer:
+            self.cache.set(key, answer, self.cache_ttls[endpoint_template(endpoint)], self._cache_tag(endpoint))
+
+    def invalidate_cache(self, group=None):
+        """Removes cached responses of the client
+
+        :param group: resource group to invalidate, e.g. "dimensions". All groups if not given, string
+        """
+
+        if self.cache is None:
+            return
+
+        groups = [group] if group else set(endpoint_group(template) for template in self.cache_ttls)
+        for cached_group in groups:
+            self.cache.invalidate(self._cache_tag(cached_group))
+
+    def _send(self, method, url, endpoint, headers=None, **options):
+        """Sends a request with a valid access token. Retries the request according to the retry policy of the
+        client. The number of retries is set to the retries attribute of the response.
+
+        :param method: request method, uppercase string
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        :param headers: Overwrite HTTP-headers, dict
+        :param options: other arguments for the session request, e.g. files or data
+        :return: HTTP response, requests.Response
+        """
+        retries = 0
+
+        while True:
+            try:
+                response = self._send_authorized(method, url, endpoint, headers, **options)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not self.retry_policy.should_retry(method, retries):
+                    raise
+                wait = self.retry_policy.backoff(retries)
+            else:
+                retry_after = response.headers.get("Retry-After")
+                if not self.retry_policy.should_retry(method, retries, response.status_code, retry_after):
+                    response.retries = retries
+                    return response
+                wait = self.retry_policy.backoff(retries, retry_after)
+                response.close()
+
+            retries += 1
+            time.sleep(wait)
+
+    def _send_authorized(self, method, url, endpoint, headers=None, **options):
+        """Sends a request with a valid access token. If the token has expired anyway, refreshes it and sends the
+        request again with the new token.
+
+        :param method: request method, uppercase string
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        :param headers: Overwrite HTTP-headers, dict
+        :param options: other arguments for the session request, e.g. files or data
+        :return: HTTP response, requests.Response
+        """
+        token = self.access_token
+        response = self._transmit(
+            method, url, endpoint, headers=self._request_headers(method, endpoint, headers, token), **options
         )
 
         # refresh token if out of date
         if response.status_code == 401:
-            self.access_token = self._get_token()
-            response = requests.request(
-                method, url, headers=headers, files=files, json=json
+            response.close()
+            token = self._token_manager.refresh(stale=token)
+            response = self._transmit(
+                method, url, endpoint, headers=self._request_headers(method, endpoint, headers, token), **options
             )
 
-        return self._handleResponse(response)
+        return response
+
+    def _transmit(self, method, url, endpoint, **options):
+        """Sends one HTTP request when the rate limiter allows it
+
+        :param method: request method, uppercase string
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        :param options: other arguments for the session request, e.g. headers or data. A streaming body is given as
+                        upload
+        :return: HTTP response, requests.Response
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url, endpoint)
+
+        upload = options.pop("upload", None)
+        if upload is None:
+            return self.transport.request(method, url, **options)
+
+        encoder = upload.encoder()
+        options["headers"] = dict(options.get("headers") or {}, **{"content-type": encoder.content_type})
+        options["data"] = encoder
+        try:
+            return self.transport.request(method, url, **options)
+        finally:
+            upload.close()
+
+    def _request_headers(self, method, endpoint, headers, token):
+        """Returns headers for a request with the given access token. Given headers are used as they are, except
+        for the authorization header.
 
-    def _headers(self, method, endpoint):
+        :param method: request method, string
+        :param endpoint: request endpoint, string
+        :param headers: Overwrite HTTP-headers, dict
+        :param token: access token, string
+        :return: headers for request, dict
+        """
+
+        if not headers:
+            return self._headers(method, endpoint, token)
+
+        headers = dict(headers)
+        if "authorization" in headers:
+            headers["authorization"] = "Bearer {}".format(token)
+
+        return headers
+
+    def _headers(self, method, endpoint, token=None):
         """Method returns correct headers for request
 
         :param method: request method, string
         :param endpoint: request endpoint, string
+        :param token: access token, defaults to the current token of the client, string
         :return: headers for request, dict
         """
 
+        authorization = "Bearer {}".format(token or self.access_token)
+
         if "attachments" in endpoint:
             if method == "GET":
                 headers = {
                     "content-type": "multipart/mixed",
-                    "authorization": "Bearer {}".format(self.access_token),
+                    "authorization": authorization,
                 }
             elif method == "POST":
                 headers = {
                     # can't put 'content-type': 'multipart/form-data' here as documentation says. Requests generates it
                     # automatically.
-                    "authorization": "Bearer {}".format(self.access_token),
+                    "authorization": authorization,
                 }
             else:
                 headers = {
                     "content-type": "application/json",
-                    "authorization": "Bearer {}".format(self.access_token),
+                    "authorization": authorization,
                 }
         else:
             headers = {
                 "content-type": "application/json",
-                "authorization": "Bearer {}".format(self.access_token),
+                "authorization": authorization,
             }
 
         return headers
@@ -0,0 +1,153 @@
+import decimal
+import json
+
+from .models import Model
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _default(value):
+    """Encodes Decimals as JSON numbers and models as objects. A Decimal is encoded only if the number survives the
+    conversion exactly, which is the case for amounts and rates with up to 15 significant digits."""
+
+    if isinstance(value, Model):
+        return value.to_dict()
+
+    if isinstance(value, decimal.Decimal):
+        number = float(value)
+        if decimal.Decimal(repr(number)) != value:
+            raise ValueError("Decimal {} cannot be encoded exactly as a JSON number".format(value))
+        return number
+
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+def _decimals(value):
+    """Converts the floats of a decoded document to Decimals using their shortest representation"""
+
+    if isinstance(value, float):
+        return decimal.Decimal(repr(value))
+    if isinstance(value, dict):
+        return dict((key, _decimals(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_decimals(item) for item in value]
+    return value
+
+
+class JsonCodec(object):
+    """JSON codec using the json module of the standard library. Codecs decode response bodies and encode request
+    bodies and attachment metadata of a client.
+
+    With use_decimal, numbers with a fraction are decoded as Decimals, and Decimals are encoded as numbers.
+
+    :param use_decimal: decode amounts as Decimals, bool
+    """
+
+    name = "json"
+
+    def __init__(self, use_decimal=False):
+        self.use_decimal = use_decimal
+
+    def loads(self, data):
+        """Decodes a JSON document
+
+        :param data: document, bytes or string
+        :return: decoded value
+        """
+
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        if self.use_decimal:
+            return json.loads(data, parse_float=decimal.Decimal)
+        return json.loads(data)
+
+    def dumps(self, value):
+        """Encodes a value as a JSON document
+
+        :param value: value to encode
+        :return: document, UTF-8 encoded bytes
+        """
+
+        return json.dumps(value, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class OrjsonCodec(JsonCodec):
+    """JSON codec using orjson. With use_decimal, decoded floats are converted to Decimals by their shortest
+    representation, which is exact for amounts and rates with up to 15 significant digits.
+
+    :param use_decimal: decode amounts as Decimals, bool
+    """
+
+    name = "orjson"
+
+    def __init__(self, use_decimal=False):
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires orjson. Install it with: pip install orjson")
+        super(OrjsonCodec, self).__init__(use_decimal)
+
+    def loads(self, data):
+        value = orjson.loads(data)
+        return _decimals(value) if self.use_decimal else value
+
+    def dumps(self, value):
+        return orjson.dumps(value, default=_default)
+
+
+class UjsonCodec(JsonCodec):
+    """JSON codec using ujson. With use_decimal, decoded floats are converted to Decimals like in OrjsonCodec.
+
+    :param use_decimal: decode amounts as Decimals, bool
+    """
+
+    name = "ujson"
+
+    def __init__(self, use_decimal=False):
+        if ujson is None:
+            raise ImportError("UjsonCodec requires ujson. Install it with: pip install ujson")
+        super(UjsonCodec, self).__init__(use_decimal)
+
+    def loads(self, data):
+        value = ujson.loads(data)
+        return _decimals(value) if self.use_decimal else value
+
+    def dumps(self, value):
+        return ujson.dumps(value, default=_default, ensure_ascii=False).encode("utf-8")
+
+
+CODECS = {
+    "json": JsonCodec,
+    "orjson": OrjsonCodec,
+    "ujson": UjsonCodec,
+}
+
+
+def get_codec(codec=None, use_decimal=False):
+    """Returns a codec
+
+    :param codec: codec, or its name: 'json', 'orjson', 'ujson', or 'auto' for the fastest installed one. Defaults
+                  to 'json', codec or string
+    :param use_decimal: decode amounts as Decimals, used with a name, bool
+    :return: codec, JsonCodec
+    """
+
+    if codec is None:
+        codec = "json"
+
+    if not isinstance(codec, str):
+        return codec
+
+    if codec == "auto":
+        codec = "orjson" if orjson is not None else "ujson" if ujson is not None else "json"
+
+    try:
+        return CODECS[codec](use_decimal=use_decimal)
+    except KeyError:
+        raise ValueError("Unknown JSON codec {}, valid values are {}".format(codec, ", ".join(sorted(CODECS))))
@@ -0,0 +1,35 @@
+import re
+
+_ID_SEGMENT = re.compile(r"^[0-9]+$")
+
+
+def endpoint_path(endpoint):
+    """Returns the path of an endpoint without leading slash and query string, e.g. "invoices/123"
+
+    :param endpoint: request endpoint, string
+    :return: path, string
+    """
+
+    return endpoint.split("?", 1)[0].strip("/")
+
+
+def endpoint_template(endpoint):
+    """Returns the endpoint path with identifiers replaced by a placeholder, e.g. "invoices/{id}"
+
+    :param endpoint: request endpoint, string
+    :return: templated path, string
+    """
+
+    return "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment for segment in endpoint_path(endpoint).split("/")
+    )
+
+
+def endpoint_group(endpoint):
+    """Returns the resource group of an endpoint, e.g. "dimensions" for "/dimensions/12/items"
+
+    :param endpoint: request endpoint, string
+    :return: group, string
+    """
+
+    return endpoint_path(endpoint).split("/", 1)[0]
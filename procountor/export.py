@@ -0,0 +1,446 @@
+import decimal
+import os
+
+from .models import Model
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Columns of the exported tables as (name, Arrow type, source keys) tuples. A source key is a dotted path into the
+# record, and the first key found is used. Unknown keys of the records are left out and missing values are null,
+# so that the schemas stay the same whatever the API returns.
+#
+# Amounts are exported as decimal128 with the precision and scale of AMOUNT_TYPE, so that their sums are exact, and
+# they are rounded to the scale. Quantities and percentages are float64.
+AMOUNT_TYPE = (38, 6)
+
+TABLES = {
+    "invoices": (
+        ("id", "int64", ("id",)),
+        ("invoiceNumber", "int64", ("invoiceNumber",)),
+        ("type", "string", ("type",)),
+        ("status", "string", ("status",)),
+        ("partnerId", "int64", ("partnerId",)),
+        ("counterPartyName", "string", ("counterParty.counterPartyAddress.name", "counterParty.name", "name")),
+        ("date", "date32", ("date",)),
+        ("dueDate", "date32", ("paymentInfo.dueDate", "dueDate")),
+        ("currency", "string", ("paymentInfo.currency", "currency")),
+        ("totalAmount", "decimal128", ("totalAmount", "amount")),
+        ("version", "string", ("version",)),
+    ),
+    "invoice_rows": (
+        ("invoiceId", "int64", ("invoiceId",)),
+        ("row", "int32", ("row",)),
+        ("productId", "int64", ("productId",)),
+        ("product", "string", ("product",)),
+        ("productCode", "string", ("productCode",)),
+        ("quantity", "float64", ("quantity",)),
+        ("unit", "string", ("unit",)),
+        ("unitPrice", "decimal128", ("unitPrice",)),
+        ("discountPercent", "float64", ("discountPercent",)),
+        ("vatPercent", "float64", ("vatPercent",)),
+        ("comment", "string", ("comment",)),
+        ("startDate", "date32", ("startDate",)),
+        ("endDate", "date32", ("endDate",)),
+    ),
+    "ledger_receipts": (
+        ("receiptId", "int64", ("receiptId",)),
+        ("type", "string", ("type",)),
+        ("status", "string", ("status",)),
+        ("name", "string", ("name",)),
+        ("receiptDate", "date32", ("receiptDate",)),
+        ("invoiceId", "int64", ("invoiceId",)),
+        ("vatType", "string", ("vatType",)),
+        ("version", "string", ("version",)),
+    ),
+    "ledger_transactions": (
+        ("receiptId", "int64", ("receiptId",)),
+        ("row", "int32", ("row",)),
+        ("transactionType", "string", ("transactionType",)),
+        ("account", "string", ("account",)),
+        ("accountingValue", "decimal128", ("accountingValue",)),
+        ("vatPercent", "float64", ("vatPercent",)),
+        ("vatType", "string", ("vatType",)),
+        ("description", "string", ("description",)),
+    ),
+    "bank_statements": (
+        ("id", "int64", ("id",)),
+        ("accountNumber", "string", ("accountNumber",)),
+        ("startDate", "date32", ("startDate",)),
+        ("endDate", "date32", ("endDate",)),
+        ("currency", "string", ("currency",)),
+        ("numberOfDeposits", "int64", ("numberOfDeposits",)),
+        ("depositSum", "decimal128", ("depositSum",)),
+        ("numberOfWithdrawals", "int64", ("numberOfWithdrawals",)),
+        ("withdrawalSum", "decimal128", ("withdrawalSum",)),
+        ("startBalance", "decimal128", ("startBalance",)),
+        ("endBalance", "decimal128", ("endBalance",)),
+    ),
+    "bank_statement_events": (
+        ("statementId", "int64", ("statementId",)),
+        ("id", "int64", ("id",)),
+        ("parentId", "int64", ("parentId",)),
+        ("payDate", "date32", ("payDate",)),
+        ("valueDate", "date32", ("valueDate",)),
+        ("sum", "decimal128", ("sum",)),
+        ("accountNumber", "string", ("accountNumber",)),
+        ("name", "string", ("name",)),
+        ("explanationCode", "int64", ("explanationCode",)),
+        ("archiveCode", "string", ("archiveCode",)),
+        ("message", "string", ("message",)),
+        ("reference", "string", ("reference",)),
+        ("allocated", "bool_", ("allocated",)),
+        ("invoiceId", "int64", ("invoiceId",)),
+        ("productId", "int64", ("productId",)),
+        ("endToEndId", "string", ("endToEndId",)),
+    ),
+    "reference_payments": (
+        ("id", "int64", ("id",)),
+        ("accountNumber", "string", ("accountNumber",)),
+        ("valueDate", "date32", ("valueDate",)),
+        ("paymentDate", "date32", ("paymentDate",)),
+        ("sum", "decimal128", ("sum",)),
+        ("name", "string", ("name",)),
+        ("bankReference", "string", ("bankReference",)),
+        ("archiveCode", "string", ("archiveCode",)),
+        ("allocated", "bool_", ("allocated",)),
+        ("invoiceId", "int64", ("invoiceId",)),
+    ),
+}
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise ImportError("Export requires pyarrow. Install it with: pip install Procountor[export]")
+
+
+def schema(table):
+    """Returns the Arrow schema of an exported table
+
+    :param table: table name, one of the keys of TABLES, string
+    :return: pyarrow.Schema
+    """
+
+    _require_pyarrow()
+    return pyarrow.schema([(name, _type(type)) for name, type, _ in TABLES[table]])
+
+
+def _type(type):
+    return pyarrow.decimal128(*AMOUNT_TYPE) if type == "decimal128" else getattr(pyarrow, type)()
+
+
+def _decimal(value):
+    """Converts an amount to a Decimal rounded to the scale of AMOUNT_TYPE. Floats are converted by their shortest
+    representation."""
+
+    if not isinstance(value, decimal.Decimal):
+        value = decimal.Decimal(repr(value) if isinstance(value, float) else value)
+    return value.quantize(decimal.Decimal(1).scaleb(-AMOUNT_TYPE[1]), rounding=decimal.ROUND_HALF_EVEN)
+
+
+def _record(record):
+    """Returns a record as a dict, also when the client returns procountor.models instances"""
+
+    return record.to_dict() if isinstance(record, Model) else record
+
+
+def _value(record, keys):
+    for key in keys:
+        value = record
+        for part in key.split("."):
+            if not isinstance(value, dict) or part not in value:
+                value = None
+                break
+            value = value[part]
+        if value is not None:
+            return value
+    return None
+
+
+class _Columns(object):
+    """Rows of a table collected into columns, converted to a record batch when full"""
+
+    def __init__(self, table):
+        self.table = table
+        self.columns = TABLES[table]
+        self.schema = schema(table)
+        self.clear()
+
+    def clear(self):
+        self.values = [[] for _ in self.columns]
+
+    def __len__(self):
+        return len(self.values[0])
+
+    def append(self, record):
+        record = _record(record)
+        for values, (_, type, keys) in zip(self.values, self.columns):
+            value = _value(record, keys)
+            if type == "date32" and value is not None:
+                value = value[:10]
+            elif type == "decimal128" and value is not None:
+                value = _decimal(value)
+            elif isinstance(value, decimal.Decimal):
+                value = float(value)
+            values.append(value)
+
+    def batch(self):
+        arrays = []
+        for values, field in zip(self.values, self.schema):
+            if field.type == pyarrow.date32():
+                arrays.append(pyarrow.array(values, pyarrow.string()).cast(field.type))
+            else:
+                arrays.append(pyarrow.array(values, field.type))
+
+        self.clear()
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+def record_batches(records, table, batch_size=10000):
+    """Converts records to Arrow record batches with the schema of the table, batch_size records at a time
+
+    :param records: records like in the results of the API, iterable of dicts or procountor.models instances
+    :param table: table name, one of the keys of TABLES, string
+    :param batch_size: maximum number of rows in a batch, integer
+    :return: generator of pyarrow.RecordBatch
+    """
+
+    columns = _Columns(table)
+    for record in records:
+        columns.append(record)
+        if len(columns) >= batch_size:
+            yield columns.batch()
+
+    if len(columns):
+        yield columns.batch()
+
+
+def invoice_rows(invoice):
+    """Normalizes the rows of an invoice into records of the invoice_rows table
+
+    :param invoice: invoice like in the content of get_invoice(), dict or procountor.models.Invoice
+    :return: generator of dicts
+    """
+
+    invoice = _record(invoice)
+    for row, invoice_row in enumerate(invoice.get("invoiceRows") or []):
+        yield dict(invoice_row, invoiceId=invoice["id"], row=row)
+
+
+def ledger_transactions(receipt):
+    """Normalizes the transactions of a ledger receipt into records of the ledger_transactions table
+
+    :param receipt: ledger receipt like in the content of get_ledger_receipt(), dict or
+                    procountor.models.LedgerReceipt
+    :return: generator of dicts
+    """
+
+    receipt = _record(receipt)
+    for row, transaction in enumerate(receipt.get("transactions") or []):
+        yield dict(transaction, receiptId=receipt["receiptId"], row=row)
+
+
+def bank_statement_events(statement):
+    """Normalizes the events of a bank statement and their child events into records of the bank_statement_events
+    table. Child events refer to their parent event with parentId.
+
+    :param statement: bank statement like in the results of get_bank_statements(), dict
+    :return: generator of dicts
+    """
+
+    stack = [(event, None) for event in reversed(statement.get("events") or [])]
+    while stack:
+        event, parentId = stack.pop()
+        event = _record(event)
+        yield dict(event, statementId=statement["id"], parentId=parentId)
+        stack.extend((child, event.get("id")) for child in reversed(event.get("events") or []))
+
+
+class ParquetExport(object):
+    """Writes exported tables as Parquet files to a directory, one file per table. Rows are written in record batches
+    as they are added, so that the whole export is never held in memory.
+
+    :param directory: directory for the files, string
+    :param tables: tables whose files are written even if they get no rows, iterable of strings
+    :param batch_size: number of rows in a record batch, integer
+    :param compression: Parquet compression codec, string
+    """
+
+    def __init__(self, directory, tables=(), batch_size=10000, compression="snappy"):
+        _require_pyarrow()
+        self.directory = directory
+        self.batch_size = batch_size
+        self.compression = compression
+        self.rows = {}
+        self._columns = {}
+        self._writers = {}
+
+        for table in tables:
+            self._table(table)
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def path(self, table):
+        """Returns the path of the file of a table
+
+        :param table: table name, string
+        :return: path, string
+        """
+
+        return os.path.join(self.directory, "{}.parquet".format(table))
+
+    def write(self, table, record):
+        """Adds a row to a table
+
+        :param table: table name, one of the keys of TABLES, string
+        :param record: record like in the results of the API, dict
+        """
+
+        columns = self._table(table)
+        columns.append(record)
+        self.rows[table] += 1
+        if len(columns) >= self.batch_size:
+            self._flush(columns)
+
+    def _table(self, table):
+        columns = self._columns.get(table)
+        if columns is None:
+            columns = self._columns[table] = _Columns(table)
+            self.rows[table] = 0
+        return columns
+
+    def _flush(self, columns):
+        writer = self._writers.get(columns.table)
+        if writer is None:
+            writer = self._writers[columns.table] = pyarrow.parquet.ParquetWriter(
+                self.path(columns.table), columns.schema, compression=self.compression
+            )
+        writer.write_batch(columns.batch())
+
+    def close(self):
+        """Writes the remaining rows and closes the files"""
+
+        for columns in self._columns.values():
+            if len(columns) or columns.table not in self._writers:
+                self._flush(columns)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+
+def _details(fetch_many, ids, name, max_workers):
+    for recordId, response in fetch_many(ids, max_workers=max_workers, ordered=True):
+        if response.get("status") != 200:
+            raise RuntimeError("Failed to fetch {} {}: {}".format(name, recordId, response.get("message")))
+        yield response["content"]
+
+
+def export_invoices(client, directory, details=False, max_workers=8, batch_size=10000, **filters):
+    """Exports invoices matching the search criteria to invoices.parquet. With details, the complete invoices are
+    fetched and their rows are exported to invoice_rows.parquet.
+
+    :param client: client, Client
+    :param directory: directory for the files, string
+    :param details: fetch the complete invoices with get_invoice(), bool
+    :param max_workers: maximum number of concurrent detail requests, integer
+    :param batch_size: number of rows in a record batch, integer
+    :param filters: search parameters of get_invoices(), dict
+    :return: number of exported rows by table, dict
+    """
+
+    tables = ("invoices", "invoice_rows") if details else ("invoices",)
+    with ParquetExport(directory, tables, batch_size) as export:
+        invoices = client.iter_invoices(**filters)
+        if details:
+            invoices = _details(
+                client.get_invoices_by_ids, (invoice["id"] for invoice in invoices), "invoice", max_workers
+            )
+
+        for invoice in invoices:
+            export.write("invoices", invoice)
+            for row in invoice_rows(invoice):
+                export.write("invoice_rows", row)
+
+    return export.rows
+
+
+def export_ledger_receipts(client, directory, details=False, max_workers=8, batch_size=10000, **filters):
+    """Exports ledger receipts matching the search criteria to ledger_receipts.parquet. With details, the complete
+    receipts are fetched and their transactions are exported to ledger_transactions.parquet.
+
+    :param client: client, Client
+    :param directory: directory for the files, string
+    :param details: fetch the complete receipts with get_ledger_receipt(), bool
+    :param max_workers: maximum number of concurrent detail requests, integer
+    :param batch_size: number of rows in a record batch, integer
+    :param filters: search parameters of get_ledger_receipts(), dict
+    :return: number of exported rows by table, dict
+    """
+
+    tables = ("ledger_receipts", "ledger_transactions") if details else ("ledger_receipts",)
+    with ParquetExport(directory, tables, batch_size) as export:
+        receipts = client.iter_ledger_receipts(**filters)
+        if details:
+            receipts = _details(
+                client.get_ledger_receipts_by_ids, (receipt["receiptId"] for receipt in receipts), "ledger receipt",
+                max_workers,
+            )
+
+        for receipt in receipts:
+            export.write("ledger_receipts", receipt)
+            for transaction in ledger_transactions(receipt):
+                export.write("ledger_transactions", transaction)
+
+    return export.rows
+
+
+def export_bank_statements(client, directory, startDate, endDate, batch_size=10000):
+    """Exports bank statements to bank_statements.parquet and their events, including child events, to
+    bank_statement_events.parquet
+
+    :param client: client, Client
+    :param directory: directory for the files, string
+    :param startDate: Start date of the search (yyyy-MM-dd), string
+    :param endDate: End date of the search (yyyy-MM-dd), string
+    :param batch_size: number of rows in a record batch, integer
+    :return: number of exported rows by table, dict
+    """
+
+    response = client.get_bank_statements(startDate, endDate)
+    if response.get("status") != 200:
+        raise RuntimeError("Failed to fetch bank statements: {}".format(response.get("message")))
+
+    with ParquetExport(directory, ("bank_statements", "bank_statement_events"), batch_size) as export:
+        for statement in response["content"].get("results") or []:
+            export.write("bank_statements", statement)
+            for event in bank_statement_events(statement):
+                export.write("bank_statement_events", event)
+
+    return export.rows
+
+
+def export_reference_payments(client, directory, batch_size=10000, **filters):
+    """Exports reference payments matching the search criteria to reference_payments.parquet
+
+    :param client: client, Client
+    :param directory: directory for the files, string
+    :param batch_size: number of rows in a record batch, integer
+    :param filters: search parameters of get_reference_payments(), dict
+    :return: number of exported rows by table, dict
+    """
+
+    with ParquetExport(directory, ("reference_payments",), batch_size) as export:
+        for payment in client.iter_reference_payments(**filters):
+            export.write("reference_payments", payment)
+
+    return export.rows
@@ -0,0 +1,216 @@
+import bisect
+import threading
+
+try:
+    from opentelemetry import metrics as otel_metrics
+except ImportError:
+    otel_metrics = None
+
+# Upper bounds of the latency histogram buckets in seconds
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Hook(object):
+    """Base class for request hooks of a client. Hooks are called for each request sent to the API, including token
+    requests, but not for responses served from the cache. A hook is called with an event dict, which is the same
+    dict in both calls, so a hook can keep its own state in it between the calls.
+
+    Before the request the event has keys: method, endpoint (templated, e.g. "invoices/{id}"), url, started (unix
+    time) and request_bytes. After the request it also has: seconds, status (None if the request failed), error
+    (exception or None), response_bytes and retries.
+    """
+
+    def before_request(self, event):
+        """Called before a request is sent
+
+        :param event: request event, dict
+        """
+
+    def after_request(self, event):
+        """Called after the response of a request has been read, or the request has failed
+
+        :param event: request event, dict
+        """
+
+
+class Histogram(object):
+    """Counts of observed values in buckets, with their sum
+
+    :param buckets: upper bounds of the buckets in ascending order, tuple of floats
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Returns the cumulative counts of the buckets, the last one for values above all bounds
+
+        :return: (upper bound, count) tuples, the last bound being infinity, list
+        """
+
+        total = 0
+        counts = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            counts.append((bound, total))
+        return counts
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in sorted(labels.items())) + "}"
+
+
+class MetricsRegistry(Hook):
+    """Hook which collects request metrics by method and templated endpoint: latency histograms, request and
+    response bytes, request counts by status and retries. Token requests are recorded under "oauth/token".
+    Give the same registry to several clients to collect their metrics together.
+
+    :param buckets: upper bounds of the latency histogram buckets in seconds, tuple of floats
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Removes all collected metrics"""
+
+        with self._lock:
+            self._latency = {}
+            self._requests = {}
+            self._request_bytes = {}
+            self._response_bytes = {}
+            self._retries = {}
+
+    def after_request(self, event):
+        key = (event["method"], event["endpoint"])
+        status = "error" if event["status"] is None else str(event["status"])
+
+        with self._lock:
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram(self.buckets)
+            histogram.observe(event["seconds"])
+
+            self._requests[key + (status,)] = self._requests.get(key + (status,), 0) + 1
+            self._request_bytes[key] = self._request_bytes.get(key, 0) + event["request_bytes"]
+            self._response_bytes[key] = self._response_bytes.get(key, 0) + event["response_bytes"]
+            self._retries[key] = self._retries.get(key, 0) + event["retries"]
+
+    def endpoints(self):
+        """Returns the totals by method and endpoint, the endpoint with the most time spent first
+
+        :return: Dictionaries with keys: method, endpoint, requests, errors, seconds, mean_seconds, request_bytes,
+                 response_bytes and retries, list
+        """
+
+        with self._lock:
+            rows = []
+            for key, histogram in self._latency.items():
+                rows.append({
+                    "method": key[0],
+                    "endpoint": key[1],
+                    "requests": histogram.count,
+                    "errors": self._requests.get(key + ("error",), 0),
+                    "seconds": histogram.sum,
+                    "mean_seconds": histogram.sum / histogram.count,
+                    "request_bytes": self._request_bytes[key],
+                    "response_bytes": self._response_bytes[key],
+                    "retries": self._retries[key],
+                })
+
+        return sorted(rows, key=lambda row: -row["seconds"])
+
+    def prometheus_text(self, prefix="procountor"):
+        """Returns the metrics in the Prometheus text exposition format
+
+        :param prefix: prefix of the metric names, string
+        :return: metrics, string
+        """
+
+        lines = []
+
+        def counter(name, help, values, label_names):
+            lines.append("# HELP {}_{} {}".format(prefix, name, help))
+            lines.append("# TYPE {}_{} counter".format(prefix, name))
+            for key, value in sorted(values.items()):
+                lines.append("{}_{}{} {}".format(prefix, name, _labels(**dict(zip(label_names, key))), value))
+
+        with self._lock:
+            name = "{}_request_duration_seconds".format(prefix)
+            lines.append("# HELP {} Duration of requests including retries".format(name))
+            lines.append("# TYPE {} histogram".format(name))
+            for (method, endpoint), histogram in sorted(self._latency.items()):
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append("{}_bucket{} {}".format(name, _labels(method=method, endpoint=endpoint, le=le), count))
+                labels = _labels(method=method, endpoint=endpoint)
+                lines.append("{}_sum{} {!r}".format(name, labels, histogram.sum))
+                lines.append("{}_count{} {}".format(name, labels, histogram.count))
+
+            counter("requests_total", "Requests by status", self._requests, ("method", "endpoint", "status"))
+            counter("request_bytes_total", "Bytes of request bodies", self._request_bytes, ("method", "endpoint"))
+            counter("response_bytes_total", "Bytes of response bodies", self._response_bytes, ("method", "endpoint"))
+            counter("retries_total", "Retried requests", self._retries, ("method", "endpoint"))
+
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryExporter(Hook):
+    """Hook which records request metrics with OpenTelemetry instruments: the request duration histogram
+    procountor.request.duration and the counters procountor.requests, procountor.request.bytes,
+    procountor.response.bytes and procountor.retries, with attributes http.request.method, endpoint (templated)
+    and http.response.status_code. Requires opentelemetry-api unless a meter is given.
+
+    :param meter: OpenTelemetry meter, defaults to the meter "procountor" of the global meter provider
+    """
+
+    def __init__(self, meter=None):
+        if meter is None:
+            if otel_metrics is None:
+                raise ImportError(
+                    "OpenTelemetryExporter requires opentelemetry-api. "
+                    "Install it with: pip install Procountor[opentelemetry]"
+                )
+            meter = otel_metrics.get_meter("procountor")
+
+        self.duration = meter.create_histogram(
+            "procountor.request.duration", unit="s", description="Duration of requests including retries"
+        )
+        self.requests = meter.create_counter("procountor.requests", description="Requests by status")
+        self.request_bytes = meter.create_counter(
+            "procountor.request.bytes", unit="By", description="Bytes of request bodies"
+        )
+        self.response_bytes = meter.create_counter(
+            "procountor.response.bytes", unit="By", description="Bytes of response bodies"
+        )
+        self.retries = meter.create_counter("procountor.retries", description="Retried requests")
+
+    def after_request(self, event):
+        attributes = {"http.request.method": event["method"], "endpoint": event["endpoint"]}
+
+        self.duration.record(event["seconds"], attributes)
+        self.request_bytes.add(event["request_bytes"], attributes)
+        self.response_bytes.add(event["response_bytes"], attributes)
+        if event["retries"]:
+            self.retries.add(event["retries"], attributes)
+
+        attributes = dict(attributes)
+        if event["status"] is None:
+            attributes["error.type"] = type(event["error"]).__name__
+        else:
+            attributes["http.response.status_code"] = event["status"]
+        self.requests.add(1, attributes)
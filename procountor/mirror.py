@@ -0,0 +1,549 @@
+import contextlib
+import decimal
+import sqlite3
+
+from .codec import get_codec
+from .models import Model
+
+# Versions are compared to the second, e.g. 2024-01-31T12:00:00, leaving out fractions of a second
+VERSION_LENGTH = len("2024-01-31T12:00:00")
+
+
+class SyncError(RuntimeError):
+    """Raised when a sync could not fetch all changed records. The records which were fetched are stored, but the
+    high-water mark is not advanced, so the next sync fetches the failed records again.
+
+    :param failures: (id, response) tuples of the failed requests, list
+    """
+
+    def __init__(self, message, failures):
+        super(SyncError, self).__init__(message)
+        self.failures = failures
+
+
+def _where(conditions):
+    """Builds a WHERE clause from (column, operator, value) tuples, skipping those whose value is None
+
+    :return: (clause, params), tuple
+    """
+
+    clauses = []
+    params = []
+    for column, operator, value in conditions:
+        if value is None:
+            continue
+        if operator == "IN":
+            value = list(value)
+            clauses.append("{} IN ({})".format(column, ", ".join("?" * len(value))))
+            params.extend(value)
+        else:
+            clauses.append("{} {} ?".format(column, operator))
+            params.append(value)
+
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _amount(value):
+    """Converts an amount or a percentage to text for a TEXT column, so that it is stored exactly. Floats are stored
+    by their shortest representation."""
+
+    if value is None or isinstance(value, str):
+        return value
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _DecimalSum(object):
+    """SQLite aggregate function which sums amounts stored as text exactly"""
+
+    def __init__(self):
+        self.total = None
+
+    def step(self, value):
+        if value is not None:
+            value = decimal.Decimal(repr(value) if isinstance(value, float) else str(value))
+            self.total = value if self.total is None else self.total + value
+
+    def finalize(self):
+        return None if self.total is None else str(self.total)
+
+
+class _Mirror(object):
+    """Base class for local SQLite replicas of Procountor data. Subclasses define the schema, the table and ID key of
+    the mirrored records, and how a record is stored.
+
+    :param client: client used for syncing. The records are stored and read with the codec of the client, Client
+    :param path: path to the database file, string
+    :param max_workers: maximum number of concurrent detail requests, integer
+    :param batch_size: number of records stored per transaction, integer
+    """
+
+    schema = ()
+    table = None
+    id_key = "id"
+
+    def __init__(self, client, path, max_workers=8, batch_size=500):
+        self.client = client
+        self.codec = getattr(client, "codec", None) or get_codec()
+        self.path = path
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT)")
+            for statement in self.schema:
+                connection.execute(statement)
+
+    def _dumps(self, record):
+        return self.codec.dumps(record).decode("utf-8")
+
+    def _loads(self, data):
+        return self.codec.loads(data)
+
+    def _number(self, value):
+        """Converts a stored amount or percentage to a Decimal if the codec of the client decodes amounts as
+        Decimals, and to a float otherwise. Databases created by older versions store them as REAL."""
+
+        if value is None:
+            return None
+        if getattr(self.codec, "use_decimal", False):
+            return decimal.Decimal(repr(value) if isinstance(value, float) else value)
+        return float(value)
+
+    @contextlib.contextmanager
+    def _connection(self):
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30.0)) as connection:
+            connection.row_factory = sqlite3.Row
+            connection.create_aggregate("decimal_sum", 1, _DecimalSum)
+            with connection:
+                yield connection
+
+    def _state(self, name):
+        with self._connection() as connection:
+            row = connection.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else None
+
+    def _set_state(self, connection, name, value):
+        connection.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)", (name, value))
+
+    def _query(self, sql, params):
+        with self._connection() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def _changed_ids(self, rows):
+        """Returns IDs of the search results which are missing from the mirror or whose version differs from the
+        stored version. Results without version are always changed.
+
+        :param rows: search results, iterable of dicts
+        :return: IDs, list
+        """
+
+        changed = []
+        page = []
+
+        def check(page):
+            stored = dict(self._query(
+                "SELECT id, version FROM {} WHERE id IN ({})".format(self.table, ", ".join("?" * len(page))),
+                [row[self.id_key] for row in page],
+            ))
+            changed.extend(
+                row[self.id_key] for row in page
+                if row.get("version") is None or stored.get(row[self.id_key]) != row["version"]
+            )
+
+        for row in rows:
+            page.append(row)
+            if len(page) >= self.batch_size:
+                check(page)
+                page = []
+        if page:
+            check(page)
+
+        return changed
+
+    def _fetch(self, fetch_many, ids):
+        """Fetches the details of the given records concurrently and stores them in batches
+
+        :param fetch_many: API method which fetches many records, e.g. client.get_invoices_by_ids
+        :param ids: IDs of the records, list
+        :return: (number of stored records, latest version, failures), tuple. Records without a version don't
+                 change the latest version.
+        """
+
+        latest = None
+        failures = []
+        batch = []
+        fetched = 0
+
+        for recordId, response in fetch_many(ids, max_workers=self.max_workers):
+            if response.get("status") != 200:
+                failures.append((recordId, response))
+                continue
+
+            record = response["content"]
+            if isinstance(record, Model):
+                record = record.to_dict()
+            version = record.get("version")
+            if version:
+                version = version[:VERSION_LENGTH]
+                latest = max(latest, version) if latest else version
+            batch.append(record)
+
+            if len(batch) >= self.batch_size:
+                fetched += self._store(batch)
+                batch = []
+
+        if batch:
+            fetched += self._store(batch)
+
+        return fetched, latest, failures
+
+    def _store(self, records):
+        with self._connection() as connection:
+            for record in records:
+                self._store_record(connection, record)
+        return len(records)
+
+    def _store_record(self, connection, record):
+        raise NotImplementedError
+
+
+class InvoiceMirror(_Mirror):
+    """Local SQLite replica of invoices. Each sync searches only the invoices whose version has changed since the
+    high-water mark of the previous sync, fetches their details concurrently and stores them. The high-water mark
+    is the latest invoice version seen, so it does not depend on the local clock. Invoices without a version don't
+    move it, and they are fetched again on every sync.
+
+    Reports can query the mirror with get() and invoices() instead of fetching the invoices from the API.
+
+    :param client: client used for syncing, Client
+    :param path: path to the database file, string
+    :param max_workers: maximum number of concurrent invoice detail requests, integer
+    :param batch_size: number of invoices stored per transaction, integer
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS invoices ("
+        "id INTEGER PRIMARY KEY, type TEXT, status TEXT, partner_id INTEGER, invoice_date TEXT, due_date TEXT, "
+        "currency TEXT, version TEXT, data TEXT)",
+        "CREATE INDEX IF NOT EXISTS invoices_invoice_date ON invoices (invoice_date)",
+        "CREATE INDEX IF NOT EXISTS invoices_partner_id ON invoices (partner_id, invoice_date)",
+        "CREATE INDEX IF NOT EXISTS invoices_status ON invoices (status, invoice_date)",
+    )
+    table = "invoices"
+
+    @property
+    def high_water_mark(self):
+        """Latest invoice version stored by a completed sync, string (yyyy-mm-ddTHH:MM:SS) or None"""
+
+        return self._state("invoices")
+
+    def sync(self, **filters):
+        """Fetches invoices changed since the previous sync and stores them. The first sync fetches all invoices.
+
+        :param filters: other search parameters of get_invoices(), e.g. types, dict
+        :return: Dictionary with keys: 'fetched' for the number of stored invoices and 'high_water_mark', dict
+        :raises SyncError: if some invoices could not be fetched
+        """
+
+        since = self.high_water_mark
+        params = dict(filters, orderById="asc")
+        if since:
+            params["versionStartDate"] = since
+
+        ids = self._changed_ids(self.client.iter_invoices(**params))
+        fetched, latest, failures = self._fetch(self.client.get_invoices_by_ids, ids)
+
+        if failures:
+            raise SyncError("Failed to fetch {} invoices".format(len(failures)), failures)
+
+        latest = max(since, latest) if since and latest else since or latest
+        if latest:
+            with self._connection() as connection:
+                self._set_state(connection, "invoices", latest)
+
+        return {"fetched": fetched, "high_water_mark": latest}
+
+    def _store_record(self, connection, invoice):
+        connection.execute(
+            "INSERT OR REPLACE INTO invoices "
+            "(id, type, status, partner_id, invoice_date, due_date, currency, version, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                invoice["id"], invoice.get("type"), invoice.get("status"), invoice.get("partnerId"),
+                invoice.get("date"), invoice.get("dueDate"), invoice.get("currency"), invoice.get("version"),
+                self._dumps(invoice),
+            ),
+        )
+
+    def get(self, invoiceId):
+        """Returns a stored invoice
+
+        :param invoiceId: ID of the invoice, integer
+        :return: invoice like in the content of get_invoice(), dict or None
+        """
+
+        rows = self._query("SELECT data FROM invoices WHERE id = ?", (invoiceId,))
+        return self._loads(rows[0]["data"]) if rows else None
+
+    def invoices(self, status=None, type=None, partnerId=None, startDate=None, endDate=None):
+        """Returns stored invoices matching the criteria, ordered by invoice date and ID
+
+        :param status: invoice status, string
+        :param type: invoice type, string
+        :param partnerId: business partner ID, integer
+        :param startDate: first invoice date (yyyy-MM-dd), string
+        :param endDate: last invoice date (yyyy-MM-dd), string
+        :return: invoices, list of dicts
+        """
+
+        where, params = _where((
+            ("status", "=", status),
+            ("type", "=", type),
+            ("partner_id", "=", partnerId),
+            ("invoice_date", ">=", startDate),
+            ("invoice_date", "<=", endDate),
+        ))
+
+        rows = self._query("SELECT data FROM invoices" + where + " ORDER BY invoice_date, id", params)
+        return [self._loads(row["data"]) for row in rows]
+
+
+class LedgerMirror(_Mirror):
+    """Local SQLite replica of ledger receipts. The transactions of the receipts are flattened into indexed rows by
+    account and receipt date, and their dimension items into rows by dimension, dimension item, account and date, so
+    that e.g. the entries of one account in a quarter by dimension are queried without calling the API.
+
+    A sync searches the receipts of a date range and fetches the details of new and changed receipts. Receipts of the
+    range which are no longer found are removed. Transactions of invalidated receipts are not included in the
+    entries.
+
+    Amounts are stored as text and summed exactly. entries() and totals() return them as Decimals if the codec of the
+    client decodes amounts as Decimals, e.g. JsonCodec(use_decimal=True), and as floats otherwise.
+
+    :param client: client used for syncing, Client
+    :param path: path to the database file, string
+    :param max_workers: maximum number of concurrent ledger receipt detail requests, integer
+    :param batch_size: number of receipts stored per transaction, integer
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS ledger_receipts ("
+        "id INTEGER PRIMARY KEY, type TEXT, status TEXT, receipt_date TEXT, version TEXT, data TEXT)",
+        "CREATE INDEX IF NOT EXISTS ledger_receipts_receipt_date ON ledger_receipts (receipt_date, type)",
+        "CREATE TABLE IF NOT EXISTS ledger_entries ("
+        "receipt_id INTEGER, row INTEGER, account TEXT, receipt_date TEXT, type TEXT, amount TEXT, "
+        "vat_percent TEXT, description TEXT, PRIMARY KEY (receipt_id, row))",
+        "CREATE INDEX IF NOT EXISTS ledger_entries_account ON ledger_entries (account, receipt_date, type)",
+        "CREATE INDEX IF NOT EXISTS ledger_entries_receipt_date ON ledger_entries (receipt_date)",
+        "CREATE TABLE IF NOT EXISTS ledger_dimension_entries ("
+        "receipt_id INTEGER, row INTEGER, dimension_id INTEGER, dimension_item_id INTEGER, account TEXT, "
+        "receipt_date TEXT, type TEXT, amount TEXT)",
+        "CREATE INDEX IF NOT EXISTS ledger_dimension_entries_account "
+        "ON ledger_dimension_entries (account, dimension_id, receipt_date)",
+        "CREATE INDEX IF NOT EXISTS ledger_dimension_entries_item "
+        "ON ledger_dimension_entries (dimension_id, dimension_item_id, receipt_date)",
+        "CREATE INDEX IF NOT EXISTS ledger_dimension_entries_receipt_id ON ledger_dimension_entries (receipt_id)",
+    )
+    table = "ledger_receipts"
+    id_key = "receiptId"
+
+    def sync(self, startDate, endDate, types=None):
+        """Fetches new and changed ledger receipts of the date range and stores them
+
+        :param startDate: start date of the receipts (yyyy-MM-dd), string
+        :param endDate: end date of the receipts (yyyy-MM-dd), string
+        :param types: ledger receipt types, list of strings
+        :return: Dictionary with keys: 'fetched' for the number of stored receipts and 'removed' for the number of
+                 receipts no longer found, dict
+        :raises SyncError: if some receipts could not be fetched
+        """
+
+        params = {"startDate": startDate, "endDate": endDate, "orderById": "asc"}
+        if types:
+            params["types"] = types
+
+        found = set()
+
+        def search():
+            for row in self.client.iter_ledger_receipts(**params):
+                found.add(row["receiptId"])
+                yield row
+
+        ids = self._changed_ids(search())
+        fetched, _, failures = self._fetch(self.client.get_ledger_receipts_by_ids, ids)
+
+        if failures:
+            raise SyncError("Failed to fetch {} ledger receipts".format(len(failures)), failures)
+
+        where, where_params = _where((
+            ("receipt_date", ">=", startDate),
+            ("receipt_date", "<=", endDate),
+            ("type", "IN", types or None),
+        ))
+        removed = [
+            row["id"] for row in self._query("SELECT id FROM ledger_receipts" + where, where_params)
+            if row["id"] not in found
+        ]
+        with self._connection() as connection:
+            for receiptId in removed:
+                self._delete(connection, receiptId)
+
+        return {"fetched": fetched, "removed": len(removed)}
+
+    def _delete(self, connection, receiptId):
+        connection.execute("DELETE FROM ledger_receipts WHERE id = ?", (receiptId,))
+        connection.execute("DELETE FROM ledger_entries WHERE receipt_id = ?", (receiptId,))
+        connection.execute("DELETE FROM ledger_dimension_entries WHERE receipt_id = ?", (receiptId,))
+
+    def _store_record(self, connection, receipt):
+        receiptId = receipt["receiptId"]
+        date = receipt.get("receiptDate")
+        type = receipt.get("type")
+
+        self._delete(connection, receiptId)
+        connection.execute(
+            "INSERT INTO ledger_receipts (id, type, status, receipt_date, version, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (receiptId, type, receipt.get("status"), date, receipt.get("version"), self._dumps(receipt)),
+        )
+
+        if receipt.get("status") == "INVALIDATED":
+            return
+
+        entries = []
+        dimension_entries = []
+        for row, transaction in enumerate(receipt.get("transactions") or []):
+            account = transaction.get("account")
+            entries.append((
+                receiptId, row, account, date, type, _amount(transaction.get("accountingValue")),
+                _amount(transaction.get("vatPercent")), transaction.get("description"),
+            ))
+            for dimension in transaction.get("dimensions") or []:
+                for item in dimension.get("items") or []:
+                    dimension_entries.append((
+                        receiptId, row, dimension.get("dimensionId"), item.get("dimensionItemId"), account, date,
+                        type, _amount(item.get("value")),
+                    ))
+
+        connection.executemany(
+            "INSERT INTO ledger_entries (receipt_id, row, account, receipt_date, type, amount, vat_percent, "
+            "description) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            entries,
+        )
+        connection.executemany(
+            "INSERT INTO ledger_dimension_entries (receipt_id, row, dimension_id, dimension_item_id, account, "
+            "receipt_date, type, amount) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            dimension_entries,
+        )
+
+    def get(self, receiptId):
+        """Returns a stored ledger receipt
+
+        :param receiptId: ledger receipt identifier, integer
+        :return: ledger receipt like in the content of get_ledger_receipt(), dict or None
+        """
+
+        rows = self._query("SELECT data FROM ledger_receipts WHERE id = ?", (receiptId,))
+        return self._loads(rows[0]["data"]) if rows else None
+
+    def entries(self, account=None, startDate=None, endDate=None, types=None, dimensionId=None,
+                dimensionItemId=None):
+        """Returns stored transactions matching the criteria, ordered by receipt date. With dimensionId, there is a
+        row for each dimension item of the transactions, and the amount is the value of the item.
+
+        :param account: account number, string
+        :param startDate: first receipt date (yyyy-MM-dd), string
+        :param endDate: last receipt date (yyyy-MM-dd), string
+        :param types: ledger receipt types, list of strings
+        :param dimensionId: dimension identifier, integer
+        :param dimensionItemId: dimension item identifier, integer
+        :return: Dictionaries with keys: receiptId, row, account, receiptDate, type and amount, and dimensionId and
+                 dimensionItemId or vatPercent and description, list of dicts
+        """
+
+        where, params = _where((
+            ("account", "=", account),
+            ("receipt_date", ">=", startDate),
+            ("receipt_date", "<=", endDate),
+            ("type", "IN", types),
+            ("dimension_id", "=", dimensionId),
+            ("dimension_item_id", "=", dimensionItemId),
+        ))
+
+        if dimensionId is None and dimensionItemId is None:
+            sql = (
+                "SELECT receipt_id AS receiptId, row, account, receipt_date AS receiptDate, type, amount, "
+                "vat_percent AS vatPercent, description FROM ledger_entries"
+            )
+        else:
+            sql = (
+                "SELECT receipt_id AS receiptId, row, account, receipt_date AS receiptDate, type, amount, "
+                "dimension_id AS dimensionId, dimension_item_id AS dimensionItemId FROM ledger_dimension_entries"
+            )
+
+        rows = self._query(sql + where + " ORDER BY receipt_date, receipt_id, row", params)
+        entries = [dict(zip(row.keys(), row)) for row in rows]
+        for entry in entries:
+            entry["amount"] = self._number(entry["amount"])
+            if "vatPercent" in entry:
+                entry["vatPercent"] = self._number(entry["vatPercent"])
+        return entries
+
+    def lines(self, startDate=None, endDate=None, dimensions=False):
+        """Iterates over the stored transactions as tuples, without building dictionaries, e.g. for
+        TransactionTable.from_mirror(). The amounts are floats.
+
+        :param startDate: first receipt date (yyyy-MM-dd), string
+        :param endDate: last receipt date (yyyy-MM-dd), string
+        :param dimensions: iterate over the dimension items of the transactions instead, bool
+        :return: generator of (account, receiptDate, amount) tuples, or (account, receiptDate, amount, dimensionId,
+                 dimensionItemId) tuples with dimensions
+        """
+
+        where, params = _where((
+            ("receipt_date", ">=", startDate),
+            ("receipt_date", "<=", endDate),
+        ))
+
+        if dimensions:
+            sql = (
+                "SELECT account, receipt_date, CAST(COALESCE(amount, 0) AS REAL), dimension_id, dimension_item_id "
+                "FROM ledger_dimension_entries"
+            )
+        else:
+            sql = "SELECT account, receipt_date, CAST(COALESCE(amount, 0) AS REAL) FROM ledger_entries"
+
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30.0)) as connection:
+            for row in connection.execute(sql + where, params):
+                yield row
+
+    def totals(self, startDate=None, endDate=None, account=None, types=None, dimensionId=None):
+        """Returns the exact sums of the stored transactions by account, or by account and dimension item
+
+        :param startDate: first receipt date (yyyy-MM-dd), string
+        :param endDate: last receipt date (yyyy-MM-dd), string
+        :param account: account number, string
+        :param types: ledger receipt types, list of strings
+        :param dimensionId: dimension identifier, integer
+        :return: sums by account, or by (account, dimensionItemId) with dimensionId, dict
+        """
+
+        where, params = _where((
+            ("account", "=", account),
+            ("receipt_date", ">=", startDate),
+            ("receipt_date", "<=", endDate),
+            ("type", "IN", types),
+            ("dimension_id", "=", dimensionId),
+        ))
+
+        if dimensionId is None:
+            rows = self._query(
+                "SELECT account, decimal_sum(amount) FROM ledger_entries" + where + " GROUP BY account", params
+            )
+            return {row[0]: self._number(row[1]) for row in rows}
+
+        rows = self._query(
+            "SELECT account, dimension_item_id, decimal_sum(amount) FROM ledger_dimension_entries" + where +
+            " GROUP BY account, dimension_item_id",
+            params,
+        )
+        return {(row[0], row[1]): self._number(row[2]) for row in rows}
@@ -0,0 +1,240 @@
+from .endpoints import endpoint_template
+
+
+class _Nested(object):
+    """Descriptor for a list of nested models. The list is kept as it was decoded until it is first read, and then
+    parsed into a tuple of models. Without a model, the nested records are of the same model as their parent."""
+
+    def __init__(self, slot, model=None):
+        self.slot = slot
+        self.model = model
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        value = getattr(instance, self.slot)
+        if isinstance(value, list):
+            model = self.model or owner
+            value = tuple(model(item) for item in value)
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
+
+class Model(object):
+    """Compact read-only record with __slots__. Known fields are stored in slots, and lists of nested records are
+    parsed into models only when they are read. Fields which the model doesn't know are kept in a dict, which is
+    created only if there are any.
+
+    Models can also be read like the dicts they were created from, e.g. invoice["id"] or invoice.get("status").
+
+    :param data: record like in the content of a response, dict
+    """
+
+    __slots__ = ("_extra",)
+    fields = ()
+    nested = ()
+
+    def __init__(self, data):
+        known = self._known()
+        extra = None
+
+        for name in known:
+            setattr(self, name, None)
+
+        for key, value in data.items():
+            if key in known:
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+
+        self._extra = extra
+
+    @classmethod
+    def _known(cls):
+        known = cls.__dict__.get("_known_fields")
+        if known is None:
+            known = frozenset(cls.fields + cls.nested)
+            setattr(cls, "_known_fields", known)
+        return known
+
+    def __getitem__(self, key):
+        if key in self._known():
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self._known():
+            return getattr(self, key) is not None
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def to_dict(self):
+        """Returns the record as a dict, with nested models converted back to dicts
+
+        :return: dict
+        """
+
+        data = dict(self._extra or {})
+        for name in self.fields:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        for name in self.nested:
+            value = getattr(self, "_" + name)
+            if isinstance(value, tuple):
+                value = [item.to_dict() for item in value]
+            if value is not None:
+                data[name] = value
+        return data
+
+    def __eq__(self, other):
+        return isinstance(other, Model) and type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(name, getattr(self, name)) for name in self.fields[:3]
+        ))
+
+
+class InvoiceRow(Model):
+    """Row of an invoice"""
+
+    fields = (
+        "id", "productId", "product", "productCode", "quantity", "unit", "unitPrice", "discountPercent",
+        "vatPercent", "vatStatus", "comment", "startDate", "endDate", "headerText", "explanationText",
+    )
+    __slots__ = fields
+
+
+class Invoice(Model):
+    """Invoice, or an invoice summary of a search. The rows are parsed into InvoiceRows when invoiceRows is read."""
+
+    fields = (
+        "id", "partnerId", "type", "status", "date", "created", "invoiceNumber", "originalInvoiceNumber",
+        "currency", "totalAmount", "name", "counterParty", "billingAddress", "deliveryAddress", "paymentInfo",
+        "deliveryTermsInfo", "extraInfo", "discountPercent", "orderReference", "invoiceChannel", "language",
+        "invoiceTemplateId", "additionalInformation", "vatStatus", "notes", "factoringContractId", "factoringText",
+        "invoiceApprovalInfo", "penaltyPercent", "version",
+    )
+    nested = ("invoiceRows",)
+    __slots__ = fields + ("_invoiceRows",)
+
+    invoiceRows = _Nested("_invoiceRows", InvoiceRow)
+
+
+class Transaction(Model):
+    """Transaction of a ledger receipt"""
+
+    fields = (
+        "id", "transactionType", "account", "accountingValue", "vatPercent", "vatType", "vatStatus", "vatCode",
+        "description", "partnerId", "dimensions", "startDate", "endDate",
+    )
+    __slots__ = fields
+
+
+class LedgerReceipt(Model):
+    """Ledger receipt, or a ledger receipt summary of a search. The transactions are parsed into Transactions when
+    transactions is read."""
+
+    fields = (
+        "receiptId", "type", "status", "name", "receiptDate", "vatType", "invoiceId", "receiptValidityDate",
+        "attachments", "created", "version",
+    )
+    nested = ("transactions",)
+    __slots__ = fields + ("_transactions",)
+
+    transactions = _Nested("_transactions", Transaction)
+
+
+class BusinessPartner(Model):
+    """Business partner"""
+
+    fields = (
+        "id", "type", "name", "partnerCode", "registryCode", "businessId", "active", "address", "billingAddress",
+        "deliveryAddress", "paymentInfo", "invoicingInfo", "contactPersons", "otherInfo", "version",
+    )
+    __slots__ = fields
+
+
+class BankStatementEvent(Model):
+    """Event of a bank statement. Child events are parsed into BankStatementEvents when events is read."""
+
+    fields = (
+        "id", "payDate", "valueDate", "sum", "accountNumber", "name", "explanationCode", "archiveCode", "message",
+        "reference", "allocated", "invoiceId", "productId", "endToEndId", "attachments",
+    )
+    nested = ("events",)
+    __slots__ = fields + ("_events",)
+
+    events = _Nested("_events")
+
+
+def _one(model):
+    def parse(content):
+        return model(content)
+    return parse
+
+
+def _results(model, key="results"):
+    def parse(content):
+        content = dict(content)
+        content[key] = [model(row) for row in content.get(key) or []]
+        return content
+    return parse
+
+
+def _bank_statements(content):
+    content = dict(content)
+    statements = []
+    for statement in content.get("results") or []:
+        statement = dict(statement)
+        statement["events"] = [BankStatementEvent(event) for event in statement.get("events") or []]
+        statements.append(statement)
+    content["results"] = statements
+    return content
+
+
+# Parsers of response content by endpoint template
+RESPONSE_MODELS = {
+    "bankstatements": _bank_statements,
+    "businesspartners": _results(BusinessPartner),
+    "businesspartners/{id}": _one(BusinessPartner),
+    "invoices": _results(Invoice),
+    "invoices/{id}": _one(Invoice),
+    "ledgerreceipts": _results(LedgerReceipt),
+    "ledgerreceipts/{id}": _one(LedgerReceipt),
+}
+
+
+def parse_response(endpoint, answer):
+    """Replaces the records in the content of a successful response with models, if the endpoint has them
+
+    :param endpoint: request endpoint, string
+    :param answer: response of request(), dict
+    :return: response with models, dict
+    """
+
+    parse = RESPONSE_MODELS.get(endpoint_template(endpoint))
+    if parse is None or answer.get("status") != 200 or not isinstance(answer.get("content"), dict):
+        return answer
+
+    return dict(answer, content=parse(answer["content"]))
@@ -0,0 +1,307 @@
+import os
+
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+
+from .codec import get_codec
+
+
+def content_type_boundary(content_type):
+    """Returns the boundary parameter of a multipart content type
+
+    :param content_type: value of the Content-Type header, e.g. 'multipart/mixed; boundary="abc"', string
+    :return: boundary, bytes
+    """
+
+    for parameter in content_type.split(";")[1:]:
+        name, _, value = parameter.strip().partition("=")
+        if name.lower() == "boundary" and value:
+            return value.strip('"').encode("latin-1")
+
+    raise ValueError("Content-Type {} has no multipart boundary".format(content_type))
+
+
+class MultipartStreamParser(object):
+    """Incremental parser for multipart bodies. The body is fed in chunks of any size, and the data of each part is
+    passed on as soon as it is known not to be part of the boundary, so that the body is never held in memory.
+
+    :param boundary: multipart boundary, bytes
+    :param on_part: function which is called with the headers of each part (dict with lowercase names) and returns a
+                    function to be called with the data of the part, or None to discard the part
+    """
+
+    def __init__(self, boundary, on_part):
+        self.on_part = on_part
+        self._first_boundary = b"--" + boundary
+        self._delimiter = b"\r\n--" + boundary
+        self._buffer = b""
+        self._state = "preamble"
+        self._write = None
+
+    def feed(self, chunk):
+        """Parses the next chunk of the body
+
+        :param chunk: data, bytes
+        """
+
+        self._buffer += chunk
+
+        while True:
+            if self._state == "preamble":
+                index = self._buffer.find(self._first_boundary)
+                if index < 0:
+                    self._buffer = self._buffer[-len(self._first_boundary):]
+                    return
+                self._buffer = self._buffer[index + len(self._first_boundary):]
+                self._state = "boundary"
+
+            elif self._state == "boundary":
+                if len(self._buffer) < 2:
+                    return
+                if self._buffer.startswith(b"--"):
+                    self._state = "end"
+                    self._buffer = b""
+                    return
+                index = self._buffer.find(b"\r\n")
+                if index < 0:
+                    return
+                # Transport padding after the boundary is ignored
+                self._buffer = self._buffer[index + 2:]
+                self._state = "headers"
+
+            elif self._state == "headers":
+                if len(self._buffer) < 2:
+                    return
+                if self._buffer.startswith(b"\r\n"):
+                    # Part without headers
+                    headers, end = {}, 2
+                else:
+                    index = self._buffer.find(b"\r\n\r\n")
+                    if index < 0:
+                        return
+                    headers, end = self._parse_headers(self._buffer[:index]), index + 4
+                self._buffer = self._buffer[end:]
+                self._write = self.on_part(headers)
+                self._state = "body"
+
+            elif self._state == "body":
+                index = self._buffer.find(self._delimiter)
+                if index < 0:
+                    keep = len(self._delimiter) - 1
+                    if len(self._buffer) > keep:
+                        self._emit(self._buffer[:-keep])
+                        self._buffer = self._buffer[-keep:]
+                    return
+                self._emit(self._buffer[:index])
+                self._buffer = self._buffer[index + len(self._delimiter):]
+                self._state = "boundary"
+
+            else:
+                self._buffer = b""
+                return
+
+    def close(self):
+        """Checks that the whole body was parsed"""
+
+        if self._state != "end":
+            raise ValueError("Multipart body ended before the closing boundary")
+
+    def _emit(self, data):
+        if data and self._write is not None:
+            self._write(data)
+
+    @staticmethod
+    def _parse_headers(data):
+        headers = {}
+        for line in data.decode("latin-1").split("\r\n"):
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        return headers
+
+
+class AttachmentDownload(object):
+    """Receives a streamed attachment response of Procountor. The first part of the response is the metadata of the
+    attachment (application/json), which is kept in memory. The second part is the file, which is written to the
+    target in chunks.
+
+    :param content_type: value of the Content-Type header of the response, string
+    :param target: path or binary file object where the file is written
+    :param codec: JSON codec for the metadata, defaults to procountor.codec.JsonCodec
+    """
+
+    def __init__(self, content_type, target, codec=None):
+        self.target = target
+        self.codec = get_codec(codec)
+        self.size = 0
+        self._parts = 0
+        self._meta = []
+        self._file = None
+        self._owns_file = False
+        self._parser = MultipartStreamParser(content_type_boundary(content_type), self._on_part)
+
+    def _on_part(self, headers):
+        self._parts += 1
+
+        if self._parts == 1:
+            return self._meta.append
+
+        if self._parts == 2:
+            if hasattr(self.target, "write"):
+                self._file = self.target
+            else:
+                self._file = open(self.target, "wb")
+                self._owns_file = True
+            return self._write_file
+
+        return None
+
+    def _write_file(self, data):
+        self._file.write(data)
+        self.size += len(data)
+
+    def feed(self, chunk):
+        """Handles the next chunk of the response body
+
+        :param chunk: data, bytes
+        """
+
+        self._parser.feed(chunk)
+
+    def close(self):
+        """Finishes the download
+
+        :return: Dictionary with keys: 'metadata' for the attachment metadata and 'size' for the file size, dict
+        """
+
+        self._parser.close()
+        self._close_file()
+
+        if self._parts < 2:
+            raise ValueError("Attachment response has no file part")
+
+        return {
+            "metadata": self.codec.loads(b"".join(self._meta)),
+            "size": self.size,
+        }
+
+    def abort(self):
+        """Closes and removes a partially written file, if the download created it"""
+
+        self._close_file()
+        if self._owns_file and os.path.exists(self.target):
+            os.unlink(self.target)
+
+    def _close_file(self):
+        if self._owns_file and self._file is not None and not self._file.closed:
+            self._file.close()
+
+
+class _BufferReader(object):
+    """Reads a bytes-like object in chunks through a memoryview, so that the buffer itself is not copied"""
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        self._view = view if view.format == "B" else view.cast("B")
+        self._position = 0
+
+    @property
+    def len(self):
+        return len(self._view) - self._position
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        data = self._view[self._position:end].tobytes()
+        self._position = end
+        return data
+
+
+class _FileReader(object):
+    """Reads a seekable binary file object in chunks and tells the number of bytes left"""
+
+    def __init__(self, file_object):
+        self._file = file_object
+        position = file_object.tell()
+        file_object.seek(0, os.SEEK_END)
+        self._end = file_object.tell()
+        file_object.seek(position)
+
+    @property
+    def len(self):
+        return max(0, self._end - self._file.tell())
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+
+class AttachmentUpload(object):
+    """Streaming multipart/form-data body of a new attachment. The first part is the metadata (application/json) and
+    the second part is the file, which is read in chunks while the request is sent, so that the file is never held
+    in memory as a whole. Bytes-like objects are sent without copying them.
+
+    Every call of encoder() returns a new body from the start of the file, so the request can be sent again after a
+    refreshed access token or a retry. File objects must be seekable. The size of the last body is in size.
+
+    :param meta: meta data of the attachment, contains name of the file, referenceType and referenceId, dict
+    :param file: path to the file, binary file object, bytes or memoryview
+    :param content_type: content type of the file part, string
+    :param codec: JSON codec for the metadata, defaults to procountor.codec.JsonCodec
+    """
+
+    def __init__(self, meta, file, content_type="application/octet-stream", codec=None):
+        self.meta = meta
+        self.file = file
+        self.content_type = content_type
+        self.codec = get_codec(codec)
+        self.size = None
+        self._start = None
+        self._opened = None
+
+    def _reader(self):
+        if isinstance(self.file, (bytes, bytearray, memoryview)):
+            return _BufferReader(self.file)
+
+        if hasattr(self.file, "read"):
+            if self._start is None:
+                self._start = self.file.tell()
+            else:
+                self.file.seek(self._start)
+            return _FileReader(self.file)
+
+        self._opened = open(self.file, "rb")
+        return _FileReader(self._opened)
+
+    def encoder(self):
+        """Returns a new streaming body
+
+        :return: encoder with read(), len and content_type, MultipartEncoder
+        """
+
+        self.close()
+        encoder = MultipartEncoder(fields=[
+            ("meta", (None, self.codec.dumps(self.meta), "application/json")),
+            ("file", (self.meta.get("name", "file"), self._reader(), self.content_type)),
+        ])
+        self.size = encoder.len
+        return encoder
+
+    def close(self):
+        """Closes the file, if it was opened from a path"""
+
+        if self._opened is not None:
+            self._opened.close()
+            self._opened = None
+
+
+def iter_encoder(encoder, chunk_size=65536):
+    """Reads a streaming body in chunks
+
+    :param encoder: body with read(), e.g. MultipartEncoder
+    :param chunk_size: size of the chunks in bytes, integer
+    :return: generator of bytes
+    """
+
+    while True:
+        chunk = encoder.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,258 @@
+import datetime
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Full
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def page_rows(response, results_key="results"):
+    """Returns the result rows of one page of a paginated endpoint
+
+    :param response: response of the page request, dict
+    :param results_key: key of the result list in the response content, string
+    :return: result rows, list
+    """
+
+    if response["status"] != 200:
+        raise RuntimeError(
+            "Fetching a page failed with HTTP Status code: {}. Content: {}".format(
+                response["status"], response.get("message")
+            )
+        )
+
+    content = response.get("content")
+
+    if isinstance(content, list):
+        return content
+
+    if not isinstance(content, dict):
+        raise RuntimeError("Cannot read the page results. Response was: {}".format(content))
+
+    if results_key in content:
+        return content[results_key] or []
+
+    # Some endpoints name the result list after the resource, e.g. "products"
+    lists = [value for value in content.values() if isinstance(value, list)]
+    if len(lists) == 1:
+        return lists[0]
+
+    raise RuntimeError("Cannot read the page results. Response was: {}".format(content))
+
+
+def row_id(row, id_key="id"):
+    """Returns the identifier of a result row. Falls back to "id" when the row has no given id key.
+
+    :param row: result row, dict
+    :param id_key: key of the row identifier, string
+    :return: row identifier
+    """
+
+    return row[id_key] if id_key in row else row["id"]
+
+
+def next_page_params(response, rows, params, id_key="id"):
+    """Returns query parameters for the next page, or None when the given page was the last one
+
+    :param response: response of the page request, dict
+    :param rows: result rows of the page, list
+    :param params: query parameters of the page request, dict
+    :param id_key: key of the row identifier used as previousId, string
+    :return: query parameters for the next page, dict or None
+    """
+
+    if not rows:
+        return None
+
+    meta = response["content"].get("meta") if isinstance(response["content"], dict) else None
+    page_size = (meta or {}).get("pageSize") or params.get("size") or params.get("limit")
+
+    if page_size and len(rows) < int(page_size):
+        return None
+
+    next_params = dict(params)
+    next_params["previousId"] = row_id(rows[-1], id_key)
+    return next_params
+
+
+def paginate(fetch, params, results_key="results", id_key="id", prefetch=False):
+    """Generator which follows previousId pagination and yields the rows one by one. Only one page (two with
+    prefetch) is held in memory at a time.
+
+    :param fetch: function which fetches one page with the given query parameters, e.g. client.get_invoices
+    :param params: query parameters of the first page, dict
+    :param results_key: key of the result list in the response content, string
+    :param id_key: key of the row identifier used as previousId, string
+    :param prefetch: fetch the next page in a background thread while the current page is consumed, bool
+    :return: result rows, generator of dicts
+    """
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+    try:
+        response = fetch(**params)
+
+        while True:
+            rows = page_rows(response, results_key)
+            params = next_page_params(response, rows, params, id_key)
+
+            pending = executor.submit(fetch, **params) if executor and params is not None else None
+
+            for row in rows:
+                yield row
+
+            if params is None:
+                return
+
+            response = pending.result() if pending else fetch(**params)
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
+
+
+def split_date_range(startDate, endDate, shards):
+    """Splits a date range into disjoint windows of (nearly) equal length. Both ends of the range and of each window
+    are inclusive.
+
+    :param startDate: start date of the range (yyyy-MM-dd), string
+    :param endDate: end date of the range (yyyy-MM-dd), string
+    :param shards: wanted number of windows, integer
+    :return: list of (startDate, endDate) tuples, at most one window per day
+    """
+
+    start = datetime.datetime.strptime(startDate, DATE_FORMAT).date()
+    end = datetime.datetime.strptime(endDate, DATE_FORMAT).date()
+
+    if end < start:
+        raise ValueError("Given endDate {} is before startDate {}".format(endDate, startDate))
+
+    days = (end - start).days + 1
+    shards = max(1, min(int(shards), days))
+
+    windows = []
+    for i in range(shards):
+        window_start = start + datetime.timedelta(days=days * i // shards)
+        window_end = start + datetime.timedelta(days=days * (i + 1) // shards - 1)
+        windows.append((window_start.strftime(DATE_FORMAT), window_end.strftime(DATE_FORMAT)))
+
+    return windows
+
+
+def merge_by_id(iterables, id_key="id"):
+    """Merges row streams which are each ordered by id into one ordered stream without duplicate ids
+
+    :param iterables: row streams ordered by id ascending, list
+    :param id_key: key of the row identifier, string
+    :return: merged rows, generator of dicts
+    """
+
+    def keyed(i, iterable):
+        for row in iterable:
+            yield row_id(row, id_key), i, row
+
+    previous = None
+    merged = heapq.merge(*[keyed(i, iterable) for i, iterable in enumerate(iterables)])
+
+    for current, _, row in merged:
+        if current != previous:
+            yield row
+        previous = current
+
+
+class _Failure(object):
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+def _put(queue, item, stop):
+    """Puts an item to a bounded queue unless the consumer has stopped. Returns False if the consumer has stopped."""
+
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _in_background(executor, iterable, stop, buffer_size):
+    """Consumes an iterable in a worker thread and yields its items through a bounded queue"""
+
+    queue = Queue(buffer_size)
+
+    def produce():
+        try:
+            for item in iterable:
+                if not _put(queue, item, stop):
+                    return
+        except Exception as error:
+            _put(queue, _Failure(error), stop)
+        else:
+            _put(queue, _DONE, stop)
+
+    executor.submit(produce)
+
+    while True:
+        item = queue.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+
+def sharded_params(params, startDate, endDate, shards):
+    """Returns query parameters for each date window of a sharded scan. Results of each window are ordered by id.
+
+    :param params: query parameters of the search, dict
+    :param startDate: start date of the scan (yyyy-MM-dd), string
+    :param endDate: end date of the scan (yyyy-MM-dd), string
+    :param shards: wanted number of windows, integer
+    :return: query parameters for each window, list of dicts
+    """
+
+    params = dict(
+        (key, value) for key, value in params.items() if not key.startswith("orderBy") and key != "previousId"
+    )
+    params["orderById"] = "asc"
+
+    return [
+        dict(params, startDate=window_start, endDate=window_end)
+        for window_start, window_end in split_date_range(startDate, endDate, shards)
+    ]
+
+
+def scan(fetch, params, startDate, endDate, shards=4, results_key="results", id_key="id", buffer_size=100):
+    """Splits the date range of a search into disjoint windows and pages each window concurrently. Rows are merged in
+    id order without duplicates.
+
+    :param fetch: function which fetches one page with the given query parameters, e.g. client.get_invoices
+    :param params: query parameters of the search, dict
+    :param startDate: start date of the scan (yyyy-MM-dd), string
+    :param endDate: end date of the scan (yyyy-MM-dd), string
+    :param shards: number of date windows paged concurrently, integer
+    :param results_key: key of the result list in the response content, string
+    :param id_key: key of the row identifier, string
+    :param buffer_size: maximum number of rows buffered per window, integer
+    :return: result rows ordered by id, generator of dicts
+    """
+
+    windows = sharded_params(params, startDate, endDate, shards)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(windows))
+
+    try:
+        streams = [
+            _in_background(executor, paginate(fetch, window, results_key, id_key), stop, buffer_size)
+            for window in windows
+        ]
+        for row in merge_by_id(streams, id_key):
+            yield row
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
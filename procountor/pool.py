@@ -0,0 +1,202 @@
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .auth import token_store_key
+from .bulk import error_response
+from .client import Client
+from .session import create_session
+
+
+class ClientPool(object):
+    """Clients for many companies, one per company API key. The clients share one HTTP connection pool and the rate
+    limiter of the pool, if it has one, and each keeps the access token of its company. Clients are created on first
+    use. When there are more than max_clients, the least recently used clients which are not running jobs are closed
+    and their tokens forgotten; give a token_store to keep the tokens of evicted companies.
+
+    :param client_id: Procountor REST API client id, string
+    :param client_secret: Procountor REST API client secret, string
+    :param redirect_uri: URI where redirected after authentication, string
+    :param max_clients: maximum number of clients kept. Clients running jobs are not evicted, integer
+    :param session: HTTP session shared by the clients. If not given, the pool creates its own, requests.Session
+    :param pool_maxsize: maximum number of connections per host in the pool's own session, integer
+    :param rate_limiter: rate limiter shared by the clients, e.g. procountor.ratelimit.RateLimiter(). Requests are not
+                         limited if not given
+    :param options: other arguments of Client for all clients, e.g. test_mode, token_store or retry_policy, dict
+    """
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        redirect_uri,
+        max_clients=100,
+        session=None,
+        pool_maxsize=20,
+        rate_limiter=None,
+        **options
+    ):
+        self.credentials = {"client_id": client_id, "client_secret": client_secret, "redirect_uri": redirect_uri}
+        self.max_clients = max_clients
+        self._owns_session = session is None
+        self.session = session or create_session(pool_maxsize=pool_maxsize)
+        self.rate_limiter = rate_limiter
+        self.options = options
+        self._clients = collections.OrderedDict()
+        self._in_use = collections.Counter()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes all clients, and the session if the pool created it"""
+
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+
+        for client in clients:
+            client.close()
+        if self._owns_session:
+            self.session.close()
+
+    def client(self, api_key, **credentials):
+        """Returns the client of a company, creating it if needed
+
+        :param api_key: Procountor API key of the company, string
+        :param credentials: client_id, client_secret or redirect_uri of the company if they differ from the pool's,
+                            dict
+        :return: client, Client
+        """
+
+        with self._lock:
+            return self._client(self._key(api_key, credentials), api_key, credentials)
+
+    def _key(self, api_key, credentials):
+        credentials = dict(self.credentials, **credentials)
+        return token_store_key(api_key, credentials["client_id"], credentials["client_secret"],
+                               credentials["redirect_uri"])
+
+    def _client(self, key, api_key, credentials):
+        """Returns a client and marks it recently used. Called with the lock held."""
+
+        client = self._clients.get(key)
+        if client is None:
+            client = Client(
+                api_key,
+                session=self.session,
+                rate_limiter=self.rate_limiter,
+                **dict(self.options, **dict(self.credentials, **credentials))
+            )
+            self._clients[key] = client
+        self._clients.move_to_end(key)
+        self._evict(keep=key)
+        return client
+
+    def _evict(self, keep=None):
+        """Closes the least recently used idle clients over max_clients, except the client of the keep key, which
+        is being returned to a caller. Called with the lock held."""
+
+        idle = [key for key in self._clients if not self._in_use[key] and key != keep]
+        for key in idle[:max(len(self._clients) - self.max_clients, 0)]:
+            self._clients.pop(key).close()
+            del self._in_use[key]
+
+    def _checkout(self, tenant):
+        if isinstance(tenant, dict):
+            credentials = dict(tenant)
+            api_key = credentials.pop("api_key")
+        else:
+            api_key, credentials = tenant, {}
+
+        with self._lock:
+            key = self._key(api_key, credentials)
+            self._in_use[key] += 1
+            return key, self._client(key, api_key, credentials)
+
+    def _checkin(self, key):
+        with self._lock:
+            self._in_use[key] -= 1
+            self._evict()
+
+    def run(self, jobs, max_workers=8, max_per_tenant=None):
+        """Runs jobs of many companies concurrently and yields the results as they complete. A free worker takes
+        the next job of the next company in turn, so a company with many jobs doesn't delay the others. Jobs of a
+        company are read lazily, and its client is not evicted while it has jobs left. An exception raised by a job
+        doesn't stop the others; it is returned as the result of that job.
+
+        :param jobs: jobs by company, e.g. {"key-1": [job, job], "key-2": generator}. A job is a function which is
+                     called with the client of its company, e.g. lambda client: client.get_invoice(1). A company is
+                     its API key, or a dict of api_key and the credentials which differ from the pool's, e.g.
+                     [({"api_key": "key-3", "client_secret": "secret-3"}, jobs)]. Dict or iterable of
+                     (company, jobs) tuples
+        :param max_workers: maximum number of concurrent jobs, integer
+        :param max_per_tenant: maximum number of concurrent jobs per company, integer
+        :return: generator of (company, result) tuples
+        """
+
+        tenants = list(jobs.items() if hasattr(jobs, "items") else jobs)
+        queues = collections.OrderedDict((index, iter(tenant_jobs)) for index, (_, tenant_jobs) in enumerate(tenants))
+        turns = collections.deque(queues)
+        running = collections.Counter()
+        held = {}
+        pending = {}
+
+        def call(client, job):
+            try:
+                return job(client)
+            except Exception as error:
+                return error_response(error)
+
+        def release(index):
+            if index in held and index not in queues and not running[index]:
+                self._checkin(held.pop(index)[0])
+
+        def take():
+            for _ in range(len(turns)):
+                index = turns.popleft()
+                if max_per_tenant and running[index] >= max_per_tenant:
+                    turns.append(index)
+                    continue
+                job = next(queues[index], None)
+                if job is None:
+                    del queues[index]
+                    release(index)
+                    continue
+                turns.append(index)
+                return index, job
+            return None, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def fill():
+                while len(pending) < max_workers:
+                    index, job = take()
+                    if job is None:
+                        return
+                    if index not in held:
+                        held[index] = self._checkout(tenants[index][0])
+                    running[index] += 1
+                    pending[executor.submit(call, held[index][1], job)] = index
+
+            try:
+                fill()
+
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        index = pending.pop(future)
+                        running[index] -= 1
+                        release(index)
+                        yield tenants[index][0], future.result()
+
+                    fill()
+            finally:
+                for key, client in held.values():
+                    self._checkin(key)
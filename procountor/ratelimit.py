@@ -0,0 +1,174 @@
+import contextlib
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .endpoints import endpoint_group
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket. Each request takes one token, tokens are refilled at a steady rate up to the burst
+    size. When the bucket is empty, requests reserve future tokens in the order they arrive.
+
+    :param rate: tokens refilled per second, float
+    :param burst: maximum number of tokens in the bucket, integer
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _take(self, tokens, updated, now):
+        """Takes one token from the given state
+
+        :return: (tokens, updated, seconds to wait), tuple
+        """
+
+        tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+        return tokens, now, max(0.0, -tokens / self.rate)
+
+    def reserve(self):
+        """Takes a token and returns how long to wait before using it
+
+        :return: seconds to wait, float
+        """
+
+        with self._lock:
+            self._tokens, self._updated, wait = self._take(self._tokens, self._updated, time.time())
+            return wait
+
+    def acquire(self):
+        """Takes a token, waiting until it is available"""
+
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket whose state is kept in a file, so that all processes on one node share a single budget. The file
+    is locked while a token is taken.
+
+    :param path: path to the state file, string
+    :param rate: tokens refilled per second, float
+    :param burst: maximum number of tokens in the bucket, integer
+    """
+
+    _state = struct.Struct("<dd")
+
+    def __init__(self, path, rate, burst=None):
+        super(FileTokenBucket, self).__init__(rate, burst)
+        self.path = path
+
+    @contextlib.contextmanager
+    def _locked_file(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield fd
+        finally:
+            os.close(fd)
+
+    def reserve(self):
+        with self._lock, self._locked_file() as fd:
+            data = os.read(fd, self._state.size)
+            tokens, updated = self._state.unpack(data) if len(data) == self._state.size else (self.burst, time.time())
+
+            tokens, updated, wait = self._take(tokens, updated, time.time())
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, self._state.pack(tokens, updated))
+            return wait
+
+
+class RateLimiter(object):
+    """Client-side rate limiter with a token bucket per API host and optionally per endpoint group. A request waits
+    for a token from its host bucket and from the bucket of its group, e.g. "invoices" or "ledgerreceipts".
+
+    Give the same limiter to several clients to share the budget between threads. With shared_directory the buckets
+    are kept in files, and all processes using the same directory share the budget.
+
+    :param rate: requests per second per host, float
+    :param burst: maximum burst of requests per host, integer
+    :param group_limits: (rate, burst) by endpoint group, e.g. {"invoices": (5, 10)}, dict
+    :param shared_directory: directory for bucket state files shared between processes, string
+    """
+
+    def __init__(self, rate=10, burst=None, group_limits=None, shared_directory=None):
+        self.rate = rate
+        self.burst = burst
+        self.group_limits = dict(group_limits or {})
+        self.shared_directory = shared_directory
+        self._buckets = {}
+
+        if shared_directory and not os.path.isdir(shared_directory):
+            os.makedirs(shared_directory)
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, rate, burst):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if self.shared_directory:
+                    name = hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()[:32]
+                    path = os.path.join(self.shared_directory, "procountor-ratelimit-{}".format(name))
+                    bucket = FileTokenBucket(path, rate, burst)
+                else:
+                    bucket = TokenBucket(rate, burst)
+                self._buckets[key] = bucket
+            return bucket
+
+    def buckets(self, url, endpoint):
+        """Returns the buckets a request takes tokens from
+
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        :return: list of TokenBuckets
+        """
+
+        host = urlparse(url).netloc
+        buckets = []
+
+        if self.rate:
+            buckets.append(self._bucket((host,), self.rate, self.burst))
+
+        group = endpoint_group(endpoint)
+        if group in self.group_limits:
+            rate, burst = self.group_limits[group]
+            buckets.append(self._bucket((host, group), rate, burst))
+
+        return buckets
+
+    def reserve(self, url, endpoint):
+        """Takes tokens for a request and returns how long to wait before sending it
+
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        :return: seconds to wait, float
+        """
+
+        return max([bucket.reserve() for bucket in self.buckets(url, endpoint)] or [0.0])
+
+    def acquire(self, url, endpoint):
+        """Waits until a request may be sent
+
+        :param url: request url, string
+        :param endpoint: request endpoint, string
+        """
+
+        wait = self.reserve(url, endpoint)
+        if wait > 0:
+            time.sleep(wait)
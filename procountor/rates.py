@@ -0,0 +1,160 @@
+import decimal
+import threading
+import time
+
+from .bulk import fetch_many
+
+# Rate types of get_exchange_rate() by the numbers used by get_latest_currency_rate()
+RATE_TYPES = {
+    1: "PROCOUNTOR_ACCOUNTING_EXCHANGE_RATE",
+    2: "ACCOUNT_CURRENCY_AVERAGE_RATE",
+    3: "ACCOUNT_CURRENCY_BUYING_RATE",
+    4: "ACCOUNT_CURRENCY_SELLING_RATE",
+    5: "CASH_BUYING_RATE",
+    6: "CASH_CURRENCY_SALE_EXCHANGE_RATE",
+}
+
+DAY_FORMAT = "%Y-%m-%d"
+
+
+class RateService(object):
+    """Memoizing exchange rate lookups. Rates are cached by (baseCurrency, currency, day, rateType), so each rate is
+    requested from the API only once. The cache can be prefilled with the latest rates of the company, and
+    convert_many() fetches all missing rates of a batch concurrently.
+
+    A rate tells how much of the currency one unit of the base currency is worth, so an amount in the currency is
+    converted to the base currency by dividing it by the rate.
+
+    Rates are numbers as decoded by the codec of the client: floats, or Decimals with JsonCodec(use_decimal=True).
+
+    :param client: client used for the lookups, Client
+    :param baseCurrency: base currency, defaults to the currency of the company, string
+    :param rateType: default rate type, string, see get_exchange_rate()
+    :param max_workers: maximum number of concurrent rate requests, integer
+    """
+
+    def __init__(self, client, baseCurrency=None, rateType="PROCOUNTOR_ACCOUNTING_EXCHANGE_RATE", max_workers=8):
+        self.client = client
+        self.rateType = rateType
+        self.max_workers = max_workers
+        self._baseCurrency = baseCurrency
+        self._rates = {}
+        self._lock = threading.Lock()
+
+    @property
+    def baseCurrency(self):
+        """Base currency, requested with get_currency() if not given, string"""
+
+        if self._baseCurrency is None:
+            response = self.client.get_currency()
+            if response.get("status") != 200:
+                raise RuntimeError("Failed to get the currency of the company: {}".format(response.get("message")))
+            self._baseCurrency = response["content"]["currency"]
+        return self._baseCurrency
+
+    def _key(self, currency, day, baseCurrency=None, rateType=None):
+        return baseCurrency or self.baseCurrency, currency, day, rateType or self.rateType
+
+    def prefill(self, rateType=1):
+        """Adds the latest rates of the company base currency to the cache
+
+        :param rateType: rate type as a number, integer, see get_latest_currency_rate()
+        :return: number of rates added, integer
+        """
+
+        response = self.client.get_latest_currency_rate(rateType=rateType)
+        if response.get("status") != 200:
+            raise RuntimeError("Failed to get the latest currency rates: {}".format(response.get("message")))
+
+        content = response["content"]
+        baseCurrency = content.get("baseCurrency") or self.baseCurrency
+        rates = content.get("currencyRates") or content.get("rates") or content.get("results") or []
+
+        with self._lock:
+            for rate in rates:
+                day = (rate.get("day") or content.get("day") or time.strftime(DAY_FORMAT))[:10]
+                self._rates[(baseCurrency, rate["currency"], day, RATE_TYPES[rateType])] = rate["rate"]
+
+        return len(rates)
+
+    def _fetch(self, key):
+        baseCurrency, currency, day, rateType = key
+        return self.client.get_exchange_rate(baseCurrency=baseCurrency, currency=currency, day=day, rateType=rateType)
+
+    def rate(self, currency, day, baseCurrency=None, rateType=None):
+        """Returns an exchange rate, from the cache or from the API
+
+        :param currency: currency, string
+        :param day: day for the rate (yyyy-MM-dd), string
+        :param baseCurrency: base currency, defaults to the base currency of the service, string
+        :param rateType: rate type, defaults to the rate type of the service, string
+        :return: rate, float or Decimal
+        """
+
+        return self.rates([(currency, day)], baseCurrency, rateType)[(currency, day)]
+
+    def rates(self, lookups, baseCurrency=None, rateType=None):
+        """Returns many exchange rates. Each missing rate is requested once, concurrently.
+
+        :param lookups: (currency, day) tuples, iterable
+        :param baseCurrency: base currency, defaults to the base currency of the service, string
+        :param rateType: rate type, defaults to the rate type of the service, string
+        :return: rates by (currency, day), dict
+        """
+
+        keys = dict((lookup, self._key(lookup[0], lookup[1], baseCurrency, rateType)) for lookup in set(lookups))
+
+        with self._lock:
+            missing = [key for key in set(keys.values()) if key not in self._rates and key[0] != key[1]]
+
+        failures = []
+        for key, response in fetch_many(self._fetch, missing, max_workers=self.max_workers):
+            if response.get("status") != 200:
+                failures.append((key, response))
+                continue
+            with self._lock:
+                self._rates[key] = response["content"]["rate"]
+
+        if failures:
+            key, response = failures[0]
+            raise RuntimeError("Failed to get {} exchange rates, e.g. {} {} {}: {}".format(
+                len(failures), key[0], key[1], key[2], response.get("message")
+            ))
+
+        one = decimal.Decimal(1) if getattr(getattr(self.client, "codec", None), "use_decimal", False) else 1.0
+        with self._lock:
+            return dict((lookup, one if key[0] == key[1] else self._rates[key]) for lookup, key in keys.items())
+
+    def convert_many(self, amounts, currencies, days, baseCurrency=None, rateType=None):
+        """Converts amounts to the base currency. The rates of distinct (currency, day) pairs are looked up once.
+
+        :param amounts: amounts, iterable of numbers
+        :param currencies: currencies of the amounts, iterable of strings
+        :param days: days of the amounts (yyyy-MM-dd), iterable of strings
+        :param baseCurrency: base currency, defaults to the base currency of the service, string
+        :param rateType: rate type, defaults to the rate type of the service, string
+        :return: amounts in the base currency, list of floats, or of Decimals if the amounts or the rates are
+                 Decimals
+        """
+
+        lookups = list(zip(currencies, days))
+        rates = self.rates(lookups, baseCurrency, rateType)
+
+        return [_divide(amount, rates[lookup]) for amount, lookup in zip(amounts, lookups)]
+
+    def clear(self):
+        """Removes all cached rates"""
+
+        with self._lock:
+            self._rates.clear()
+
+
+def _divide(amount, rate):
+    """Divides an amount by a rate. If either is a Decimal, the other is converted to a Decimal by its shortest
+    representation, since floats and Decimals can't be divided by each other."""
+
+    if isinstance(amount, decimal.Decimal) and not isinstance(rate, decimal.Decimal):
+        rate = decimal.Decimal(repr(rate))
+    elif isinstance(rate, decimal.Decimal) and not isinstance(amount, decimal.Decimal):
+        amount = decimal.Decimal(repr(amount))
+    return amount / rate
@@ -0,0 +1,105 @@
+import random
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+class RetryPolicy(object):
+    """Policy for retrying failed requests with capped exponential backoff and jitter.
+
+    Throttled requests (429) are retried with any method, because the API has not processed them. Other retryable
+    statuses and connection errors are retried only with idempotent methods, so that e.g. an invoice is not posted
+    twice. A Retry-After header of the response overrides the backoff.
+
+    :param total: maximum number of retries, integer
+    :param backoff_factor: backoff of the first retry in seconds, doubled for each retry, float
+    :param max_backoff: maximum backoff in seconds, float
+    :param jitter: randomize the backoff between zero and the computed value, bool
+    :param statuses: HTTP status codes which are retried, set of integers
+    :param methods: methods which are retried after a server or connection error, set of uppercase strings
+    :param respect_retry_after: wait as long as the Retry-After header of the response says, bool
+    :param max_retry_after: maximum wait in seconds for a Retry-After header, longer waits are not retried, float
+    """
+
+    def __init__(
+        self,
+        total=3,
+        backoff_factor=0.5,
+        max_backoff=30.0,
+        jitter=True,
+        statuses=RETRY_STATUSES,
+        methods=IDEMPOTENT_METHODS,
+        respect_retry_after=True,
+        max_retry_after=120.0,
+    ):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = max_retry_after
+
+    def should_retry(self, method, retries, status=None, retry_after=None):
+        """Whether a request which failed with the given status, or with a connection error if status is None,
+        should be retried
+
+        :param method: request method, uppercase string
+        :param retries: number of retries done so far, integer
+        :param status: HTTP status code of the response, integer or None
+        :param retry_after: value of the Retry-After header, string
+        :return: bool
+        """
+
+        if retries >= self.total:
+            return False
+
+        if status is not None:
+            if status not in self.statuses:
+                return False
+            if status != 429 and method not in self.methods:
+                return False
+        elif method not in self.methods:
+            return False
+
+        wait = self.retry_after(retry_after)
+        return wait is None or wait <= self.max_retry_after
+
+    def retry_after(self, value):
+        """Parses a Retry-After header
+
+        :param value: header value in seconds or as HTTP date, string
+        :return: seconds to wait, float or None if the header is missing, invalid or not respected
+        """
+
+        if not value or not self.respect_retry_after:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            parsed = parsedate_tz(value)
+            if parsed is None:
+                return None
+            return max(0.0, mktime_tz(parsed) - time.time())
+
+    def backoff(self, retries, retry_after=None):
+        """Returns seconds to wait before the next retry
+
+        :param retries: number of retries done so far, integer
+        :param retry_after: value of the Retry-After header, string
+        :return: seconds, float
+        """
+
+        wait = self.retry_after(retry_after)
+        if wait is not None:
+            return wait
+
+        wait = min(self.max_backoff, self.backoff_factor * (2 ** retries))
+        return random.uniform(0, wait) if self.jitter else wait
+
+
+NO_RETRY = RetryPolicy(total=0)
@@ -0,0 +1,43 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def create_session(
+    pool_connections=10,
+    pool_maxsize=10,
+    pool_block=False,
+    keep_alive=True,
+    host_limits=None,
+):
+    """Creates a requests session with a persistent connection pool for Procountor API. The session can be given to
+    several Client instances, so that all of them reuse the same open connections.
+
+    :param pool_connections: number of host pools to keep in the session, integer
+    :param pool_maxsize: maximum number of connections kept open per host, integer
+    :param pool_block: wait for a free connection instead of opening an extra one when the pool is full, bool
+    :param keep_alive: keep connections open between requests, bool
+    :param host_limits: maximum number of connections for specific hosts, e.g. {"https://api.procountor.com": 20},
+                        dict
+    :return: session, requests.Session
+    """
+
+    session = requests.Session()
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    for host, maxsize in (host_limits or {}).items():
+        session.mount(
+            host.rstrip("/") + "/",
+            HTTPAdapter(pool_connections=1, pool_maxsize=maxsize, pool_block=pool_block),
+        )
+
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+
+    return session
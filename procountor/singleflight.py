@@ -0,0 +1,61 @@
+import threading
+
+
+class _Call(object):
+    """Call in flight, and its outcome once it has finished"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """Collapses identical concurrent calls into one. The first thread calling do() with a key runs the function,
+    and threads calling do() with the same key while it runs wait for it and share its result or exception. Nothing
+    is remembered after the call has finished, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        """Calls the function, or waits for the call in flight with the same key
+
+        :param key: key of identical calls, hashable
+        :param function: function without arguments
+        :return: (result of the function, whether it was shared with another call) tuple
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, call.waiters > 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,3 @@
+from .standin import (  # noqa: F401
+    CREDENTIALS, StandInAdapter, StandInApi, StandInServer, generate_fixtures, load_fixtures, standin_session,
+)
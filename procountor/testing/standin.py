@@ -0,0 +1,710 @@
+import copy
+import datetime
+import io
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart import decoder
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.response import HTTPResponse
+
+from ..endpoints import endpoint_template
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures.json")
+
+# Credentials of the clients created for a stand-in. The stand-in accepts any credentials.
+CREDENTIALS = {
+    "api_key": "standin-key",
+    "client_id": "standin-client",
+    "client_secret": "standin-secret",
+    "redirect_uri": "http://localhost",
+}
+
+# Result list of the paginated searches by endpoint, as (resource, key of the result list, id key, date field)
+SEARCHES = {
+    "bankaccounts": ("bankaccounts", "results", "id", None),
+    "businesspartners": ("businesspartners", "results", "id", None),
+    "invoices": ("invoices", "results", "id", "date"),
+    "ledgerreceipts": ("ledgerreceipts", "results", "receiptId", "receiptDate"),
+    "payments/errormessages": ("paymenterrors", "results", "id", None),
+    "products": ("products", "products", "id", None),
+    "referencepayments": ("referencepayments", "results", "id", "paymentDate"),
+}
+
+# Nested lists which are left out of search results, like the API returns only summaries
+SUMMARY_EXCLUDES = ("invoiceRows", "transactions")
+
+MAX_PAGE_SIZE = 200
+DATE_FORMAT = "%Y-%m-%d"
+VERSION_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def load_fixtures(path=FIXTURES):
+    """Loads fixtures from a JSON file. The bundled fixtures contain a small demo company with business partners,
+    products, invoices, ledger receipts, bank statements, reference payments and an attachment.
+
+    :param path: path to the fixture file, defaults to the bundled fixtures, string
+    :return: fixtures, dict
+    """
+
+    with io.open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generate_fixtures(fixtures=None, invoices=0, ledger_receipts=0, seed=0):
+    """Adds generated invoices and ledger receipts to fixtures, e.g. for load runs. The records reuse the business
+    partners and products of the fixtures, and the same seed gives the same records.
+
+    :param fixtures: fixtures to extend, defaults to the bundled fixtures, dict
+    :param invoices: number of invoices to add, integer
+    :param ledger_receipts: number of ledger receipts to add, integer
+    :param seed: seed of the random generator, integer
+    :return: fixtures, dict
+    """
+
+    fixtures = copy.deepcopy(fixtures) if fixtures is not None else load_fixtures()
+    rng = random.Random(seed)
+    partners = fixtures["businesspartners"]
+    products = [product for product in fixtures["products"] if product["type"] == "SALES"]
+    start = datetime.date(2019, 1, 1)
+
+    invoiceId = max([invoice["id"] for invoice in fixtures["invoices"]] or [0])
+    for _ in range(invoices):
+        invoiceId += 1
+        partner = rng.choice(partners)
+        date = start + datetime.timedelta(days=rng.randrange(365))
+        rows = []
+        for row in range(rng.randint(1, 5)):
+            product = rng.choice(products)
+            rows.append({
+                "id": invoiceId * 10 + row + 1,
+                "productId": product["id"],
+                "product": product["name"],
+                "productCode": product["code"],
+                "quantity": float(rng.randint(1, 20)),
+                "unit": product["unit"],
+                "unitPrice": product["price"],
+                "discountPercent": 0.0,
+                "vatPercent": product["vat"],
+            })
+        version = (datetime.datetime.combine(date, datetime.time(12)) + datetime.timedelta(days=rng.randrange(30)))
+        fixtures["invoices"].append({
+            "id": invoiceId,
+            "partnerId": partner["id"],
+            "type": "SALES_INVOICE",
+            "status": rng.choice(("SENT", "PAID", "PAID", "UNFINISHED")),
+            "date": date.strftime(DATE_FORMAT),
+            "invoiceNumber": invoiceId,
+            "currency": "EUR",
+            "totalAmount": round(sum(row["quantity"] * row["unitPrice"] * 1.24 for row in rows), 2),
+            "counterParty": {"counterPartyAddress": {"name": partner["name"]}},
+            "paymentInfo": {
+                "paymentMethod": "BANK_TRANSFER",
+                "currency": "EUR",
+                "dueDate": (date + datetime.timedelta(days=14)).strftime(DATE_FORMAT),
+            },
+            "invoiceRows": rows,
+            "version": version.strftime(VERSION_FORMAT),
+        })
+
+    receiptId = max([receipt["receiptId"] for receipt in fixtures["ledgerreceipts"]] or [0])
+    for _ in range(ledger_receipts):
+        receiptId += 1
+        date = start + datetime.timedelta(days=rng.randrange(365))
+        amount = round(rng.uniform(10, 5000), 2)
+        vat = round(amount * 0.24, 2)
+        fixtures["ledgerreceipts"].append({
+            "receiptId": receiptId,
+            "type": "SALES_INVOICE",
+            "status": "APPROVED",
+            "name": rng.choice(partners)["name"],
+            "receiptDate": date.strftime(DATE_FORMAT),
+            "vatType": "SALES",
+            "version": date.strftime(DATE_FORMAT) + "T12:00:00",
+            "transactions": [
+                {"transactionType": "TRANSACTION_EVENT", "account": "1700", "accountingValue": amount + vat},
+                {
+                    "transactionType": "TRANSACTION_EVENT",
+                    "account": "3000",
+                    "accountingValue": -amount,
+                    "vatPercent": 24.0,
+                    "dimensions": [{"dimensionId": 401, "items": [
+                        {"dimensionItemId": rng.choice((411, 412)), "value": -amount}
+                    ]}],
+                },
+                {"transactionType": "TRANSACTION_EVENT", "account": "2939", "accountingValue": -vat},
+            ],
+        })
+
+    return fixtures
+
+
+class StandInApi(object):
+    """In-process stand-in of the Procountor REST API, for offline tests and load runs. It implements the endpoints
+    of the API methods on data seeded from fixtures: access tokens of oauth/token, previousId pagination of the
+    searches, multipart attachments and the other reads and writes. Writes change the data of the stand-in.
+
+    Tokens expire after token_lifetime seconds, or at once with expire_tokens(), after which requests get 401
+    responses. Faults can be injected with inject() for the next matching requests, or at random with error_rates,
+    e.g. {429: 0.05, 503: 0.01}. Random faults are not injected to token requests. Every request waits latency
+    seconds first, or a random time between (min, max) seconds.
+
+    Serve the stand-in over HTTP with StandInServer.
+
+    :param fixtures: data of the stand-in, defaults to the bundled fixtures, dict
+    :param token_lifetime: seconds until a token expires, integer
+    :param page_size: default page size of the searches, integer
+    :param latency: seconds each request takes, float or (min, max) tuple
+    :param error_rates: probabilities of random fault responses by status code, dict
+    :param seed: seed of the random faults and latencies, integer
+    """
+
+    def __init__(self, fixtures=None, token_lifetime=3600, page_size=50, latency=0.0, error_rates=None, seed=None):
+        fixtures = copy.deepcopy(fixtures) if fixtures is not None else load_fixtures()
+        self.token_lifetime = token_lifetime
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rates = dict(error_rates or {})
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._faults = []
+        self._attachments = {}
+        self._load(fixtures)
+
+    def _load(self, fixtures):
+        self.singletons = dict(
+            (name, fixtures.get(name, {}))
+            for name in ("company", "sessioninfo", "users", "personaldetails", "coa", "fiscalyears", "vats")
+        )
+        self.currencies = list(fixtures.get("currencies", ["EUR"]))
+        self.exchange_rates = dict(fixtures.get("exchangeRates", {"EUR": 1.0}))
+        self.vats_country = dict(fixtures.get("vatsCountry", {}))
+        self.product_groups = list(fixtures.get("productgroups", []))
+        self.dimensions = dict((dimension["id"], dimension) for dimension in fixtures.get("dimensions", []))
+        self.statements = dict((statement["id"], statement) for statement in fixtures.get("bankstatements", []))
+        self.profiles = dict((profile["id"], profile) for profile in fixtures.get("userprofiles", []))
+
+        self.resources = {}
+        for resource, _, id_key, _ in SEARCHES.values():
+            records = fixtures.get(resource, [])
+            self.resources[resource] = dict((record[id_key], record) for record in records)
+        self.resources["payments"] = dict((payment["id"], payment) for payment in fixtures.get("payments", []))
+
+        for attachment in fixtures.get("attachments", []):
+            attachment = dict(attachment)
+            content = attachment.pop("content", "")
+            self._attachments[attachment["id"]] = (attachment, content.encode("utf-8"))
+
+        self._next_id = 1 + max(
+            [key for records in self.resources.values() for key in records] + list(self._attachments) or [0]
+        )
+
+    def _new_id(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id - 1
+
+    def expire_tokens(self):
+        """Expires all issued access tokens"""
+
+        with self._lock:
+            self._tokens = dict((token, (tenant, 0)) for token, (tenant, _) in self._tokens.items())
+
+    def inject(self, status, count=1, endpoint=None, retry_after=None):
+        """Answers the next matching requests with an error
+
+        :param status: HTTP status code of the error, e.g. 429 or 503, integer
+        :param count: number of requests answered with the error, integer
+        :param endpoint: templated endpoint of the requests, e.g. "invoices/{id}", or all requests, string
+        :param retry_after: value of the Retry-After header, string
+        """
+
+        with self._lock:
+            self._faults.append([status, count, endpoint, retry_after])
+
+    def _fault(self, endpoint):
+        with self._lock:
+            for fault in self._faults:
+                if fault[2] is None or fault[2] == endpoint:
+                    fault[1] -= 1
+                    if fault[1] <= 0:
+                        self._faults.remove(fault)
+                    return fault[0], fault[3]
+
+            if endpoint != "oauth/token":
+                for status, rate in sorted(self.error_rates.items()):
+                    if self._random.random() < rate:
+                        return status, "0" if status == 429 else None
+
+        return None
+
+    def _sleep(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            with self._lock:
+                latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def handle(self, method, url, headers=None, body=b""):
+        """Answers a request
+
+        :param method: request method, string
+        :param url: request url or path with query string. The path is read after "/api/", string
+        :param headers: request headers, dict
+        :param body: request body, bytes
+        :return: (status code, headers, body) tuple
+        """
+
+        headers = dict((key.lower(), value) for key, value in (headers or {}).items())
+        parts = urlsplit(url)
+        path = parts.path.split("/api/", 1)[-1].strip("/")
+        while "//" in path:
+            path = path.replace("//", "/")
+        endpoint = endpoint_template(path)
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+
+        self._sleep()
+
+        fault = self._fault(endpoint)
+        if fault is not None:
+            status, retry_after = fault
+            response = _text(status, "Injected error")
+            if retry_after is not None:
+                response[1]["Retry-After"] = retry_after
+        elif endpoint == "oauth/token":
+            response = self._token(body)
+        elif not self._authorized(headers.get("authorization")):
+            response = _text(401, "Unauthorized")
+        else:
+            handler = ROUTES.get((method, endpoint))
+            if handler is None:
+                response = _error(404, "Not found: {} {}".format(method, path))
+            else:
+                ids = [int(segment) for segment in path.split("/") if segment.isdigit()]
+                try:
+                    response = handler(self, ids, params, body, headers.get("content-type", ""))
+                except (KeyError, IndexError):
+                    response = _error(404, "Not found: {} {}".format(method, path))
+                except ValueError as e:
+                    response = _error(400, str(e))
+
+        with self._lock:
+            self.requests.append((method, endpoint, response[0]))
+        return response
+
+    # Authentication
+
+    def _token(self, body):
+        form = dict(parse_qsl(body.decode("utf-8")))
+        if form.get("grant_type") != "client_credentials" or not form.get("client_id") or not form.get("api_key"):
+            return _error(400, "Invalid token request")
+
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._tokens[token] = (form["api_key"], time.time() + self.token_lifetime)
+        return _json(200, {"access_token": token, "token_type": "bearer", "expires_in": self.token_lifetime})
+
+    def _authorized(self, authorization):
+        if not authorization or not authorization.startswith("Bearer "):
+            return False
+        entry = self._tokens.get(authorization[len("Bearer "):])
+        return entry is not None and time.time() < entry[1]
+
+    # Searches and records
+
+    def search(self, endpoint, params):
+        """Returns one page of a search like the API, following previousId
+
+        :param endpoint: search endpoint, e.g. "invoices", string
+        :param params: query parameters, dict
+        :return: content of the response, dict
+        """
+
+        resource, results_key, id_key, date_field = SEARCHES[endpoint]
+        size = int(params.get("size") or self.page_size)
+        if not 1 <= size <= MAX_PAGE_SIZE:
+            raise ValueError("size must be between 1 and {}".format(MAX_PAGE_SIZE))
+
+        startDate = _date(params.get("startDate"))
+        endDate = _date(params.get("endDate"))
+        types = set(params["types"].split(",")) if params.get("types") else None
+        descending = params.get("orderById", "asc").lower() == "desc"
+        previousId = int(params["previousId"]) if params.get("previousId") else None
+
+        with self._lock:
+            records = list(self.resources[resource].values())
+
+        rows = []
+        for record in sorted(records, key=lambda record: record[id_key], reverse=descending):
+            if previousId is not None and (record[id_key] - previousId) * (-1 if descending else 1) <= 0:
+                continue
+            if date_field and startDate and record.get(date_field, "") < startDate:
+                continue
+            if date_field and endDate and record.get(date_field, "") > endDate:
+                continue
+            if types and record.get("type") not in types:
+                continue
+            if params.get("status") and record.get("status") != params["status"]:
+                continue
+            if params.get("versionStartDate") and (record.get("version") or "") < params["versionStartDate"]:
+                continue
+            rows.append(dict((key, value) for key, value in record.items() if key not in SUMMARY_EXCLUDES))
+            if len(rows) == size:
+                break
+
+        return {results_key: rows, "meta": {"pageNumber": 0, "pageSize": size, "resultCount": len(rows)}}
+
+    def _get(self, resource, recordId):
+        with self._lock:
+            return _json(200, self.resources[resource][recordId])
+
+    def _create(self, resource, id_key, body):
+        record = json.loads(body.decode("utf-8"))
+        record[id_key] = self._new_id()
+        record["version"] = time.strftime(VERSION_FORMAT)
+        with self._lock:
+            self.resources[resource][record[id_key]] = record
+        return _json(200, record)
+
+    def _update(self, resource, recordId, body, **changes):
+        with self._lock:
+            record = self.resources[resource][recordId]
+            if body:
+                record.update(json.loads(body.decode("utf-8")))
+            record.update(changes)
+            record["version"] = time.strftime(VERSION_FORMAT)
+            return _json(200, record)
+
+    # Attachments
+
+    def _get_attachment(self, ids, params, body, content_type):
+        with self._lock:
+            meta, content = self._attachments[ids[0]]
+        encoder = MultipartEncoder(fields=[
+            ("meta", (None, json.dumps(meta).encode("utf-8"), "application/json")),
+            ("file", (meta.get("name", "file"), content, meta.get("mimeType", "application/octet-stream"))),
+        ])
+        return 200, {"Content-Type": encoder.content_type.replace("form-data", "mixed")}, encoder.to_string()
+
+    def _post_attachment(self, ids, params, body, content_type):
+        if not content_type.startswith("multipart/"):
+            raise ValueError("Attachment must be sent as multipart/form-data")
+
+        parts = decoder.MultipartDecoder(body, content_type).parts
+        if len(parts) != 2:
+            raise ValueError("Attachment must have a meta part and a file part")
+
+        meta = json.loads(parts[0].content.decode("utf-8"))
+        meta["id"] = self._new_id()
+        meta["size"] = len(parts[1].content)
+        with self._lock:
+            self._attachments[meta["id"]] = (meta, parts[1].content)
+        return _json(200, meta)
+
+    def _delete_attachment(self, ids, params, body, content_type):
+        with self._lock:
+            del self._attachments[ids[0]]
+        return 200, {}, b""
+
+    # Other endpoints
+
+    def _exchange_rate(self, params):
+        baseCurrency = params.get("baseCurrency") or self.singletons["company"].get("currency", "EUR")
+        currency = params["currency"]
+        rate = self.exchange_rates[currency] / self.exchange_rates[baseCurrency]
+        return {
+            "baseCurrency": baseCurrency,
+            "currency": currency,
+            "day": params.get("day") or time.strftime(DATE_FORMAT),
+            "rateType": params.get("rateType", "PROCOUNTOR_ACCOUNTING_EXCHANGE_RATE"),
+            "rate": round(rate, 6),
+        }
+
+    def _latest_rates(self, params):
+        baseCurrency = self.singletons["company"].get("currency", "EUR")
+        return {
+            "baseCurrency": baseCurrency,
+            "day": time.strftime(DATE_FORMAT),
+            "currencyRates": [
+                {"currency": currency, "rate": self._exchange_rate({"currency": currency})["rate"]}
+                for currency in sorted(self.exchange_rates) if currency != baseCurrency
+            ],
+        }
+
+    def _bank_statements(self, params):
+        startDate = _date(params["startDate"])
+        endDate = _date(params["endDate"])
+        with self._lock:
+            statements = [
+                statement for _, statement in sorted(self.statements.items())
+                if statement["startDate"] <= endDate and statement["endDate"] >= startDate
+            ]
+        return {"results": statements}
+
+    def _dimension_item(self, ids, body):
+        item = json.loads(body.decode("utf-8"))
+        with self._lock:
+            items = self.dimensions[ids[0]].setdefault("items", [])
+            if item.get("id") is None:
+                item["id"] = self._next_id
+                self._next_id += 1
+                items.append(item)
+            else:
+                next(existing for existing in items if existing["id"] == item["id"]).update(item)
+        return _json(200, item)
+
+
+def _date(value):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value[:10], DATE_FORMAT).strftime(DATE_FORMAT)
+    except ValueError:
+        raise ValueError("Invalid date: {}".format(value))
+
+
+def _json(status, content):
+    return status, {"Content-Type": "application/json"}, json.dumps(content).encode("utf-8")
+
+
+def _text(status, text):
+    return status, {"Content-Type": "text/plain"}, text.encode("utf-8")
+
+
+def _error(status, message):
+    return _json(status, {"errors": [{"status": status, "message": message}]})
+
+
+def _search(endpoint):
+    return lambda api, ids, params, body, content_type: _json(200, api.search(endpoint, params))
+
+
+def _content(read):
+    return lambda api, ids, params, body, content_type: _json(200, read(api, ids, params))
+
+
+def _echo(api, ids, params, body, content_type):
+    return _json(200, json.loads(body.decode("utf-8")) if body else {})
+
+
+# Handlers by (method, endpoint template). A handler is called with the stand-in, the numeric identifiers of the
+# path, the query parameters, the body and its content type, and returns (status code, headers, body).
+ROUTES = {
+    ("GET", "attachments/{id}"): StandInApi._get_attachment,
+    ("DELETE", "attachments/{id}"): StandInApi._delete_attachment,
+    ("POST", "attachments"): StandInApi._post_attachment,
+    ("GET", "bankaccounts"): _search("bankaccounts"),
+    ("GET", "bankstatements"): _content(lambda api, ids, params: api._bank_statements(params)),
+    ("DELETE", "bankstatements/{id}/events/{id}/products"): _echo,
+    ("PUT", "bankstatements/{id}/events/{id}/products"): _echo,
+    ("GET", "businesspartners"): _search("businesspartners"),
+    ("GET", "businesspartners/personaldetails"): _content(lambda api, ids, params: api.singletons["personaldetails"]),
+    ("GET", "businesspartners/{id}"): lambda api, ids, *args: api._get("businesspartners", ids[0]),
+    ("PUT", "businesspartners/{id}"): lambda api, ids, params, body, *args: api._update(
+        "businesspartners", ids[0], body
+    ),
+    ("GET", "coa"): _content(lambda api, ids, params: api.singletons["coa"]),
+    ("GET", "company"): _content(lambda api, ids, params: api.singletons["company"]),
+    ("PUT", "company"): _echo,
+    ("GET", "currencies"): _content(lambda api, ids, params: {"currencies": api.currencies}),
+    ("GET", "currencies/company"): _content(
+        lambda api, ids, params: {"currency": api.singletons["company"].get("currency", "EUR")}
+    ),
+    ("GET", "currencies/exchangerate"): _content(lambda api, ids, params: api._exchange_rate(params)),
+    ("GET", "currencies/latest"): _content(lambda api, ids, params: api._latest_rates(params)),
+    ("GET", "dimensions"): _content(lambda api, ids, params: [api.dimensions[key] for key in sorted(api.dimensions)]),
+    ("PUT", "dimensions"): _echo,
+    ("GET", "dimensions/{id}"): _content(lambda api, ids, params: api.dimensions[ids[0]]),
+    ("POST", "dimensions/{id}/items"): lambda api, ids, params, body, *args: api._dimension_item(ids, body),
+    ("PUT", "dimensions/{id}/items"): lambda api, ids, params, body, *args: api._dimension_item(ids, body),
+    ("GET", "fiscalyears"): _content(lambda api, ids, params: api.singletons["fiscalyears"]),
+    ("GET", "invoices"): _search("invoices"),
+    ("POST", "invoices"): lambda api, ids, params, body, *args: api._create("invoices", "id", body),
+    ("PUT", "invoices/pay"): _echo,
+    ("GET", "invoices/{id}"): lambda api, ids, *args: api._get("invoices", ids[0]),
+    ("PUT", "invoices/{id}/approve"): lambda api, ids, *args: api._update("invoices", ids[0], None, status="APPROVED"),
+    ("GET", "invoices/{id}/comments"): _content(lambda api, ids, params: {"comments": []}),
+    ("POST", "invoices/{id}/comments"): _echo,
+    ("PUT", "invoices/{id}/confirm"): _echo,
+    ("GET", "invoices/{id}/paymentevents"): _content(lambda api, ids, params: {"paymentEvents": []}),
+    ("DELETE", "invoices/{id}/paymentevents/{id}"): _echo,
+    ("PUT", "invoices/{id}/paymentevents/markpaid"): lambda api, ids, *args: api._update(
+        "invoices", ids[0], None, status="PAID"
+    ),
+    ("PUT", "invoices/{id}/send"): lambda api, ids, *args: api._update("invoices", ids[0], None, status="SENT"),
+    ("PUT", "invoices/{id}/sendToCirculation"): lambda api, ids, *args: api._update(
+        "invoices", ids[0], None, status="SENT_TO_CIRCULATION"
+    ),
+    ("PUT", "invoices/{id}/verify"): lambda api, ids, *args: api._update("invoices", ids[0], None, status="VERIFIED"),
+    ("GET", "ledgerreceipts"): _search("ledgerreceipts"),
+    ("POST", "ledgerreceipts"): lambda api, ids, params, body, *args: api._create("ledgerreceipts", "receiptId", body),
+    ("GET", "ledgerreceipts/{id}"): lambda api, ids, *args: api._get("ledgerreceipts", ids[0]),
+    ("PUT", "ledgerreceipts/{id}"): lambda api, ids, params, body, *args: api._update("ledgerreceipts", ids[0], body),
+    ("POST", "payments"): lambda api, ids, params, body, *args: api._create("payments", "id", body),
+    ("GET", "payments/{id}"): lambda api, ids, *args: api._get("payments", ids[0]),
+    ("DELETE", "payments/{id}"): _echo,
+    ("PUT", "payments/{id}/cancel"): lambda api, ids, *args: api._update("payments", ids[0], None, status="CANCELLED"),
+    ("PUT", "payments/{id}/confirm"): _echo,
+    ("POST", "payments/directbanktransfers"): _echo,
+    ("GET", "payments/errormessages"): _search("payments/errormessages"),
+    ("GET", "products"): _search("products"),
+    ("GET", "products/groups"): _content(lambda api, ids, params: [
+        group for group in api.product_groups
+        if not params.get("productType") or group.get("productType") == params["productType"]
+    ]),
+    ("GET", "products/{id}"): lambda api, ids, *args: api._get("products", ids[0]),
+    ("GET", "referencepayments"): _search("referencepayments"),
+    ("GET", "sessioninfo"): _content(lambda api, ids, params: api.singletons["sessioninfo"]),
+    ("GET", "users"): _content(lambda api, ids, params: api.singletons["users"]),
+    ("PUT", "users"): _echo,
+    ("GET", "users/otp"): _echo,
+    ("PUT", "users/{id}/confirm"): _echo,
+    ("GET", "users/profiles/{id}"): _content(lambda api, ids, params: api.profiles[ids[0]]),
+    ("GET", "vats/country"): _content(lambda api, ids, params: {
+        "countryCode": params["countryCode"], "vatPercentages": api.vats_country[params["countryCode"]]
+    }),
+    ("GET", "vats/default"): _content(lambda api, ids, params: api.singletons["vats"]),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, content = self.server.api.handle(self.command, self.path, dict(self.headers), body)
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInAdapter(HTTPAdapter):
+    """Transport adapter of requests which answers requests with a StandInApi in-process, without sockets. Mount it
+    to a session with standin_session(), so that the time of a request is spent in the client and the stand-in only.
+
+    :param api: stand-in answering the requests, defaults to StandInApi() with the bundled fixtures, StandInApi
+    """
+
+    def __init__(self, api=None):
+        super(StandInAdapter, self).__init__()
+        self.api = api or StandInApi()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body
+        if body is None:
+            body = b""
+        elif hasattr(body, "read"):
+            body = body.read()
+        elif not isinstance(body, bytes):
+            body = body.encode("utf-8")
+
+        status, headers, content = self.api.handle(request.method, request.url, dict(request.headers), body)
+        headers = dict(headers, **{"Content-Length": str(len(content))})
+        raw = HTTPResponse(
+            body=io.BytesIO(content), headers=headers, status=status, preload_content=False, decode_content=False
+        )
+        return self.build_response(request, raw)
+
+
+def standin_session(api=None):
+    """Returns a requests session which answers all requests with a StandInApi in-process. Give it to a client
+    with any host, e.g. Client(session=standin_session(), **CREDENTIALS).
+
+    :param api: stand-in answering the requests, defaults to StandInApi() with the bundled fixtures, StandInApi
+    :return: session, requests.Session
+    """
+
+    adapter = StandInAdapter(api)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInServer(object):
+    """Serves a StandInApi over HTTP on a local port in a background thread. Point a client to it with host=url,
+    or create one with client(). The server is started with start() or by using it as a context manager.
+
+    :param api: stand-in to serve, defaults to StandInApi() with the bundled fixtures, StandInApi
+    :param host: address to listen on, string
+    :param port: port to listen on, 0 for any free port, integer
+    """
+
+    def __init__(self, api=None, host="127.0.0.1", port=0):
+        self.api = api or StandInApi()
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base url of the server, e.g. http://127.0.0.1:8080, string"""
+
+        return "http://{}:{}".format(self.host, self.port)
+
+    def start(self):
+        """Starts serving in a background thread
+
+        :return: the server, StandInServer
+        """
+
+        self._server = _ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.api = self.api
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="procountor-standin")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server"""
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def client(self, **options):
+        """Returns a client for the server with dummy credentials
+
+        :param options: other arguments of Client, dict
+        :return: client, Client
+        """
+
+        from ..client import Client
+
+        return Client(host=self.url, **dict(CREDENTIALS, **options))
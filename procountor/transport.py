@@ -0,0 +1,256 @@
+import base64
+import collections
+import gzip
+import io
+import json
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.response import HTTPResponse
+
+from .session import create_session
+
+# Fields whose values are replaced with REDACTED in recorded form bodies and JSON responses, so that cassettes can
+# be shared without the credentials and access tokens of the company
+SECRET_FIELDS = ("access_token", "api_key", "client_id", "client_secret", "refresh_token")
+REDACTED = "REDACTED"
+
+# Response headers kept in cassettes. Other headers, e.g. cookies and request ids, are left out.
+RECORDED_HEADERS = ("Content-Disposition", "Content-Type", "Retry-After")
+
+# Bodies larger than this are stored compressed in cassettes
+COMPRESS_OVER = 1024
+
+
+class HttpTransport(object):
+    """Sends the requests of a client over HTTP. This is the default transport of Client. A transport has the
+    request and post methods of requests.Session, so a session can be used as a transport as well.
+
+    :param session: HTTP session to use, defaults to a new session from procountor.session.create_session,
+                    requests.Session
+    """
+
+    def __init__(self, session=None):
+        self.session = session or create_session()
+
+    def request(self, method, url, **options):
+        return self.session.request(method, url, **options)
+
+    def post(self, url, data=None, **options):
+        return self.session.post(url, data=data, **options)
+
+    def close(self):
+        self.session.close()
+
+
+class RecordingTransport(object):
+    """Sends the requests with another transport and records each request and response to a cassette. Cassettes
+    are JSON lines files, one interaction per line, and they are gzipped if the path ends with .gz. Bodies over 1 kB,
+    e.g. multipart attachments, are stored compressed. Credentials and access tokens are redacted.
+
+    Streaming request bodies and downloads are read into memory while recording.
+
+    :param path: path of the cassette, string
+    :param transport: transport which sends the requests, defaults to HttpTransport()
+    :param append: add the interactions to an existing cassette instead of replacing it, bool
+    """
+
+    def __init__(self, path, transport=None, append=False):
+        self.path = path
+        self.transport = transport or HttpTransport()
+        self.interactions = 0
+        self._file = _open(path, "at" if append else "wt")
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, method, url, **options):
+        body = _read_body(method, url, options)
+
+        started = time.time()
+        response = self.transport.request(method, url, **options)
+        content = response.content
+        seconds = time.time() - started
+
+        headers = dict((name, response.headers[name]) for name in RECORDED_HEADERS if name in response.headers)
+        interaction = {
+            "method": method,
+            "url": _path(url),
+            "request": _pack(body),
+            "status": response.status_code,
+            "headers": headers,
+            "body": _pack(content, headers.get("Content-Type")),
+            "seconds": round(seconds, 6),
+        }
+        line = json.dumps(interaction, separators=(",", ":"), sort_keys=True)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.interactions += 1
+
+        return response
+
+    def post(self, url, data=None, **options):
+        return self.request("POST", url, data=data, **options)
+
+    def close(self):
+        """Closes the cassette. The transport which sends the requests is left open."""
+
+        with self._lock:
+            self._file.close()
+
+
+class ReplayTransport(object):
+    """Answers the requests with the responses of a cassette written by RecordingTransport, without network access.
+    Requests are matched by method, path and query string, so the host of the client does not matter. Responses of
+    the same request are returned in the recorded order, starting again from the first one when all have been
+    returned.
+
+    :param path: path of the cassette, string
+    :param latency: seconds to wait before each response, or "recorded" to wait as long as the recorded request
+                    took, float or string
+    """
+
+    def __init__(self, path, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self._responses = collections.OrderedDict()
+        self._served = collections.defaultdict(int)
+        self._lock = threading.Lock()
+
+        with _open(path, "rt") as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    key = (interaction["method"], interaction["url"])
+                    self._responses.setdefault(key, []).append(interaction)
+
+    def __len__(self):
+        return sum(len(responses) for responses in self._responses.values())
+
+    def request(self, method, url, **options):
+        key = (method, _path(url))
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise LookupError("No recorded response for {} {} in {}".format(method, key[1], self.path))
+            interaction = responses[self._served[key] % len(responses)]
+            self._served[key] += 1
+
+        delay = interaction["seconds"] if self.latency == "recorded" else self.latency
+        if delay:
+            time.sleep(delay)
+
+        return _response(method, url, interaction)
+
+    def post(self, url, data=None, **options):
+        return self.request("POST", url, data=data, **options)
+
+    def close(self):
+        pass
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return io.open(path, mode[0], encoding="utf-8")
+
+
+def _path(url):
+    """Returns the path and query string of a url"""
+
+    parts = urlsplit(url)
+    return parts.path + ("?" + parts.query if parts.query else "")
+
+
+def _read_body(method, url, options):
+    """Reads the body of a request for recording. Files and streaming bodies are encoded or read into bytes, and
+    the options are changed to send the bytes instead.
+
+    :return: body, bytes, string, dict of form fields or None
+    """
+
+    files = options.pop("files", None)
+    data = options.get("data")
+
+    if files is not None:
+        prepared = requests.Request(method, url, files=files, data=data).prepare()
+        options["headers"] = dict(options.get("headers") or {}, **{"content-type": prepared.headers["Content-Type"]})
+        options["data"] = data = prepared.body
+    elif hasattr(data, "read"):
+        options["data"] = data = data.read()
+
+    if isinstance(data, dict):
+        return dict((name, REDACTED if name in SECRET_FIELDS else value) for name, value in data.items())
+    return data
+
+
+def _pack(body, content_type=None):
+    """Returns a body in the format of a cassette"""
+
+    if body is None or isinstance(body, dict):
+        return {"form": body} if body else None
+    if not isinstance(body, bytes):
+        body = body.encode("utf-8")
+    if not body:
+        return None
+
+    if content_type and content_type.startswith("application/json"):
+        try:
+            content = json.loads(body.decode("utf-8"))
+        except ValueError:
+            pass
+        else:
+            if isinstance(content, dict) and any(name in content for name in SECRET_FIELDS):
+                content = dict((name, REDACTED if name in SECRET_FIELDS else value) for name, value in content.items())
+                body = json.dumps(content).encode("utf-8")
+
+    if len(body) > COMPRESS_OVER:
+        compressed = zlib.compress(body)
+        if len(compressed) < len(body):
+            return {"zlib": base64.b64encode(compressed).decode("ascii")}
+
+    try:
+        return {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode("ascii")}
+
+
+def _unpack(body):
+    """Returns a body of a cassette as bytes"""
+
+    if body is None or "form" in body:
+        return b""
+    if "text" in body:
+        return body["text"].encode("utf-8")
+    if "zlib" in body:
+        return zlib.decompress(base64.b64decode(body["zlib"]))
+    return base64.b64decode(body["base64"])
+
+
+def _response(method, url, interaction):
+    """Builds a response of requests from a recorded interaction"""
+
+    content = _unpack(interaction["body"])
+    headers = dict(interaction["headers"], **{"Content-Length": str(len(content))})
+
+    response = requests.Response()
+    response.status_code = interaction["status"]
+    response.headers = CaseInsensitiveDict(headers)
+    response.raw = HTTPResponse(
+        body=io.BytesIO(content), headers=headers, status=response.status_code, preload_content=False,
+        decode_content=False,
+    )
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response.request = requests.Request(method, url).prepare()
+    return response
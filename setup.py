@@ -16,6 +16,13 @@ requirements = [
     'requests-toolbelt'
 ]
 
+extra_requirements = {
+    'aggregate': ['numpy'],
+    'async': ['httpx'],
+    'export': ['pyarrow'],
+    'opentelemetry': ['opentelemetry-api'],
+}
+
 setup_requirements = [
     # TODO(): put setup requirements (distutils extensions, etc.) here
 ]
@@ -32,9 +39,11 @@ setup(
     author="Joonas Maliniemi",
     author_email='joonas@vilkas.fi',
     url='https://github.com/vilkasgroup/Procountor',
-    packages=find_packages(include=['procountor']),
+    packages=find_packages(include=['procountor', 'procountor.*']),
     include_package_data=True,
+    package_data={'procountor.testing': ['fixtures.json']},
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     zip_safe=False,
     keywords='procountor',
@@ -44,9 +53,12 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.11',
     ],
+    python_requires='>=3.7',
     test_suite='tests',
     tests_require=test_requirements,
     setup_requires=setup_requirements,
@@ -0,0 +1,49 @@
+import json
+import threading
+import time
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content if isinstance(content, bytes) else json.dumps(content).encode("utf-8")
+        self.headers = dict({"Content-Type": "application/json"}, **(headers or {}))
+        self.text = self.content.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.content.decode("utf-8"))
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    """Session which hands out tokens "token-1", "token-2", ... and accepts only the latest one. Given responses
+    are returned first, one per request, before the default response."""
+
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self.lock = threading.Lock()
+        self.token_requests = 0
+        self.requests = []
+        self.calls = []
+
+    def post(self, url, data=None, headers=None):
+        with self.lock:
+            self.token_requests += 1
+            token = "token-{}".format(self.token_requests)
+        time.sleep(0.01)
+        return FakeResponse(200, {"access_token": token, "expires_in": 3600})
+
+    def request(self, method, url, headers=None, **options):
+        self.requests.append(headers["authorization"])
+        self.calls.append((method, url))
+        if headers["authorization"] != "Bearer token-{}".format(self.token_requests):
+            return FakeResponse(401, "Unauthorized")
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return FakeResponse(200, {"url": url})
@@ -34,6 +34,25 @@ class TestClientInvoices(TestClient):
             self.assertEqual(response['status'], 200)
             self.assertEqual(response['content']['id'], int(invoiceId))
 
+    def test_003_iter_invoices(self):
+        data = self.__class__.test_get_invoices_params
+
+        if data['startDate'] and data['endDate']:
+            response = self.client.get_invoices(**data)
+            invoices = list(self.client.iter_invoices(prefetch=True, **data))
+
+            self.assertEqual(response['status'], 200)
+            self.assertEqual(invoices[:len(response['content']['results'])], response['content']['results'])
+
+    def test_004_get_invoices_by_ids(self):
+        invoiceId = self.__class__.test_get_invoice_id
+        if invoiceId:
+            results = list(self.client.get_invoices_by_ids([invoiceId, invoiceId], ordered=True))
+
+            self.assertEqual([key for key, _ in results], [invoiceId, invoiceId])
+            self.assertEqual(results[0][1]['status'], 200)
+            self.assertEqual(results[0][1]['content']['id'], int(invoiceId))
+
     # def test_invoice(self):
     #     date = str(datetime.date.today())
     #     dueDate = str(datetime.date.today() + datetime.timedelta(weeks=2))
@@ -0,0 +1,33 @@
+import unittest
+from procountor.client import Client
+from procountor.session import create_session
+
+
+class TestSession(unittest.TestCase):
+
+    def test_001_pool_size(self):
+        session = create_session(pool_connections=2, pool_maxsize=5)
+        adapter = session.get_adapter("https://api.procountor.com/")
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 5)
+
+    def test_002_host_limits(self):
+        session = create_session(pool_maxsize=5, host_limits={"https://api.procountor.com": 20})
+        self.assertEqual(session.get_adapter("https://api.procountor.com/invoices")._pool_maxsize, 20)
+        self.assertEqual(session.get_adapter("https://pts-api.procountor.com/invoices")._pool_maxsize, 5)
+
+    def test_003_keep_alive(self):
+        self.assertEqual(create_session().headers["Connection"], "keep-alive")
+        self.assertEqual(create_session(keep_alive=False).headers["Connection"], "close")
+
+    def test_004_client_session(self):
+        client = Client("key", "id", "secret", "uri", pool_maxsize=5, pool_block=True,
+                        host_limits={"https://api.procountor.com": 20})
+        adapter = client.session.get_adapter("https://api.procountor.com/invoices")
+        self.assertEqual(adapter._pool_maxsize, 20)
+        self.assertTrue(adapter._pool_block)
+        self.assertEqual(client.session.get_adapter("https://pts-api.procountor.com/invoices")._pool_maxsize, 5)
+        client.close()
+
+if __name__ == '__main__':
+    unittest.main()
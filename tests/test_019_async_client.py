@@ -0,0 +1,118 @@
+import asyncio
+import unittest
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from procountor.async_client import AsyncClient
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncClient(unittest.TestCase):
+
+    def setUp(self):
+        self.token_requests = 0
+        self.tokens = iter(["expired", "fresh"])
+
+        def handler(request):
+            if request.url.path.endswith("/oauth/token/"):
+                self.token_requests += 1
+                return httpx.Response(200, json={"access_token": next(self.tokens)})
+            if request.headers["authorization"] == "Bearer expired":
+                return httpx.Response(401, text="Unauthorized")
+            if request.url.path.endswith("/products"):
+                previous = int(request.url.params.get("previousId", 0))
+                products = [{"id": i} for i in range(previous + 1, min(previous + 50, 120) + 1)]
+                return httpx.Response(200, json={"products": products, "meta": {"pageSize": 50}})
+            if request.url.path.endswith("/invoices"):
+                params = request.url.params
+                invoices = [
+                    {"id": i} for i in range(1, 201)
+                    if params["startDate"] <= "2019-01-{:02d}".format(i % 28 + 1) <= params["endDate"]
+                    and i > int(params.get("previousId", 0))
+                ]
+                return httpx.Response(200, json={"results": invoices[:50], "meta": {"pageSize": 50}})
+            return httpx.Response(200, json={"path": request.url.path, "query": str(request.url.query, "ascii")})
+
+        self.handler = handler
+        self.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.client = AsyncClient("key", "id", "secret", "uri", session=self.session)
+
+    def tearDown(self):
+        asyncio.run(self.session.aclose())
+
+    def test_001_api_method(self):
+        response = asyncio.run(self.client.get_vats_country(countryCode="FI"))
+
+        self.assertEqual(response['status'], 200)
+        self.assertTrue(response['content']['path'].endswith("/vats/country"))
+        self.assertEqual(response['content']['query'], "countryCode=FI")
+
+    def test_002_token_refresh(self):
+        response = asyncio.run(self.client.get_invoice(1))
+
+        self.assertEqual(response['status'], 200)
+        self.assertEqual(self.token_requests, 2)
+        self.assertEqual(self.client.access_token, "fresh")
+
+    def test_003_concurrent_requests(self):
+        async def fetch():
+            return await asyncio.gather(*[self.client.get_product(i) for i in range(10)])
+
+        responses = asyncio.run(fetch())
+        self.assertEqual([r['status'] for r in responses], [200] * 10)
+        self.assertTrue(responses[3]['content']['path'].endswith("/products/3"))
+        # one token request at start and one refresh after the first token was rejected
+        self.assertEqual(self.token_requests, 2)
+
+    def test_004_iter_products(self):
+        self.client.access_token = "fresh"
+
+        async def collect():
+            return [product async for product in self.client.iter_products(prefetch=True)]
+
+        self.assertEqual(asyncio.run(collect()), [{"id": i} for i in range(1, 121)])
+
+    def test_005_scan_invoices(self):
+        self.client.access_token = "fresh"
+
+        async def collect():
+            return [invoice async for invoice in self.client.scan_invoices("2019-01-01", "2019-01-31", shards=5)]
+
+        self.assertEqual(asyncio.run(collect()), [{"id": i} for i in range(1, 201)])
+
+    def test_006_get_invoices_by_ids(self):
+        self.client.access_token = "fresh"
+
+        async def collect():
+            return [result async for result in self.client.get_invoices_by_ids(range(20), max_workers=3, ordered=True)]
+
+        results = asyncio.run(collect())
+        self.assertEqual([key for key, _ in results], list(range(20)))
+        self.assertTrue(results[5][1]['content']['path'].endswith("/invoices/5"))
+
+    def test_007_invalidate_token(self):
+        self.assertIsNone(asyncio.run(self.client.invalidate_token()))
+        self.assertEqual(self.token_requests, 0)
+
+        self.client.access_token = "fresh"
+        response = asyncio.run(self.client.invalidate_token())
+
+        self.assertEqual(response['status'], 200)
+        self.assertTrue(response['content']['path'].endswith("/logout"))
+        self.assertIsNone(self.client._token_manager.token)
+
+    def test_008_http_transport(self):
+        client = AsyncClient("key", "id", "secret", "uri", http_transport=httpx.MockTransport(self.handler))
+        client.access_token = "fresh"
+
+        async def fetch():
+            async with client:
+                return await client.get_product(7)
+
+        self.assertTrue(asyncio.run(fetch())['content']['path'].endswith("/products/7"))
+
+if __name__ == '__main__':
+    unittest.main()
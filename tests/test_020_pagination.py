@@ -0,0 +1,80 @@
+import unittest
+from procountor.pagination import paginate, scan, split_date_range, merge_by_id
+
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [{'id': i} for i in range(1, 121)]
+        self.calls = []
+
+    def fetch(self, **params):
+        self.calls.append(params)
+        previous = params.get('previousId', 0)
+        page = [row for row in self.rows if row['id'] > previous][:50]
+        return {'status': 200, 'content': {'results': page, 'meta': {'pageSize': 50}}}
+
+    def test_001_follows_previous_id(self):
+        rows = list(paginate(self.fetch, {'startDate': '2019-01-01'}))
+
+        self.assertEqual(rows, self.rows)
+        self.assertEqual([c.get('previousId') for c in self.calls], [None, 50, 100])
+        self.assertEqual(self.calls[-1]['startDate'], '2019-01-01')
+
+    def test_002_prefetch(self):
+        rows = list(paginate(self.fetch, {}, prefetch=True))
+
+        self.assertEqual(rows, self.rows)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_003_lazy(self):
+        iterator = paginate(self.fetch, {})
+        self.assertEqual(next(iterator), {'id': 1})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_004_resource_named_results(self):
+        def fetch(**params):
+            return {'status': 200, 'content': {'products': [{'id': 1}], 'meta': {'pageSize': 50}}}
+
+        self.assertEqual(list(paginate(fetch, {}, results_key='products')), [{'id': 1}])
+
+    def test_005_error(self):
+        def fetch(**params):
+            return {'status': 400, 'message': 'Bad request'}
+
+        with self.assertRaises(RuntimeError):
+            list(paginate(fetch, {}))
+
+    def test_006_split_date_range(self):
+        self.assertEqual(
+            split_date_range('2019-01-01', '2019-01-10', 3),
+            [('2019-01-01', '2019-01-03'), ('2019-01-04', '2019-01-06'), ('2019-01-07', '2019-01-10')],
+        )
+        self.assertEqual(split_date_range('2019-01-01', '2019-01-02', 4), [('2019-01-01', '2019-01-01'),
+                                                                           ('2019-01-02', '2019-01-02')])
+        with self.assertRaises(ValueError):
+            split_date_range('2019-01-02', '2019-01-01', 2)
+
+    def test_007_merge_by_id(self):
+        merged = merge_by_id([iter([{'id': 1}, {'id': 4}]), iter([{'id': 2}, {'id': 4}, {'id': 5}])])
+        self.assertEqual([row['id'] for row in merged], [1, 2, 4, 5])
+
+    def test_008_scan(self):
+        rows = [{'id': i, 'date': '2019-01-{:02d}'.format(i % 28 + 1)} for i in range(1, 301)]
+
+        def fetch(**params):
+            self.calls.append(params)
+            page = [
+                row for row in rows
+                if params['startDate'] <= row['date'] <= params['endDate'] and row['id'] > params.get('previousId', 0)
+            ]
+            return {'status': 200, 'content': {'results': page[:50], 'meta': {'pageSize': 50}}}
+
+        result = list(scan(fetch, {'orderByDate': 'desc', 'status': 'PAID'}, '2019-01-01', '2019-01-31', shards=4))
+
+        self.assertEqual(result, rows)
+        self.assertTrue(all(c['orderById'] == 'asc' and 'orderByDate' not in c for c in self.calls))
+        self.assertTrue(all(c['status'] == 'PAID' for c in self.calls))
+
+if __name__ == '__main__':
+    unittest.main()
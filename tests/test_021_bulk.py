@@ -0,0 +1,57 @@
+import threading
+import time
+import unittest
+from procountor.bulk import fetch_many
+
+
+class TestBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def fetch(self, key):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01 * (key % 3))
+        with self.lock:
+            self.running -= 1
+        if key == 7:
+            raise ValueError("broken")
+        return {'status': 200, 'content': {'id': key}}
+
+    def test_001_all_results(self):
+        results = dict(fetch_many(self.fetch, range(20), max_workers=4))
+
+        self.assertEqual(sorted(results), list(range(20)))
+        self.assertEqual(results[3]['content']['id'], 3)
+        self.assertLessEqual(self.max_running, 4)
+
+    def test_002_errors_per_key(self):
+        results = dict(fetch_many(self.fetch, range(10), max_workers=4))
+
+        self.assertIsNone(results[7]['status'])
+        self.assertEqual(results[7]['message'], "broken")
+        self.assertIsInstance(results[7]['error'], ValueError)
+        self.assertEqual(results[8]['status'], 200)
+
+    def test_003_ordered(self):
+        keys = [k for k, _ in fetch_many(self.fetch, range(20), max_workers=4, ordered=True)]
+        self.assertEqual(keys, list(range(20)))
+
+    def test_004_lazy_keys(self):
+        consumed = []
+
+        def keys():
+            for key in range(1000):
+                consumed.append(key)
+                yield key
+
+        results = fetch_many(self.fetch, keys(), max_workers=2)
+        next(results)
+        self.assertLess(len(consumed), 10)
+
+if __name__ == '__main__':
+    unittest.main()
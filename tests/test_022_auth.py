@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from procountor.auth import TokenManager, FileTokenStore, SQLiteTokenStore, token_store_key
+from procountor.client import Client
+from tests.fake_session import FakeSession
+
+
+class TestTokenManager(unittest.TestCase):
+
+    def setUp(self):
+        self.fetches = 0
+        self.manager = TokenManager(self.fetch, refresh_margin=60)
+
+    def fetch(self):
+        self.fetches += 1
+        time.sleep(0.01)
+        self.manager.set("token-{}".format(self.fetches), expires_in=3600)
+
+    def test_001_concurrent_get(self):
+        threads = [threading.Thread(target=self.manager.get) for _ in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(self.manager.token, "token-1")
+
+    def test_002_proactive_refresh(self):
+        self.manager.get()
+        self.manager.expires_at = time.time() + 30
+
+        self.assertEqual(self.manager.get(), "token-2")
+
+    def test_003_refresh_stale_once(self):
+        self.manager.get()
+        threads = [threading.Thread(target=self.manager.refresh, args=("token-1",)) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.fetches, 2)
+        self.assertEqual(self.manager.token, "token-2")
+
+    def test_004_client_retries_with_new_token(self):
+        session = FakeSession()
+        client = Client("key", "id", "secret", "uri", session=session)
+        self.assertEqual(client.access_token, "token-1")
+        session.token_requests += 1  # the token of the client is no longer accepted
+
+        response = client.get_coa()
+
+        self.assertEqual(response['status'], 200)
+        self.assertEqual(session.requests, ["Bearer token-1", "Bearer token-3"])
+        self.assertEqual(client.access_token, "token-3")
+
+    def test_005_lazy_authentication(self):
+        session = FakeSession()
+        client = Client("key", "id", "secret", "uri", session=session)
+        self.assertEqual(session.token_requests, 0)
+
+        client.get_coa()
+        self.assertEqual(session.token_requests, 1)
+
+
+class TestTokenStores(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fetches = 0
+        self.fetch_lock = threading.Lock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def managers(self, store, count):
+        """Managers with their own stores, like clients in separate processes"""
+        key = token_store_key("https://pts-api.procountor.com/", "id", "key")
+        managers = []
+
+        for _ in range(count):
+            def fetch(manager_index=len(managers)):
+                with self.fetch_lock:
+                    self.fetches += 1
+                    token = "token-{}".format(self.fetches)
+                time.sleep(0.02)
+                managers[manager_index].set(token)
+
+            managers.append(TokenManager(fetch, store=store(), key=key))
+
+        return managers
+
+    def assert_single_fetch(self, store):
+        managers = self.managers(store, 8)
+        threads = [threading.Thread(target=manager.get) for manager in managers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(set(manager.token for manager in managers), {"token-1"})
+
+        # a refresh after a rejected token is shared as well
+        managers[0].refresh(stale="token-1")
+        self.assertEqual(managers[1].refresh(stale="token-1"), "token-2")
+        self.assertEqual(self.fetches, 2)
+
+    def test_001_file_store(self):
+        path = os.path.join(self.directory, "tokens.json")
+        self.assert_single_fetch(lambda: FileTokenStore(path))
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+    def test_002_sqlite_store(self):
+        path = os.path.join(self.directory, "tokens.sqlite")
+        self.assert_single_fetch(lambda: SQLiteTokenStore(path))
+
+    def test_003_invalidate(self):
+        path = os.path.join(self.directory, "tokens.json")
+        first, second = self.managers(lambda: FileTokenStore(path), 2)
+        first.get()
+        first.invalidate()
+
+        self.assertIsNone(FileTokenStore(path).load(first.key))
+        self.assertEqual(second.get(), "token-2")
+
+    def test_004_client_logout(self):
+        path = os.path.join(self.directory, "tokens.json")
+        session = FakeSession()
+        client = Client("key", "id", "secret", "uri", session=session, token_store=FileTokenStore(path))
+
+        self.assertIsNone(client.invalidate_token())
+        self.assertEqual((session.token_requests, session.calls), (0, []))
+
+        client.get_coa()
+        response = client.invalidate_token()
+
+        self.assertEqual(response['status'], 200)
+        self.assertTrue(session.calls[-1][1].endswith("/logout"))
+        self.assertIsNone(client._token_manager.token)
+        self.assertIsNone(FileTokenStore(path).load(client._token_store_key()))
+
+if __name__ == '__main__':
+    unittest.main()
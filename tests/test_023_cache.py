@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from procountor.cache import MemoryCache, DiskCache
+from procountor.client import Client
+from tests.fake_session import FakeSession
+
+
+class CacheTests(object):
+
+    def test_001_get_set(self):
+        self.cache.set("a", {"status": 200}, 60, "tag")
+        self.assertEqual(self.cache.get("a"), {"status": 200})
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_002_expiry(self):
+        self.cache.set("a", {"status": 200}, 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_003_lru_eviction(self):
+        self.cache.set("a", 1, 60)
+        self.cache.set("b", 2, 60)
+        self.cache.get("a")
+        self.cache.set("c", 3, 60)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("c"), 3)
+
+    def test_004_invalidate(self):
+        self.cache.set("a", 1, 60, "dimensions")
+        self.cache.set("b", 2, 60, "coa")
+        self.cache.invalidate("dimensions")
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), 2)
+
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("b"))
+
+
+class TestMemoryCache(CacheTests, unittest.TestCase):
+
+    def setUp(self):
+        self.cache = MemoryCache(max_size=2)
+
+    def test_005_copies(self):
+        value = {"content": {"name": "EUR"}}
+        self.cache.set("a", value, 60)
+        value["content"]["name"] = "USD"
+        self.cache.get("a")["content"]["name"] = "SEK"
+
+        self.assertEqual(self.cache.get("a"), {"content": {"name": "EUR"}})
+
+
+class TestDiskCache(CacheTests, unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = DiskCache(os.path.join(self.directory, "cache.sqlite"), max_size=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+class TestClientCache(unittest.TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        self.client = Client("key", "id", "secret", "uri", session=self.session, cache=MemoryCache())
+
+    def test_001_reference_data_is_cached(self):
+        first = self.client.get_coa()
+        second = self.client.get_coa()
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.session.calls), 1)
+
+    def test_002_other_endpoints_are_not_cached(self):
+        self.client.get_invoice(1)
+        self.client.get_invoice(1)
+
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_003_write_invalidates(self):
+        self.client.get_dimensions()
+        self.client.get_dimension(12)
+        self.client.get_coa()
+        self.client.create_dimension_item(12, name="Sales")
+        self.client.get_dimensions()
+        self.client.get_dimension(12)
+        self.client.get_coa()
+
+        self.assertEqual([method for method, _ in self.session.calls], ["GET", "GET", "GET", "POST", "GET", "GET"])
+
+    def test_004_invalidate_cache(self):
+        self.client.get_coa()
+        self.client.invalidate_cache()
+        self.client.get_coa()
+
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_005_cache_ttls(self):
+        client = Client("key", "id", "secret", "uri", session=self.session, cache=MemoryCache(),
+                        cache_ttls={"coa": 0.01})
+        client.get_coa()
+        time.sleep(0.02)
+        client.get_coa()
+
+        self.assertEqual(len(self.session.calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import time
+import unittest
+import requests
+from procountor.client import Client
+from procountor.retry import RetryPolicy, NO_RETRY
+from tests.fake_session import FakeSession, FakeResponse
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_001_statuses_and_methods(self):
+        policy = RetryPolicy(total=2)
+
+        self.assertTrue(policy.should_retry("GET", 0, 503))
+        self.assertTrue(policy.should_retry("POST", 0, 429))
+        self.assertFalse(policy.should_retry("POST", 0, 503))
+        self.assertFalse(policy.should_retry("GET", 0, 400))
+        self.assertFalse(policy.should_retry("GET", 2, 503))
+        self.assertTrue(policy.should_retry("PUT", 0))
+        self.assertFalse(policy.should_retry("POST", 0))
+
+    def test_002_backoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        self.assertEqual([policy.backoff(i) for i in range(5)], [1, 2, 4, 5, 5])
+
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+        self.assertTrue(all(0 <= policy.backoff(i) <= min(5, 2 ** i) for i in range(10)))
+
+    def test_003_retry_after(self):
+        policy = RetryPolicy(max_retry_after=60)
+
+        self.assertEqual(policy.backoff(0, "7"), 7)
+        date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+        self.assertAlmostEqual(policy.backoff(0, date), 30, delta=2)
+        self.assertFalse(policy.should_retry("GET", 0, 429, "3600"))
+        self.assertEqual(RetryPolicy(respect_retry_after=False, jitter=False).backoff(0, "7"), 0.5)
+
+
+class TestClientRetry(unittest.TestCase):
+
+    def client(self, responses, policy=None):
+        self.session = FakeSession(responses)
+        return Client("key", "id", "secret", "uri", session=self.session,
+                      retry_policy=policy or RetryPolicy(backoff_factor=0))
+
+    def test_001_retries_transient_errors(self):
+        client = self.client([
+            FakeResponse(503, "Service Unavailable"),
+            requests.exceptions.ConnectionError("Connection reset by peer"),
+            FakeResponse(429, "Too Many Requests", {"Retry-After": "0"}),
+        ])
+        response = client.get_invoice(1)
+
+        self.assertEqual(response['status'], 200)
+        self.assertEqual(response['retries'], 3)
+        self.assertEqual(len(self.session.calls), 4)
+
+    def test_002_gives_up(self):
+        client = self.client([FakeResponse(503, "Service Unavailable")] * 5, RetryPolicy(total=2, backoff_factor=0))
+        response = client.get_invoice(1)
+
+        self.assertEqual(response['status'], 503)
+        self.assertEqual(response['retries'], 2)
+
+    def test_003_non_idempotent_not_retried(self):
+        client = self.client([FakeResponse(503, "Service Unavailable")])
+        response = client.post_invoice(type="SALES_INVOICE")
+
+        self.assertEqual(response['status'], 503)
+        self.assertNotIn('retries', response)
+
+    def test_004_no_retry(self):
+        client = self.client([requests.exceptions.ConnectionError("Connection reset by peer")], NO_RETRY)
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.get_invoice(1)
+
+if __name__ == '__main__':
+    unittest.main()
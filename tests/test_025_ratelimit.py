@@ -0,0 +1,79 @@
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from procountor.client import Client
+from procountor.ratelimit import TokenBucket, FileTokenBucket, RateLimiter
+from tests.fake_session import FakeSession
+
+
+def reserve_many(path, count, queue):
+    bucket = FileTokenBucket(path, rate=10, burst=5)
+    queue.put([bucket.reserve() for _ in range(count)])
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_001_burst_then_rate(self):
+        bucket = TokenBucket(rate=10, burst=3)
+        waits = [bucket.reserve() for _ in range(5)]
+
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(waits[3], 0.1, delta=0.01)
+        self.assertAlmostEqual(waits[4], 0.2, delta=0.01)
+
+    def test_002_threads_share_budget(self):
+        bucket = TokenBucket(rate=100, burst=1)
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(11)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertGreaterEqual(time.time() - started, 0.09)
+
+    def test_003_processes_share_budget(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = directory + "/bucket"
+            queue = multiprocessing.Queue()
+            processes = [multiprocessing.Process(target=reserve_many, args=(path, 5, queue)) for _ in range(2)]
+            for process in processes:
+                process.start()
+            waits = sorted(queue.get(timeout=10) + queue.get(timeout=10))
+            for process in processes:
+                process.join()
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertAlmostEqual(waits[-1], 0.5, delta=0.1)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_001_host_and_group_buckets(self):
+        limiter = RateLimiter(rate=100, burst=100, group_limits={"invoices": (10, 1)})
+        url = "https://api.procountor.com/supported/api/"
+
+        self.assertEqual(limiter.reserve(url + "invoices/1", "invoices/1"), 0.0)
+        self.assertAlmostEqual(limiter.reserve(url + "invoices/2", "invoices/2"), 0.1, delta=0.01)
+        self.assertEqual(limiter.reserve(url + "products/2", "products/2"), 0.0)
+        self.assertEqual(len(limiter.buckets(url + "coa", "coa")), 1)
+        self.assertEqual(limiter.reserve("https://pts-api.procountor.com/invoices/1", "invoices/1"), 0.0)
+
+    def test_002_client(self):
+        session = FakeSession()
+        client = Client("key", "id", "secret", "uri", session=session,
+                        rate_limiter=RateLimiter(rate=50, burst=1))
+        started = time.time()
+        for i in range(6):
+            client.get_invoice(i)
+
+        self.assertGreaterEqual(time.time() - started, 0.09)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from procountor.client import Client
+from procountor.multipart import AttachmentDownload, AttachmentUpload, MultipartStreamParser, content_type_boundary
+from tests.fake_session import FakeResponse, FakeSession
+
+CONTENT_TYPE = 'multipart/mixed; boundary="sep"'
+METADATA = {"id": 7, "name": "receipt.pdf"}
+FILE = b"%PDF-1.4\r\n--se not a boundary\r\n" + os.urandom(5000) + b"\r\n--s\r\n"
+
+
+def attachment_body(data=FILE):
+    return (
+        b"preamble\r\n--sep\r\nContent-Type: application/json\r\n\r\n" + json.dumps(METADATA).encode("utf-8") +
+        b"\r\n--sep\r\nContent-Type: application/octet-stream\r\n\r\n" + data + b"\r\n--sep--\r\n"
+    )
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class StreamingResponse(FakeResponse):
+
+    def __init__(self, body):
+        super(StreamingResponse, self).__init__(200, None, {"Content-Type": CONTENT_TYPE})
+        self.body = body
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(chunks(self.body, chunk_size))
+
+    def close(self):
+        self.closed = True
+
+
+class UploadSession(FakeSession):
+    """Session which reads the streamed request bodies"""
+
+    def __init__(self, responses=None):
+        super(UploadSession, self).__init__(responses)
+        self.bodies = []
+
+    def request(self, method, url, headers=None, data=None, **options):
+        self.bodies.append((headers["content-type"], data.read()))
+        return super(UploadSession, self).request(method, url, headers=headers, **options)
+
+
+def upload_parts(content_type, body):
+    parts = []
+
+    def on_part(headers):
+        parts.append([])
+        return parts[-1].append
+
+    parser = MultipartStreamParser(content_type_boundary(content_type), on_part)
+    parser.feed(body)
+    parser.close()
+    return [b"".join(part) for part in parts]
+
+
+class TestMultipart(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_001_boundary(self):
+        self.assertEqual(content_type_boundary(CONTENT_TYPE), b"sep")
+        self.assertEqual(content_type_boundary("multipart/form-data; charset=utf-8; boundary=abc"), b"abc")
+        with self.assertRaises(ValueError):
+            content_type_boundary("application/json")
+
+    def test_002_parser_chunk_sizes(self):
+        for size in (1, 3, 7, 64, 100000):
+            parts = []
+
+            def on_part(headers):
+                parts.append((headers, []))
+                return parts[-1][1].append
+
+            parser = MultipartStreamParser(b"sep", on_part)
+            for chunk in chunks(attachment_body(), size):
+                parser.feed(chunk)
+            parser.close()
+
+            self.assertEqual([headers["content-type"] for headers, _ in parts],
+                             ["application/json", "application/octet-stream"])
+            self.assertEqual(json.loads(b"".join(parts[0][1]).decode("utf-8")), METADATA)
+            self.assertEqual(b"".join(parts[1][1]), FILE)
+
+    def test_003_truncated_body(self):
+        parser = MultipartStreamParser(b"sep", lambda headers: None)
+        parser.feed(attachment_body()[:-20])
+        with self.assertRaises(ValueError):
+            parser.close()
+
+    def test_004_download_to_path(self):
+        path = os.path.join(self.directory, "receipt.pdf")
+        download = AttachmentDownload(CONTENT_TYPE, path)
+        for chunk in chunks(attachment_body(), 1024):
+            download.feed(chunk)
+
+        self.assertEqual(download.close(), {"metadata": METADATA, "size": len(FILE)})
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), FILE)
+
+    def test_005_download_abort_removes_file(self):
+        path = os.path.join(self.directory, "receipt.pdf")
+        download = AttachmentDownload(CONTENT_TYPE, path)
+        download.feed(attachment_body()[:1000])
+        download.abort()
+        self.assertFalse(os.path.exists(path))
+
+    def test_006_client_download_attachment(self):
+        response = StreamingResponse(attachment_body())
+        client = Client("key", "id", "secret", "uri", session=FakeSession([response]))
+        target = io.BytesIO()
+
+        answer = client.download_attachment(7, target, chunk_size=512)
+
+        self.assertEqual(answer, {"status": 200, "metadata": METADATA, "size": len(FILE)})
+        self.assertEqual(target.getvalue(), FILE)
+        self.assertTrue(response.closed)
+
+    def test_007_client_download_error(self):
+        session = FakeSession([FakeResponse(404, {"message": "not found"})])
+        client = Client("key", "id", "secret", "uri", session=session)
+
+        answer = client.download_attachment(7, io.BytesIO())
+        self.assertEqual(answer["status"], 404)
+
+
+    def test_008_upload_sources(self):
+        path = os.path.join(self.directory, "receipt.pdf")
+        with open(path, "wb") as f:
+            f.write(FILE)
+
+        with open(path, "rb") as f:
+            for source in (path, f, FILE, bytearray(FILE), memoryview(FILE)):
+                encoder = AttachmentUpload(METADATA, source).encoder()
+                self.assertTrue(encoder.content_type.startswith("multipart/form-data; boundary="))
+
+                body = encoder.read()
+                self.assertEqual(len(body), encoder.len)
+                meta, data = upload_parts(encoder.content_type, body)
+                self.assertEqual(json.loads(meta.decode("utf-8")), METADATA)
+                self.assertEqual(data, FILE)
+
+    def test_009_upload_rewinds_file(self):
+        f = io.BytesIO(b"header" + FILE)
+        f.seek(6)
+        upload = AttachmentUpload(METADATA, f)
+
+        for _ in range(2):
+            encoder = upload.encoder()
+            self.assertEqual(upload_parts(encoder.content_type, encoder.read())[1], FILE)
+
+    def test_010_client_post_attachment_resends_after_401(self):
+        session = UploadSession()
+        client = Client("key", "id", "secret", "uri", session=session)
+        client.access_token = "stale"
+
+        answer = client.post_attachment(METADATA, memoryview(FILE))
+
+        self.assertEqual(answer["status"], 200)
+        self.assertEqual(len(session.bodies), 2)
+        for content_type, body in session.bodies:
+            self.assertEqual(upload_parts(content_type, body)[1], FILE)
+
+    def test_011_client_post_attachments(self):
+        session = UploadSession()
+        client = Client("key", "id", "secret", "uri", session=session)
+        attachments = [(dict(METADATA, id=i), FILE) for i in range(10)]
+
+        results = list(client.post_attachments(attachments, max_workers=3, ordered=True))
+
+        self.assertEqual([attachment[0]["id"] for attachment, _ in results], list(range(10)))
+        self.assertEqual({answer["status"] for _, answer in results}, {200})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import os
+import shutil
+import tempfile
+import unittest
+from procountor.mirror import InvoiceMirror, LedgerMirror, SyncError
+
+
+class FakeInvoiceClient(object):
+    """Client with invoices in memory. The version of an invoice is changed with update()."""
+
+    def __init__(self, count):
+        self.invoices = {}
+        self.searches = []
+        self.fetched = []
+        self.failing = set()
+        for i in range(1, count + 1):
+            self.invoices[i] = {
+                "id": i, "type": "SALES_INVOICE", "status": "UNFINISHED", "partnerId": i % 3,
+                "date": "2024-01-{:02d}".format(i), "version": "2024-02-01T10:00:{:02d}.123".format(i),
+            }
+
+    def update(self, invoiceId, version, **fields):
+        self.invoices[invoiceId].update(fields, version=version)
+
+    def iter_invoices(self, **params):
+        self.searches.append(params)
+        since = params.get("versionStartDate", "")
+        for invoiceId in sorted(self.invoices):
+            invoice = self.invoices[invoiceId]
+            if invoice["version"] is None or invoice["version"][:19] >= since:
+                yield {"id": invoiceId, "version": invoice["version"]}
+
+    def get_invoices_by_ids(self, invoiceIds, max_workers=8, ordered=False):
+        for invoiceId in invoiceIds:
+            self.fetched.append(invoiceId)
+            if invoiceId in self.failing:
+                yield invoiceId, {"status": 500, "message": "error"}
+            else:
+                yield invoiceId, {"status": 200, "content": dict(self.invoices[invoiceId])}
+
+
+class TestInvoiceMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = FakeInvoiceClient(5)
+        self.mirror = InvoiceMirror(self.client, os.path.join(self.directory, "mirror.db"), batch_size=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_001_initial_sync(self):
+        result = self.mirror.sync(types=["SALES_INVOICE"])
+
+        self.assertEqual(result, {"fetched": 5, "high_water_mark": "2024-02-01T10:00:05"})
+        self.assertEqual(self.client.searches, [{"types": ["SALES_INVOICE"], "orderById": "asc"}])
+        self.assertEqual(self.mirror.get(3), self.client.invoices[3])
+        self.assertIsNone(self.mirror.get(6))
+
+    def test_002_incremental_sync(self):
+        self.mirror.sync()
+        self.client.update(2, "2024-02-02T08:00:00.000", status="SENT")
+        self.client.fetched = []
+
+        result = self.mirror.sync()
+
+        self.assertEqual(self.client.searches[-1]["versionStartDate"], "2024-02-01T10:00:05")
+        self.assertEqual(self.client.fetched, [2])
+        self.assertEqual(result, {"fetched": 1, "high_water_mark": "2024-02-02T08:00:00"})
+        self.assertEqual(self.mirror.get(2)["status"], "SENT")
+
+        self.client.fetched = []
+        self.assertEqual(self.mirror.sync()["fetched"], 0)
+        self.assertEqual(self.client.fetched, [])
+
+    def test_003_failure_keeps_high_water_mark(self):
+        self.mirror.sync()
+        self.client.update(1, "2024-02-03T00:00:00.000")
+        self.client.update(4, "2024-02-03T00:00:00.000")
+        self.client.failing.add(4)
+
+        with self.assertRaises(SyncError) as context:
+            self.mirror.sync()
+
+        self.assertEqual([invoiceId for invoiceId, _ in context.exception.failures], [4])
+        self.assertEqual(self.mirror.high_water_mark, "2024-02-01T10:00:05")
+        self.assertEqual(self.mirror.get(1)["version"], "2024-02-03T00:00:00.000")
+
+        self.client.failing.clear()
+        self.client.fetched = []
+        self.mirror.sync()
+        self.assertEqual(self.client.fetched, [4])
+        self.assertEqual(self.mirror.high_water_mark, "2024-02-03T00:00:00")
+
+    def test_004_query(self):
+        self.mirror.sync()
+        self.client.update(5, "2024-02-02T00:00:00.000", status="SENT")
+        self.mirror.sync()
+
+        self.assertEqual([i["id"] for i in self.mirror.invoices(partnerId=1)], [1, 4])
+        self.assertEqual([i["id"] for i in self.mirror.invoices(startDate="2024-01-02", endDate="2024-01-04")],
+                         [2, 3, 4])
+        self.assertEqual([i["id"] for i in self.mirror.invoices(status="SENT")], [5])
+
+    def test_005_persists(self):
+        self.mirror.sync()
+        mirror = InvoiceMirror(self.client, self.mirror.path)
+
+        self.assertEqual(mirror.high_water_mark, "2024-02-01T10:00:05")
+        self.assertEqual(len(mirror.invoices()), 5)
+
+    def test_006_records_without_version(self):
+        self.mirror.sync()
+        self.client.update(5, None, status="SENT")
+
+        result = self.mirror.sync()
+
+        self.assertEqual(result, {"fetched": 1, "high_water_mark": "2024-02-01T10:00:05"})
+        self.assertEqual(self.mirror.get(5)["status"], "SENT")
+
+
+def receipt(receiptId, date, account, amount, items=(), type="JOURNAL", status="APPROVED", version="v1"):
+    return {
+        "receiptId": receiptId, "receiptDate": date, "type": type, "status": status, "version": version,
+        "transactions": [
+            {
+                "account": account, "accountingValue": amount, "vatPercent": 0, "description": "row",
+                "dimensions": [{"dimensionId": 10, "items": [
+                    {"dimensionItemId": item, "value": value} for item, value in items
+                ]}],
+            },
+            {"account": "1910", "accountingValue": -amount},
+        ],
+    }
+
+
+class FakeLedgerClient(object):
+
+    def __init__(self, receipts):
+        self.receipts = {r["receiptId"]: r for r in receipts}
+        self.fetched = []
+
+    def iter_ledger_receipts(self, startDate, endDate, orderById, types=None):
+        for receiptId in sorted(self.receipts):
+            r = self.receipts[receiptId]
+            if startDate <= r["receiptDate"] <= endDate and (not types or r["type"] in types):
+                yield {"receiptId": receiptId, "receiptDate": r["receiptDate"], "version": r["version"]}
+
+    def get_ledger_receipts_by_ids(self, receiptIds, max_workers=8, ordered=False):
+        for receiptId in receiptIds:
+            self.fetched.append(receiptId)
+            yield receiptId, {"status": 200, "content": self.receipts[receiptId]}
+
+
+class TestLedgerMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = FakeLedgerClient([
+            receipt(1, "2024-04-02", "3000", 100.0, [(1, 60.0), (2, 40.0)]),
+            receipt(2, "2024-05-15", "3000", 50.0, [(1, 50.0)]),
+            receipt(3, "2024-05-20", "4000", 30.0, type="PURCHASE_INVOICE"),
+            receipt(4, "2024-07-01", "3000", 70.0, [(2, 70.0)]),
+            receipt(5, "2024-06-01", "3000", 999.0, status="INVALIDATED"),
+        ])
+        self.mirror = LedgerMirror(self.client, os.path.join(self.directory, "ledger.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_001_sync_and_query(self):
+        self.assertEqual(self.mirror.sync("2024-01-01", "2024-12-31"), {"fetched": 5, "removed": 0})
+
+        q2 = {"startDate": "2024-04-01", "endDate": "2024-06-30"}
+        self.assertEqual([e["receiptId"] for e in self.mirror.entries(account="3000", **q2)], [1, 2])
+        self.assertEqual(self.mirror.totals(**q2), {"3000": 150.0, "4000": 30.0, "1910": -180.0})
+        self.assertEqual(self.mirror.totals(account="3000", dimensionId=10, **q2), {("3000", 1): 110.0,
+                                                                                     ("3000", 2): 40.0})
+        self.assertEqual(self.mirror.totals(types=["PURCHASE_INVOICE"], **q2), {"4000": 30.0, "1910": -30.0})
+
+        entries = self.mirror.entries(account="3000", dimensionId=10, dimensionItemId=2)
+        self.assertEqual([(e["receiptId"], e["amount"]) for e in entries], [(1, 40.0), (4, 70.0)])
+        self.assertEqual(self.mirror.get(5)["status"], "INVALIDATED")
+
+    def test_002_resync_fetches_changed_and_removes_deleted(self):
+        self.mirror.sync("2024-01-01", "2024-12-31")
+        self.client.fetched = []
+        self.client.receipts[2] = receipt(2, "2024-05-15", "3000", 20.0, version="v2")
+        del self.client.receipts[1]
+
+        self.assertEqual(self.mirror.sync("2024-01-01", "2024-12-31"), {"fetched": 1, "removed": 1})
+        self.assertEqual(self.client.fetched, [2])
+        self.assertIsNone(self.mirror.get(1))
+        self.assertEqual(self.mirror.totals(account="3000", endDate="2024-06-30"), {"3000": 20.0})
+        self.assertEqual(self.mirror.totals(dimensionId=10, endDate="2024-06-30"), {})
+
+    def test_003_exact_totals(self):
+        self.client.receipts = {}
+        for receiptId, amount in enumerate([0.1, 0.2, 0.1, 0.2, 0.1, 0.2], 1):
+            self.client.receipts[receiptId] = receipt(receiptId, "2024-04-02", "3000", amount)
+
+        self.mirror.sync("2024-01-01", "2024-12-31")
+        self.assertEqual(self.mirror.totals(), {"3000": 0.9, "1910": -0.9})
+        self.assertEqual(self.mirror.entries(account="3000")[0]["amount"], 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+from procountor import aggregate
+from procountor.aggregate import TransactionTable, fiscal_periods
+from procountor.mirror import LedgerMirror
+from tests.test_027_mirror import FakeLedgerClient, receipt
+
+FISCAL_YEARS = {"status": 200, "content": {"fiscalYears": [
+    {"id": 2, "startDate": "2024-01-01", "endDate": "2024-12-31", "periods": [
+        {"startDate": "2024-01-01", "endDate": "2024-06-30"},
+        {"startDate": "2024-07-01", "endDate": "2024-12-31"},
+    ]},
+    {"id": 1, "startDate": "2023-01-01", "endDate": "2023-12-31"},
+]}}
+
+RECEIPTS = [
+    receipt(1, "2023-12-31", "3000", 10.0, [(1, 10.0)]),
+    receipt(2, "2024-04-02", "3000", 100.0, [(1, 60.0), (2, 40.0)]),
+    receipt(3, "2024-05-15", "3000", -50.0, [(1, -50.0)]),
+    receipt(4, "2024-07-01", "4000", 70.0, [(2, 70.0)]),
+    receipt(5, "2024-06-01", "3000", 999.0, status="INVALIDATED"),
+    receipt(6, "2025-01-01", "3000", 5.0),
+]
+
+
+@unittest.skipIf(aggregate.numpy is None, "requires numpy")
+class TestAggregate(unittest.TestCase):
+
+    def setUp(self):
+        self.table = TransactionTable.from_receipts(RECEIPTS)
+
+    def test_001_fiscal_periods(self):
+        self.assertEqual(fiscal_periods(FISCAL_YEARS), [
+            ("2023-01-01", "2023-12-31"), ("2024-01-01", "2024-06-30"), ("2024-07-01", "2024-12-31"),
+        ])
+
+    def test_002_account_totals(self):
+        self.assertEqual(len(self.table), 10)
+        self.assertEqual(self.table.account_totals("2024-01-01", "2024-12-31"),
+                         {"3000": 50.0, "1910": -120.0, "4000": 70.0})
+
+    def test_003_trial_balance(self):
+        balance = self.table.trial_balance("2024-01-01", "2024-06-30")
+
+        self.assertEqual(balance, [
+            {"account": "1910", "opening": -10.0, "debit": 50.0, "credit": 100.0, "closing": -60.0},
+            {"account": "3000", "opening": 10.0, "debit": 100.0, "credit": 50.0, "closing": 60.0},
+        ])
+
+    def test_004_period_totals(self):
+        accounts, periods, totals = self.table.period_totals(fiscal_periods(FISCAL_YEARS))
+        by_account = dict(zip(accounts, totals.tolist()))
+
+        self.assertEqual(len(periods), 3)
+        self.assertEqual(by_account["3000"], [10.0, 50.0, 0.0])
+        self.assertEqual(by_account["4000"], [0.0, 0.0, 70.0])
+
+    def test_005_dimension_totals(self):
+        self.assertEqual(self.table.dimension_totals(10, "2024-01-01"),
+                         {("3000", 1): 10.0, ("3000", 2): 40.0, ("4000", 2): 70.0})
+        self.assertEqual(self.table.dimension_totals(10, periods=fiscal_periods(FISCAL_YEARS)),
+                         {("3000", 1, 0): 10.0, ("3000", 1, 1): 10.0, ("3000", 2, 1): 40.0, ("4000", 2, 2): 70.0})
+        self.assertEqual(self.table.dimension_totals(99), {})
+
+    def test_006_from_mirror(self):
+        directory = tempfile.mkdtemp()
+        try:
+            mirror = LedgerMirror(FakeLedgerClient(RECEIPTS), os.path.join(directory, "ledger.db"))
+            mirror.sync("2023-01-01", "2025-12-31")
+            table = TransactionTable.from_mirror(mirror, "2024-01-01", "2024-12-31")
+
+            self.assertEqual(table.account_totals(), self.table.account_totals("2024-01-01", "2024-12-31"))
+            self.assertEqual(table.dimension_totals(10), self.table.dimension_totals(10, "2024-01-01", "2024-12-31"))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
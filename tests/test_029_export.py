@@ -0,0 +1,127 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from procountor import export
+from procountor.client import Client
+from procountor.testing import CREDENTIALS, standin_session
+from procountor.export import (
+    ParquetExport, bank_statement_events, export_bank_statements, export_invoices, record_batches, schema,
+)
+
+STATEMENTS = {"status": 200, "content": {"results": [{
+    "id": 1, "accountNumber": "FI123", "startDate": "2024-01-01", "endDate": "2024-01-31", "currency": "EUR",
+    "events": [
+        {"id": 10, "payDate": "2024-01-02", "sum": 100.0, "allocated": True, "events": [
+            {"id": 11, "sum": 60.0, "events": [{"id": 12, "sum": 60.0}]},
+            {"id": 13, "sum": 40.0},
+        ]},
+        {"id": 20, "payDate": "2024-01-03", "sum": -5.5, "unknownField": "ignored"},
+    ],
+}]}}
+
+
+class FakeExportClient(object):
+
+    def __init__(self, count):
+        self.invoices = {
+            i: {"id": i, "type": "SALES_INVOICE", "date": "2024-01-{:02d}".format(i), "version": "v",
+                "paymentInfo": {"currency": "EUR", "dueDate": "2024-02-01"},
+                "invoiceRows": [{"product": "p{}".format(j), "quantity": j, "unitPrice": 1.5} for j in range(i)]}
+            for i in range(1, count + 1)
+        }
+
+    def iter_invoices(self, **filters):
+        for invoiceId in sorted(self.invoices):
+            yield {"id": invoiceId, "date": self.invoices[invoiceId]["date"], "totalAmount": 10.0}
+
+    def get_invoices_by_ids(self, invoiceIds, max_workers=8, ordered=False):
+        for invoiceId in invoiceIds:
+            yield invoiceId, {"status": 200, "content": self.invoices[invoiceId]}
+
+    def get_bank_statements(self, startDate, endDate):
+        return STATEMENTS
+
+
+@unittest.skipIf(export.pyarrow is None, "requires pyarrow")
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, table):
+        return export.pyarrow.parquet.read_table(os.path.join(self.directory, table + ".parquet"))
+
+    def test_001_record_batches(self):
+        records = [{"id": i, "date": "2024-01-01T10:00:00", "extra": [1]} for i in range(5)]
+        batches = list(record_batches(records, "invoices", batch_size=2))
+
+        self.assertEqual([batch.num_rows for batch in batches], [2, 2, 1])
+        self.assertTrue(all(batch.schema.equals(schema("invoices")) for batch in batches))
+        self.assertEqual(batches[0].column("date").to_pylist(), [datetime.date(2024, 1, 1)] * 2)
+        self.assertEqual(batches[0].column("status").to_pylist(), [None, None])
+
+    def test_002_bank_statement_events(self):
+        events = list(bank_statement_events(STATEMENTS["content"]["results"][0]))
+
+        self.assertEqual([(e["id"], e["parentId"]) for e in events],
+                         [(10, None), (11, 10), (12, 11), (13, 10), (20, None)])
+        self.assertEqual({e["statementId"] for e in events}, {1})
+
+    def test_003_export_bank_statements(self):
+        rows = export_bank_statements(FakeExportClient(0), self.directory, "2024-01-01", "2024-01-31")
+
+        self.assertEqual(rows, {"bank_statements": 1, "bank_statement_events": 5})
+        events = self.read("bank_statement_events")
+        self.assertTrue(events.schema.equals(schema("bank_statement_events")))
+        self.assertEqual(events.column("sum").to_pylist(), [100.0, 60.0, 60.0, 40.0, -5.5])
+        self.assertEqual(events.column("allocated").to_pylist(), [True, None, None, None, None])
+
+    def test_004_export_invoices_with_rows(self):
+        rows = export_invoices(FakeExportClient(4), self.directory, details=True, batch_size=3)
+
+        self.assertEqual(rows, {"invoices": 4, "invoice_rows": 10})
+        invoices = self.read("invoices")
+        self.assertEqual(invoices.column("currency").to_pylist(), ["EUR"] * 4)
+        self.assertEqual(invoices.column("dueDate").to_pylist(), [datetime.date(2024, 2, 1)] * 4)
+        invoice_rows = self.read("invoice_rows")
+        self.assertEqual(invoice_rows.column("invoiceId").to_pylist(), [1, 2, 2, 3, 3, 3, 4, 4, 4, 4])
+        self.assertEqual(invoice_rows.column("row").to_pylist(), [0, 0, 1, 0, 1, 2, 0, 1, 2, 3])
+
+    def test_005_empty_tables_have_files(self):
+        rows = export_invoices(FakeExportClient(0), self.directory, details=True)
+
+        self.assertEqual(rows, {"invoices": 0, "invoice_rows": 0})
+        self.assertTrue(self.read("invoice_rows").schema.equals(schema("invoice_rows")))
+
+    def test_006_parquet_export(self):
+        with ParquetExport(self.directory, batch_size=2) as parquet:
+            for i in range(5):
+                parquet.write("reference_payments", {"id": i, "sum": i / 2.0})
+
+        self.assertEqual(self.read("reference_payments").column("id").to_pylist(), list(range(5)))
+
+    def test_007_models(self):
+        client = Client(session=standin_session(), models=True, **CREDENTIALS)
+
+        rows = export_invoices(client, os.path.join(self.directory, "summaries"))
+        self.assertEqual(rows, {"invoices": 5})
+        summaries = export.pyarrow.parquet.read_table(os.path.join(self.directory, "summaries", "invoices.parquet"))
+        self.assertEqual(summaries.column("id").to_pylist(), [1001, 1002, 1003, 1004, 1005])
+
+        rows = export_invoices(client, self.directory, details=True)
+        self.assertEqual(rows["invoices"], 5)
+        self.assertGreater(rows["invoice_rows"], 0)
+        self.assertEqual(self.read("invoices").column("id").to_pylist(), [1001, 1002, 1003, 1004, 1005])
+        self.assertNotIn(None, self.read("invoice_rows").column("invoiceId").to_pylist())
+
+        rows = export_bank_statements(client, self.directory, "2019-01-01", "2019-12-31")
+        self.assertGreater(rows["bank_statement_events"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
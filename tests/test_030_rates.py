@@ -0,0 +1,87 @@
+import decimal
+import threading
+import unittest
+from procountor.client import Client
+from procountor.codec import JsonCodec
+from procountor.rates import RateService
+from procountor.testing import CREDENTIALS, standin_session
+
+RATES = {("EUR", "USD", "2024-01-02"): 1.1, ("EUR", "SEK", "2024-01-02"): 11.0, ("EUR", "USD", "2024-01-03"): 1.0}
+
+
+class FakeRateClient(object):
+
+    def __init__(self):
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get_currency(self):
+        return {"status": 200, "content": {"currency": "EUR"}}
+
+    def get_latest_currency_rate(self, rateType):
+        return {"status": 200, "content": {"baseCurrency": "EUR", "currencyRates": [
+            {"currency": "USD", "rate": 1.2, "day": "2024-01-04"},
+            {"currency": "SEK", "rate": 12.0, "day": "2024-01-04"},
+        ]}}
+
+    def get_exchange_rate(self, baseCurrency, currency, day, rateType):
+        with self.lock:
+            self.requests.append((currency, day, rateType))
+        rate = RATES.get((baseCurrency, currency, day))
+        if rate is None:
+            return {"status": 404, "message": "no rate"}
+        return {"status": 200, "content": {"baseCurrency": baseCurrency, "currency": currency, "day": day, "rate": rate}}
+
+
+class TestRateService(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeRateClient()
+        self.rates = RateService(self.client)
+
+    def test_001_rate_is_cached(self):
+        self.assertEqual(self.rates.rate("USD", "2024-01-02"), 1.1)
+        self.assertEqual(self.rates.rate("USD", "2024-01-02"), 1.1)
+        self.assertEqual(self.client.requests, [("USD", "2024-01-02", "PROCOUNTOR_ACCOUNTING_EXCHANGE_RATE")])
+        self.assertEqual(self.rates.rate("EUR", "2024-01-02"), 1.0)
+
+    def test_002_convert_many_dedupes(self):
+        amounts = [11.0, 22.0, 110.0, 5.0, 3.0] * 100
+        currencies = ["USD", "USD", "SEK", "EUR", "USD"] * 100
+        days = ["2024-01-02", "2024-01-02", "2024-01-02", "2024-01-02", "2024-01-03"] * 100
+
+        converted = self.rates.convert_many(amounts, currencies, days)
+
+        self.assertEqual([round(amount, 6) for amount in converted[:5]], [10.0, 20.0, 10.0, 5.0, 3.0])
+        self.assertEqual(sorted(self.client.requests), [
+            ("SEK", "2024-01-02", "PROCOUNTOR_ACCOUNTING_EXCHANGE_RATE"),
+            ("USD", "2024-01-02", "PROCOUNTOR_ACCOUNTING_EXCHANGE_RATE"),
+            ("USD", "2024-01-03", "PROCOUNTOR_ACCOUNTING_EXCHANGE_RATE"),
+        ])
+
+    def test_003_prefill(self):
+        self.assertEqual(self.rates.prefill(), 2)
+        self.assertEqual(self.rates.convert_many([12.0, 24.0], ["USD", "SEK"], ["2024-01-04"] * 2), [10.0, 2.0])
+        self.assertEqual(self.client.requests, [])
+
+    def test_004_missing_rate(self):
+        with self.assertRaises(RuntimeError):
+            self.rates.convert_many([1.0, 1.0], ["USD", "NOK"], ["2024-01-02", "2024-01-02"])
+
+        self.client.requests = []
+        self.assertEqual(self.rates.rate("USD", "2024-01-02"), 1.1)
+        self.assertEqual(self.client.requests, [])
+
+    def test_005_decimal_codec(self):
+        client = Client(session=standin_session(), codec=JsonCodec(use_decimal=True), **CREDENTIALS)
+        rates = RateService(client)
+
+        self.assertEqual(rates.rate("EUR", "2024-01-02"), decimal.Decimal(1))
+        converted = rates.convert_many([21.0, decimal.Decimal("21.00"), 5.5], ["SEK", "SEK", "EUR"], ["2024-01-02"] * 3)
+        self.assertTrue(all(isinstance(amount, decimal.Decimal) for amount in converted))
+        self.assertEqual(converted, [decimal.Decimal(2), decimal.Decimal(2), decimal.Decimal("5.5")])
+        client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
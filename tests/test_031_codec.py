@@ -0,0 +1,133 @@
+import decimal
+import os
+import shutil
+import tempfile
+import unittest
+from procountor import codec, export
+from procountor.cache import DiskCache
+from procountor.client import Client
+from procountor.codec import JsonCodec, OrjsonCodec, get_codec
+from procountor.mirror import InvoiceMirror, LedgerMirror
+from procountor.testing import CREDENTIALS, standin_session
+from tests.fake_session import FakeResponse, FakeSession
+
+DOCUMENT = b'{"name":"\xc3\xa4","amount":10.10,"rate":1.123456,"count":3,"rows":[{"value":-0.1}]}'
+
+
+class RecordingSession(FakeSession):
+
+    def __init__(self, responses=None):
+        super(RecordingSession, self).__init__(responses)
+        self.bodies = []
+
+    def request(self, method, url, headers=None, data=None, **options):
+        self.bodies.append(data)
+        return super(RecordingSession, self).request(method, url, headers=headers, **options)
+
+
+class CodecTests(object):
+
+    def test_001_loads(self):
+        value = self.codec.loads(DOCUMENT)
+        self.assertEqual(value["name"], u"\xe4")
+        self.assertEqual(value["count"], 3)
+        self.assertEqual(value["amount"], 10.1)
+        self.assertIsInstance(value["amount"], float)
+
+    def test_002_decimal_round_trip(self):
+        self.codec.use_decimal = True
+        value = self.codec.loads(DOCUMENT)
+
+        self.assertEqual(value["amount"], decimal.Decimal("10.10"))
+        self.assertEqual(value["rows"][0]["value"], decimal.Decimal("-0.1"))
+        self.assertIsInstance(value["rate"], decimal.Decimal)
+        self.assertEqual(self.codec.loads(self.codec.dumps(value)), value)
+
+    def test_003_inexact_decimal(self):
+        with self.assertRaises((ValueError, TypeError)):
+            self.codec.dumps({"amount": decimal.Decimal("0.12345678901234567890")})
+
+
+class TestJsonCodec(CodecTests, unittest.TestCase):
+
+    def setUp(self):
+        self.codec = JsonCodec()
+
+
+@unittest.skipIf(codec.orjson is None, "requires orjson")
+class TestOrjsonCodec(CodecTests, unittest.TestCase):
+
+    def setUp(self):
+        self.codec = OrjsonCodec()
+
+
+class TestClientCodec(unittest.TestCase):
+
+    def test_001_get_codec(self):
+        self.assertIsInstance(get_codec(), JsonCodec)
+        self.assertTrue(get_codec("json", use_decimal=True).use_decimal)
+        self.assertIn(get_codec("auto").name, ("json", "orjson", "ujson"))
+        with self.assertRaises(ValueError):
+            get_codec("yaml")
+
+    def test_002_client_uses_codec(self):
+        session = RecordingSession([FakeResponse(200, b'{"total": 12.30}')])
+        client = Client("key", "id", "secret", "uri", session=session, codec=JsonCodec(use_decimal=True))
+
+        response = client.post_invoice(amount=decimal.Decimal("12.30"), rows=[])
+
+        self.assertEqual(response["content"], {"total": decimal.Decimal("12.30")})
+        self.assertEqual(session.bodies, [b'{"amount":12.3,"rows":[]}'])
+
+        client.get_invoice(1)
+        self.assertIsNone(session.bodies[-1])
+
+
+class TestDecimalPersistence(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = Client(session=standin_session(), codec=JsonCodec(use_decimal=True), **CREDENTIALS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_001_disk_cache(self):
+        self.client.cache = DiskCache(os.path.join(self.directory, "cache.db"))
+        response = self.client.get_vats()
+        cached = self.client.get_vats()
+
+        self.assertEqual(cached, response)
+        self.assertIsInstance(cached["content"]["vatInformation"][0]["vatPercentages"][0], decimal.Decimal)
+
+    def test_002_mirrors(self):
+        invoices = InvoiceMirror(self.client, os.path.join(self.directory, "invoices.db"))
+        invoices.sync()
+        invoice = invoices.get(1001)
+        self.assertEqual(invoice, self.client.get_invoice(1001)["content"])
+        self.assertIsInstance(invoice["invoiceRows"][0]["unitPrice"], decimal.Decimal)
+
+        receipts = LedgerMirror(self.client, os.path.join(self.directory, "receipts.db"))
+        receipts.sync("2019-01-01", "2019-12-31")
+        totals = receipts.totals()
+        self.assertTrue(all(isinstance(total, decimal.Decimal) for total in totals.values()))
+        self.assertEqual(sum(totals.values()), 0)
+        self.assertEqual(receipts.get(5001), self.client.get_ledger_receipt(5001)["content"])
+
+        entries = receipts.entries()
+        self.assertIsInstance(entries[0]["amount"], decimal.Decimal)
+        self.assertEqual(sum(entry["amount"] for entry in entries), 0)
+
+    @unittest.skipIf(export.pyarrow is None, "requires pyarrow")
+    def test_003_export(self):
+        rows = export.export_ledger_receipts(self.client, self.directory, details=True, startDate="2019-01-01",
+                                             endDate="2019-12-31")
+        self.assertGreater(rows["ledger_transactions"], 0)
+
+        table = export.pyarrow.parquet.read_table(os.path.join(self.directory, "ledger_transactions.parquet"))
+        self.assertEqual(table.schema.field("accountingValue").type, export.pyarrow.decimal128(*export.AMOUNT_TYPE))
+        self.assertEqual(sum(table.column("accountingValue").to_pylist()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
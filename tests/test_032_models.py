@@ -0,0 +1,115 @@
+import json
+import unittest
+from procountor.cache import MemoryCache
+from procountor.client import Client
+from procountor.codec import JsonCodec
+from procountor.models import BankStatementEvent, Invoice, InvoiceRow, LedgerReceipt, Transaction, parse_response
+from tests.fake_session import FakeResponse, FakeSession
+
+INVOICE = {
+    "id": 10,
+    "type": "SALES_INVOICE",
+    "status": "PAID",
+    "totalAmount": 124.0,
+    "invoiceRows": [{"product": "Widget", "quantity": 2, "unitPrice": 50.0}],
+    "customField": "kept",
+}
+
+RECEIPT = {
+    "receiptId": 5,
+    "status": "APPROVED",
+    "transactions": [{"account": "3000", "accountingValue": -100.0}, {"account": "1910", "accountingValue": 100.0}],
+}
+
+
+class TestModels(unittest.TestCase):
+
+    def test_001_slots(self):
+        invoice = Invoice(INVOICE)
+        self.assertFalse(hasattr(invoice, "__dict__"))
+        with self.assertRaises(AttributeError):
+            invoice.unknown = 1
+
+    def test_002_lazy_rows(self):
+        invoice = Invoice(INVOICE)
+        self.assertIs(invoice._invoiceRows, INVOICE["invoiceRows"])
+
+        rows = invoice.invoiceRows
+        self.assertIsInstance(rows, tuple)
+        self.assertIsInstance(rows[0], InvoiceRow)
+        self.assertEqual(rows[0].product, "Widget")
+        self.assertIs(invoice.invoiceRows, rows)
+
+    def test_003_dict_access(self):
+        invoice = Invoice(INVOICE)
+        self.assertEqual(invoice["id"], 10)
+        self.assertEqual(invoice.get("currency", "EUR"), "EUR")
+        self.assertEqual(invoice["customField"], "kept")
+        self.assertIn("status", invoice)
+        self.assertNotIn("currency", invoice)
+        with self.assertRaises(KeyError):
+            invoice["missing"]
+
+    def test_004_to_dict(self):
+        receipt = LedgerReceipt(RECEIPT)
+        self.assertIsInstance(receipt.transactions[1], Transaction)
+        self.assertEqual(receipt.to_dict(), RECEIPT)
+        self.assertEqual(Invoice(INVOICE).to_dict(), INVOICE)
+        self.assertEqual(json.loads(JsonCodec().dumps({"invoice": Invoice(INVOICE)})), {"invoice": INVOICE})
+
+    def test_005_nested_events(self):
+        event = BankStatementEvent({"id": 1, "events": [{"id": 2, "events": [{"id": 3}]}]})
+        self.assertIsInstance(event.events[0].events[0], BankStatementEvent)
+        self.assertEqual(event.events[0].events[0].id, 3)
+
+    def test_006_parse_response(self):
+        answer = parse_response("invoices", {"status": 200, "content": {"results": [INVOICE], "meta": {}}})
+        self.assertIsInstance(answer["content"]["results"][0], Invoice)
+        self.assertEqual(answer["content"]["meta"], {})
+
+        answer = parse_response("invoices/10", {"status": 200, "content": INVOICE})
+        self.assertIsInstance(answer["content"], Invoice)
+
+        answer = parse_response("bankstatements", {"status": 200, "content": {"results": [{"events": [{"id": 1}]}]}})
+        self.assertIsInstance(answer["content"]["results"][0]["events"][0], BankStatementEvent)
+
+        error = {"status": 404, "content": {"errors": []}}
+        self.assertIs(parse_response("invoices/10", error), error)
+        other = {"status": 200, "content": {"id": 1}}
+        self.assertIs(parse_response("products/1", other), other)
+
+
+class TestClientModels(unittest.TestCase):
+
+    def test_001_client_returns_models(self):
+        session = FakeSession([FakeResponse(200, INVOICE)])
+        client = Client("key", "id", "secret", "uri", session=session, models=True)
+
+        invoice = client.get_invoice(10)["content"]
+        self.assertIsInstance(invoice, Invoice)
+        self.assertEqual(invoice.invoiceRows[0].quantity, 2)
+
+    def test_002_default_dicts(self):
+        session = FakeSession([FakeResponse(200, INVOICE)])
+        client = Client("key", "id", "secret", "uri", session=session)
+
+        self.assertEqual(client.get_invoice(10)["content"], INVOICE)
+
+    def test_003_cache_keeps_dicts(self):
+        session = FakeSession([FakeResponse(200, INVOICE)])
+        cache = MemoryCache()
+        client = Client("key", "id", "secret", "uri", session=session, cache=cache, cache_ttls={"invoices/{id}": 60},
+                        models=True)
+
+        first = client.get_invoice(10)
+        second = client.get_invoice(10)
+
+        self.assertEqual(len(session.calls), 1)
+        self.assertIsInstance(second["content"], Invoice)
+        self.assertEqual(first["content"], second["content"])
+        cached = cache.get("{} {}".format(client._token_store_key(), client.api_url + "invoices/10"))
+        self.assertEqual(cached["content"], INVOICE)
+
+
+if __name__ == '__main__':
+    unittest.main()
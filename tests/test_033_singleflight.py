@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+import unittest
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from procountor.async_client import AsyncClient
+from procountor.client import Client
+from procountor.singleflight import SingleFlight
+from tests.fake_session import FakeResponse, FakeSession
+
+
+class SlowSession(FakeSession):
+
+    def request(self, method, url, headers=None, **options):
+        time.sleep(0.1)
+        return super(SlowSession, self).request(method, url, headers=headers, **options)
+
+
+def concurrently(function, count=8):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        try:
+            results[index] = function(index)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_001_shared_result(self):
+        flights = SingleFlight()
+        calls = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.1)
+            return "result"
+
+        results = concurrently(lambda index: flights.do("key", work))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(set(result for result, _ in results), {"result"})
+        self.assertTrue(all(shared for _, shared in results))
+        self.assertEqual(len(flights), 0)
+        self.assertEqual(flights.do("key", work), ("result", False))
+
+    def test_002_shared_error(self):
+        flights = SingleFlight()
+
+        def work():
+            time.sleep(0.1)
+            raise ValueError("failed")
+
+        results = concurrently(lambda index: flights.do("key", work), count=4)
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(len(flights), 0)
+
+
+class TestClientCoalescing(unittest.TestCase):
+
+    def setUp(self):
+        self.session = SlowSession()
+        self.client = Client("key", "id", "secret", "uri", session=self.session)
+        self.client.access_token = "token-0"
+
+    def test_001_identical_gets(self):
+        responses = concurrently(lambda index: self.client.get_business_partner(1))
+
+        self.assertEqual(len(self.session.calls), 1)
+        self.assertEqual([response["status"] for response in responses], [200] * 8)
+        responses[0]["content"] = None
+        self.assertIsNotNone(responses[1]["content"])
+
+    def test_002_different_urls(self):
+        concurrently(lambda index: self.client.get_business_partner(index % 2))
+
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_003_writes_not_coalesced(self):
+        self.session.responses = [FakeResponse(200, {}) for _ in range(4)]
+        concurrently(lambda index: self.client.update_dimension(id=1, name="Dimension"), count=4)
+
+        self.assertEqual(len(self.session.calls), 4)
+
+    def test_004_disabled(self):
+        client = Client("key", "id", "secret", "uri", session=self.session, coalesce=False)
+        client.access_token = "token-0"
+
+        concurrently(lambda index: client.get_product(1), count=4)
+
+        self.assertEqual(len(self.session.calls), 4)
+
+    def test_005_callers_get_copies(self):
+        responses = concurrently(lambda index: self.client.get_business_partner(1), count=4)
+        responses[0]["content"]["url"] = "changed"
+
+        self.assertEqual(len(self.session.calls), 1)
+        self.assertTrue(all(response["content"]["url"].endswith("/businesspartners/1") for response in responses[1:]))
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncClientCoalescing(unittest.TestCase):
+
+    def test_001_identical_gets(self):
+        paths = []
+
+        async def handler(request):
+            paths.append(request.url.path)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"path": request.url.path})
+
+        async def fetch():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as session:
+                client = AsyncClient("key", "id", "secret", "uri", session=session)
+                client.access_token = "token"
+                return await asyncio.gather(*[client.get_product(index % 2) for index in range(10)])
+
+        responses = asyncio.run(fetch())
+
+        self.assertEqual(len(paths), 2)
+        self.assertEqual([response["status"] for response in responses], [200] * 10)
+        self.assertTrue(responses[3]["content"]["path"].endswith("/products/1"))
+
+        responses[1]["content"]["path"] = "changed"
+        self.assertTrue(responses[3]["content"]["path"].endswith("/products/1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
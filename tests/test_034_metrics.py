@@ -0,0 +1,174 @@
+import io
+import unittest
+from procountor.cache import MemoryCache
+from procountor.client import Client
+from procountor.metrics import Histogram, Hook, MetricsRegistry, OpenTelemetryExporter
+from procountor.multipart import AttachmentUpload
+from procountor.retry import RetryPolicy
+from procountor.testing import CREDENTIALS, standin_session
+from tests.fake_session import FakeResponse, FakeSession
+
+
+class RecordingHook(Hook):
+
+    def __init__(self):
+        self.events = []
+
+    def before_request(self, event):
+        event["seen"] = True
+        self.events.append(("before", dict(event)))
+
+    def after_request(self, event):
+        self.events.append(("after", dict(event)))
+
+
+class FailingSession(FakeSession):
+
+    def request(self, method, url, headers=None, **options):
+        raise ValueError("broken")
+
+
+class RecordingInstrument(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.values = []
+
+    def record(self, value, attributes):
+        self.values.append((value, attributes))
+
+    add = record
+
+
+class RecordingMeter(object):
+
+    def __init__(self):
+        self.instruments = {}
+
+    def create_histogram(self, name, **options):
+        return self.instruments.setdefault(name, RecordingInstrument(name))
+
+    create_counter = create_histogram
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_001_buckets(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), (float("inf"), 4)])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 2.65)
+
+
+class TestHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.session = FakeSession()
+        self.hook = RecordingHook()
+        self.metrics = MetricsRegistry()
+        self.client = Client("key", "id", "secret", "uri", session=self.session, hooks=[self.hook, self.metrics])
+
+    def test_001_events(self):
+        self.client.get_invoice(12)
+
+        stages = [(stage, event["method"], event["endpoint"]) for stage, event in self.hook.events]
+        self.assertEqual(stages, [
+            ("before", "GET", "invoices/{id}"),
+            ("before", "POST", "oauth/token"),
+            ("after", "POST", "oauth/token"),
+            ("after", "GET", "invoices/{id}"),
+        ])
+
+        event = self.hook.events[-1][1]
+        self.assertTrue(event["seen"])
+        self.assertEqual(event["status"], 200)
+        self.assertIsNone(event["error"])
+        self.assertEqual(event["response_bytes"], len(FakeResponse(200, {"url": event["url"]}).content))
+        self.assertGreaterEqual(event["seconds"], 0)
+
+    def test_002_registry(self):
+        self.session.responses = [FakeResponse(503, "busy"), FakeResponse(200, {"id": 1})]
+        self.client.retry_policy = RetryPolicy(backoff_factor=0)
+        self.client.get_invoice(1)
+        self.client.get_invoice(2)
+        self.client.post_invoice(type="SALES_INVOICE")
+
+        rows = dict(((row["method"], row["endpoint"]), row) for row in self.metrics.endpoints())
+        invoice = rows[("GET", "invoices/{id}")]
+        self.assertEqual(invoice["requests"], 2)
+        self.assertEqual(invoice["retries"], 1)
+        self.assertEqual(rows[("POST", "invoices")]["request_bytes"], len(b'{"type":"SALES_INVOICE"}'))
+        self.assertEqual(rows[("POST", "oauth/token")]["requests"], 1)
+
+    def test_003_prometheus_text(self):
+        self.client.get_invoice(12)
+        text = self.metrics.prometheus_text()
+
+        self.assertIn("# TYPE procountor_request_duration_seconds histogram", text)
+        self.assertIn('procountor_request_duration_seconds_bucket{endpoint="invoices/{id}",le="+Inf",method="GET"} 1',
+                      text)
+        self.assertIn('procountor_requests_total{endpoint="invoices/{id}",method="GET",status="200"} 1', text)
+        self.assertIn('procountor_response_bytes_total{endpoint="oauth/token",method="POST"}', text)
+
+    def test_004_failed_request(self):
+        client = Client("key", "id", "secret", "uri", session=FailingSession(), hooks=[self.metrics])
+        client.access_token = "token"
+
+        with self.assertRaises(ValueError):
+            client.get_invoice(1)
+
+        row = self.metrics.endpoints()[0]
+        self.assertEqual((row["requests"], row["errors"]), (1, 1))
+
+    def test_005_upload_size(self):
+        self.client.post_attachment({"name": "a.txt"}, b"x" * 1000)
+
+        event = self.hook.events[-1][1]
+        self.assertEqual(event["endpoint"], "attachments")
+        self.assertGreater(event["request_bytes"], 1000)
+        self.assertEqual(event["request_bytes"], AttachmentUpload({"name": "a.txt"}, b"x" * 1000).encoder().len)
+
+    def test_006_cached_responses_not_recorded(self):
+        client = Client("key", "id", "secret", "uri", session=self.session, hooks=[self.hook], cache=MemoryCache(),
+                        cache_ttls={"invoices/{id}": 60})
+        client.access_token = "token-0"
+        client.get_invoice(1)
+        client.get_invoice(1)
+
+        self.assertEqual(len(self.hook.events), 2)
+
+    def test_007_download(self):
+        client = Client(session=standin_session(), hooks=[self.hook, self.metrics], **CREDENTIALS)
+        attachmentId = client.post_attachment({"name": "a.bin"}, b"x" * 5000)["content"]["id"]
+        client.download_attachment(attachmentId, io.BytesIO())
+        client.download_attachment(999999, io.BytesIO())
+
+        events = [event for stage, event in self.hook.events if stage == "after" and event["method"] == "GET"]
+        self.assertEqual([(event["endpoint"], event["status"]) for event in events],
+                         [("attachments/{id}", 200), ("attachments/{id}", 404)])
+        self.assertGreater(events[0]["response_bytes"], 5000)
+        self.assertIsNone(events[0]["error"])
+
+        rows = dict(((row["method"], row["endpoint"]), row) for row in self.metrics.endpoints())
+        self.assertEqual(rows[("GET", "attachments/{id}")]["requests"], 2)
+
+
+class TestOpenTelemetryExporter(unittest.TestCase):
+
+    def test_001_record(self):
+        meter = RecordingMeter()
+        client = Client("key", "id", "secret", "uri", session=FakeSession(), hooks=[OpenTelemetryExporter(meter)])
+        client.access_token = "token-0"
+        client.get_invoice(1)
+
+        duration = meter.instruments["procountor.request.duration"].values
+        self.assertEqual(duration[0][1], {"http.request.method": "GET", "endpoint": "invoices/{id}"})
+        requests = meter.instruments["procountor.requests"].values
+        self.assertEqual(requests[0][1]["http.response.status_code"], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
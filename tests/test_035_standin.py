@@ -0,0 +1,126 @@
+import io
+import time
+import unittest
+from procountor.retry import RetryPolicy
+from procountor.client import Client
+from procountor.testing import CREDENTIALS, StandInApi, StandInServer, generate_fixtures, standin_session
+
+
+class TestStandInServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(StandInApi(generate_fixtures(invoices=120, seed=1), page_size=50)).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.client = self.server.client(retry_policy=RetryPolicy(backoff_factor=0))
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_001_token_and_read(self):
+        response = self.client.get_company()
+
+        self.assertEqual(response["status"], 200)
+        self.assertEqual(response["content"]["name"], "Demo Company Oy")
+        self.assertEqual(self.server.api.requests[-2][:2], ("POST", "oauth/token"))
+
+    def test_002_pagination(self):
+        invoices = list(self.client.iter_invoices())
+        ids = [invoice["id"] for invoice in invoices]
+
+        self.assertEqual(len(ids), 125)
+        self.assertEqual(ids, sorted(ids))
+        self.assertNotIn("invoiceRows", invoices[0])
+
+        page = self.client.get_invoices(orderById="desc", size=10, previousId=ids[-1])
+        self.assertEqual([invoice["id"] for invoice in page["content"]["results"]], ids[-11:-1][::-1])
+
+    def test_003_filters(self):
+        invoices = list(self.client.iter_invoices(startDate="2019-02-01", endDate="2019-02-28", types="SALES_INVOICE"))
+
+        self.assertTrue(invoices)
+        self.assertTrue(all("2019-02-01" <= invoice["date"] <= "2019-02-28" for invoice in invoices))
+        self.assertNotIn(1004, [invoice["id"] for invoice in invoices])
+        self.assertEqual(self.client.get_bank_statements(startDate="aa", endDate="bb")["status"], 400)
+
+    def test_004_token_expiry(self):
+        self.client.get_company()
+        token = self.client.access_token
+
+        self.server.api.expire_tokens()
+        response = self.client.get_invoice(1001)
+
+        self.assertEqual(response["status"], 200)
+        self.assertNotEqual(self.client.access_token, token)
+
+    def test_005_injected_errors(self):
+        self.server.api.inject(429, count=2, endpoint="invoices/{id}", retry_after="0")
+        response = self.client.get_invoice(1001)
+        self.assertEqual((response["status"], response["retries"]), (200, 2))
+
+        self.server.api.inject(500, endpoint="products/{id}")
+        self.assertEqual(self.client.get_product(201)["status"], 500)
+        self.assertEqual(self.client.get_product(201)["status"], 200)
+
+    def test_006_attachments(self):
+        meta = {"name": "receipt.txt", "referenceType": "INVOICE", "referenceId": 1001}
+        response = self.client.post_attachment(meta, b"stand-in attachment")
+        self.assertEqual(response["status"], 200)
+        attachmentId = response["content"]["id"]
+
+        target = io.BytesIO()
+        download = self.client.download_attachment(attachmentId, target)
+        self.assertEqual(download["metadata"]["name"], "receipt.txt")
+        self.assertEqual(target.getvalue(), b"stand-in attachment")
+
+        response = self.client.get_attachment(9001)
+        self.assertEqual(response["metadata"]["referenceId"], 1001)
+
+        self.assertEqual(self.client.delete_attachment(attachmentId)["status"], 200)
+        self.assertEqual(self.client.get_attachment(attachmentId)["status"], 404)
+
+    def test_007_writes(self):
+        response = self.client.post_invoice(type="SALES_INVOICE", partnerId=101, date="2019-04-01", invoiceRows=[])
+        invoiceId = response["content"]["id"]
+
+        self.client.send_invoice(invoiceId)
+        self.assertEqual(self.client.get_invoice(invoiceId)["content"]["status"], "SENT")
+
+
+class TestStandInApi(unittest.TestCase):
+
+    def test_001_unauthorized(self):
+        api = StandInApi()
+        status, headers, body = api.handle("GET", "/latest/api/invoices", {"Authorization": "Bearer unknown"})
+        self.assertEqual(status, 401)
+
+    def test_002_latency_and_error_rates(self):
+        api = StandInApi(latency=0.02, error_rates={503: 1.0})
+        started = time.time()
+        status, _, _ = api.handle("GET", "/latest/api/company")
+
+        self.assertGreaterEqual(time.time() - started, 0.02)
+        self.assertEqual(status, 503)
+
+    def test_003_generated_fixtures(self):
+        fixtures = generate_fixtures(invoices=10, ledger_receipts=5, seed=3)
+        self.assertEqual(fixtures, generate_fixtures(invoices=10, ledger_receipts=5, seed=3))
+        self.assertEqual(len(fixtures["ledgerreceipts"]), 9)
+        receipt = fixtures["ledgerreceipts"][-1]
+        self.assertAlmostEqual(sum(t["accountingValue"] for t in receipt["transactions"]), 0, places=6)
+
+    def test_004_session(self):
+        api = StandInApi()
+        client = Client(session=standin_session(api), **CREDENTIALS)
+
+        self.assertEqual(client.get_invoice(1001)["content"]["id"], 1001)
+        self.assertEqual([request[1] for request in api.requests], ["oauth/token", "invoices/{id}"])
+
+
+if __name__ == '__main__':
+    unittest.main()
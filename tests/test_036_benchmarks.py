@@ -0,0 +1,29 @@
+import unittest
+from benchmarks.__main__ import compare, measure
+from benchmarks.suite import BENCHMARKS
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_001_measure(self):
+        result = measure("request.handle_response", repeat=1)
+
+        self.assertEqual(result["operations"], 5000)
+        self.assertGreater(result["seconds"], 0)
+        self.assertGreaterEqual(result["seconds"], result["best"])
+        self.assertIn("mb_per_second", result)
+
+    def test_002_suite(self):
+        self.assertIn("pagination.iter_invoices", BENCHMARKS)
+        self.assertIn("bulk.get_invoices_by_ids.workers_16", BENCHMARKS)
+        self.assertIn("attachments.upload", BENCHMARKS)
+
+    def test_003_compare(self):
+        baseline = {"a": {"seconds": 1.0}, "b": {"seconds": 1.0}}
+        results = {"a": {"seconds": 1.2}, "b": {"seconds": 1.3}, "c": {"seconds": 9.0}}
+
+        self.assertEqual(compare(results, baseline, 0.25), [("b", 1.0, 1.3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
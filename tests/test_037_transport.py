@@ -0,0 +1,98 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from procountor.client import Client
+from procountor.testing import CREDENTIALS, StandInApi, standin_session
+from procountor.transport import HttpTransport, RecordingTransport, ReplayTransport
+
+
+class TestRecordReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "sync.cassette")
+        self.api = StandInApi()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, path=None):
+        with RecordingTransport(path or self.path, HttpTransport(standin_session(self.api))) as transport:
+            client = Client(transport=transport, **CREDENTIALS)
+            invoice = client.get_invoice(1001)
+            invoices = list(client.iter_invoices())
+            attachment = client.post_attachment({"name": "a.bin"}, b"\x00\xff" * 2000)
+            target = io.BytesIO()
+            client.download_attachment(attachment["content"]["id"], target)
+        return transport, invoice, invoices, target.getvalue()
+
+    def replay_client(self, path=None, **options):
+        return Client(host="https://nowhere.invalid", transport=ReplayTransport(path or self.path, **options),
+                      **CREDENTIALS)
+
+    def test_001_replay(self):
+        transport, invoice, invoices, attachment = self.record()
+        self.assertEqual(transport.interactions, 5)
+        self.assertEqual(len(self.api.requests), 5)
+
+        client = self.replay_client()
+        self.assertEqual(client.get_invoice(1001), invoice)
+        self.assertEqual(list(client.iter_invoices()), invoices)
+        attachmentId = client.post_attachment({"name": "a.bin"}, b"")["content"]["id"]
+
+        target = io.BytesIO()
+        download = client.download_attachment(attachmentId, target)
+        self.assertEqual(download["metadata"]["name"], "a.bin")
+        self.assertEqual(target.getvalue(), attachment)
+        self.assertEqual(len(self.api.requests), 5)
+
+    def test_002_cassette(self):
+        self.record()
+        with open(self.path) as f:
+            interactions = [json.loads(line) for line in f]
+
+        token = interactions[0]
+        self.assertEqual(token["url"], "/supported/api/oauth/token/")
+        self.assertEqual(token["request"]["form"]["client_secret"], "REDACTED")
+        self.assertEqual(token["request"]["form"]["grant_type"], "client_credentials")
+        self.assertEqual(json.loads(token["body"]["text"])["access_token"], "REDACTED")
+        self.assertNotIn(CREDENTIALS["client_secret"], open(self.path).read())
+
+        upload = interactions[3]
+        self.assertEqual((upload["method"], upload["url"]), ("POST", "/supported/api/attachments"))
+        self.assertIn("zlib", upload["request"])
+        self.assertIn("zlib", interactions[4]["body"])
+
+    def test_003_gzip(self):
+        path = self.path + ".gz"
+        _, invoice, _, _ = self.record(path)
+        self.assertEqual(self.replay_client(path).get_invoice(1001), invoice)
+
+    def test_004_latency(self):
+        self.record()
+        client = self.replay_client(latency=0.02)
+        started = time.time()
+        client.get_invoice(1001)
+
+        self.assertGreaterEqual(time.time() - started, 0.04)
+
+    def test_005_unrecorded_request(self):
+        self.record()
+        client = self.replay_client()
+
+        with self.assertRaises(LookupError):
+            client.get_invoice(1002)
+
+    def test_006_no_session_with_transport(self):
+        self.record()
+        with self.replay_client() as client:
+            self.assertIsNone(client.session)
+            self.assertEqual(client.get_invoice(1001)["status"], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
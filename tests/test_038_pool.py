@@ -0,0 +1,124 @@
+import threading
+import time
+import unittest
+from procountor.pool import ClientPool
+from procountor.ratelimit import RateLimiter
+from procountor.testing import CREDENTIALS, StandInApi, standin_session
+
+
+class TestClientPool(unittest.TestCase):
+
+    def setUp(self):
+        self.api = StandInApi()
+        self.pool = ClientPool(
+            CREDENTIALS["client_id"], CREDENTIALS["client_secret"], CREDENTIALS["redirect_uri"],
+            session=standin_session(self.api), max_clients=2,
+        )
+        self.lock = threading.Lock()
+        self.started = []
+
+    def tearDown(self):
+        self.pool.close()
+
+    def job(self, api_key, seconds=0.005):
+        def run(client):
+            with self.lock:
+                self.started.append(api_key)
+            time.sleep(seconds)
+            return client.get_invoice(1001)["status"]
+        return run
+
+    def test_001_shared_clients(self):
+        client = self.pool.client("key-1")
+
+        self.assertIs(self.pool.client("key-1"), client)
+        self.assertIsNot(self.pool.client("key-2"), client)
+        self.assertIsNot(self.pool.client("key-1", client_secret="other"), client)
+        self.assertIs(self.pool.client("key-2").session, client.session)
+        self.assertIsNone(client.rate_limiter)
+
+    def test_002_shared_rate_limiter(self):
+        limiter = RateLimiter(rate=100)
+        pool = ClientPool("id", "secret", "uri", session=self.pool.session, rate_limiter=limiter)
+
+        self.assertIs(pool.client("key-1").rate_limiter, limiter)
+        self.assertIs(pool.client("key-2").rate_limiter, limiter)
+
+    def test_003_lru_eviction(self):
+        first = self.pool.client("key-1")
+        self.pool.client("key-2")
+        self.pool.client("key-1")
+        self.pool.client("key-3")
+
+        self.assertEqual(len(self.pool), 2)
+        self.assertIs(self.pool.client("key-1"), first)
+        self.pool.client("key-2")
+        self.pool.client("key-3")
+        self.assertIsNot(self.pool.client("key-1"), first)
+
+    def test_004_run(self):
+        jobs = {"key-{}".format(n): [self.job("key-{}".format(n)) for _ in range(3)] for n in range(4)}
+        results = list(self.pool.run(jobs, max_workers=4))
+
+        self.assertEqual(sorted(results), sorted((api_key, 200) for api_key in jobs for _ in range(3)))
+        tokens = [request for request in self.api.requests if request[1] == "oauth/token"]
+        self.assertEqual(len(tokens), 4)
+        self.assertEqual(len(self.pool), 2)
+
+    def test_005_fairness(self):
+        jobs = [("big", (self.job("big") for _ in range(40))), ("small-1", [self.job("small-1")] * 2),
+                ("small-2", [self.job("small-2")] * 2)]
+        list(self.pool.run(jobs, max_workers=2))
+
+        self.assertEqual(len(self.started), 44)
+        self.assertEqual(sum(1 for api_key in self.started[:8] if api_key != "big"), 4)
+
+    def test_006_max_per_tenant(self):
+        running = {"big": 0, "small": 0}
+        concurrency = []
+
+        def job(api_key):
+            def run(client):
+                with self.lock:
+                    running[api_key] += 1
+                    concurrency.append(running[api_key])
+                time.sleep(0.005)
+                with self.lock:
+                    running[api_key] -= 1
+            return run
+
+        list(self.pool.run({"big": [job("big")] * 10, "small": [job("small")] * 2}, max_workers=4, max_per_tenant=2))
+
+        self.assertEqual(len(concurrency), 12)
+        self.assertEqual(max(concurrency), 2)
+
+    def test_007_failing_job(self):
+        def fail(client):
+            raise ValueError("broken")
+
+        results = dict(self.pool.run({"key-1": [fail]}))
+
+        self.assertIsNone(results["key-1"]["status"])
+        self.assertEqual(results["key-1"]["message"], "broken")
+
+    def test_008_tenant_credentials(self):
+        tenant = {"api_key": "key-1", "client_secret": "other"}
+        results = list(self.pool.run([(tenant, [self.job("key-1")]), ("key-1", [self.job("key-1")])]))
+
+        self.assertEqual(results[0][1], 200)
+        self.assertEqual(sorted(str(result[0]) for result in results), sorted([str(tenant), "key-1"]))
+        self.assertEqual(self.pool.client("key-1", client_secret="other").client_secret, "other")
+        self.assertEqual(len([request for request in self.api.requests if request[1] == "oauth/token"]), 2)
+
+    def test_009_busy_pool_keeps_new_client(self):
+        self.pool._checkout("key-1")
+        self.pool._checkout("key-2")
+
+        client = self.pool.client("key-3")
+        self.assertEqual(len(self.pool), 3)
+        self.assertIs(self.pool.client("key-3"), client)
+        self.assertEqual(client.get_invoice(1001)["status"], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,16 @@
 import unittest
 import os
 from procountor.client import Client
+from procountor.testing import StandInServer
+
+_standin = []
+
+
+def standin_server():
+    """ Returns the stand-in server shared by the tests, starting it on first use """
+    if not _standin:
+        _standin.append(StandInServer().start())
+    return _standin[0]
 
 
 class TestClient(unittest.TestCase):
@@ -22,9 +32,14 @@ class TestClient(unittest.TestCase):
 
     def __init__(self, *args, **kwargs):
         """ Initialize Procountor client. Requires the following environment
-        variables PROCOUNTOR_API_KEY, PROCOUNTOR_CLIENT_ID, PROCOUNTOR_CLIENT_SECRET, PROCOUNTOR_REDIRECT_URI and PROCOUNTOR_API_VERSION. """
+        variables PROCOUNTOR_API_KEY, PROCOUNTOR_CLIENT_ID, PROCOUNTOR_CLIENT_SECRET, PROCOUNTOR_REDIRECT_URI and PROCOUNTOR_API_VERSION.
+        Without PROCOUNTOR_API_KEY the tests are run against a local stand-in server. """
 
         super(TestClient, self).__init__(*args, **kwargs)
+        if 'PROCOUNTOR_API_KEY' not in os.environ:
+            self.client = standin_server().client()
+            return
+
         self.client = Client(
             api_key = os.environ['PROCOUNTOR_API_KEY'],
             client_id = os.environ['PROCOUNTOR_CLIENT_ID'],